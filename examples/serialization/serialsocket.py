@@ -13,8 +13,9 @@ class SerializingSocket(zmq.Socket):
     send_zipped_pickle is just like send_pyobj, but uses
     zlib to compress the stream before sending.
     
-    send_array sends numpy arrays with metadata necessary
-    for reconstructing the array on the other side (dtype,shape).
+    numpy arrays can be sent with Socket.send_array, which sends
+    the metadata necessary for reconstructing the array on the
+    other side (dtype,shape), without copying the data.
     """
     
     def send_zipped_pickle(self, obj, flags=0, protocol=-1):
@@ -30,23 +31,6 @@ class SerializingSocket(zmq.Socket):
         pobj = zlib.decompress(zobj)
         return pickle.loads(pobj)
 
-    def send_array(self, A, flags=0, copy=True, track=False):
-        """send a numpy array with metadata"""
-        md = dict(
-            dtype = str(A.dtype),
-            shape = A.shape,
-        )
-        self.send_json(md, flags|zmq.SNDMORE)
-        return self.send(A, flags, copy=copy, track=track)
-
-    def recv_array(self, flags=0, copy=True, track=False):
-        """recv a numpy array"""
-        md = self.recv_json(flags=flags)
-        msg = self.recv(flags=flags, copy=copy, track=track)
-        buf = buffer(msg)
-        A = numpy.frombuffer(buf, dtype=md['dtype'])
-        return A.reshape(md['shape'])
-    
 
 if __name__ == '__main__':
     ctx = zmq.Context.instance()
@@ -62,8 +46,8 @@ if __name__ == '__main__':
     req.send_zipped_pickle(A)
     B = rep.recv_zipped_pickle()
     # now try non-copying version
-    rep.send_array(A, copy=False)
-    C = req.recv_array(copy=False)
+    rep.send_array(A)
+    C = req.recv_array()
     print ("Checking zipped pickle...")
     print ("Okay" if (A==B).all() else "Failed")
     print ("Checking send_array...")
@@ -0,0 +1,90 @@
+#
+#    Copyright (c) 2010-2012 Brian E. Granger & Min Ragan-Kelley
+#
+#    This file is part of pyzmq.
+#
+#    pyzmq is free software; you can redistribute it and/or modify it under
+#    the terms of the Lesser GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    pyzmq is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    Lesser GNU General Public License for more details.
+#
+#    You should have received a copy of the Lesser GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Find the message size above which non-copying sends beat copying sends.
+
+The result depends on the machine, so zmq.Context.copy_threshold is 0 (off)
+by default; set it to the threshold this suggests.
+"""
+
+import sys
+import threading
+import zmq
+
+
+def sink(ctx, url, count):
+    s = ctx.socket(zmq.PULL)
+    s.connect(url)
+    for i in range(count):
+        s.recv(copy=False)
+    s.close()
+
+def time_sends(ctx, message_size, message_count, copy):
+    url = 'inproc://copy_threshold'
+    s = ctx.socket(zmq.PUSH)
+    # measure the raw copy/no-copy paths, not the threshold
+    s.copy_threshold = 0
+    s.bind(url)
+    t = threading.Thread(target=sink, args=(ctx, url, message_count))
+    t.start()
+
+    # remove the b for Python2.5:
+    msg = b' ' * message_size
+    watch = zmq.Stopwatch()
+    watch.start()
+    for i in range(message_count):
+        s.send(msg, copy=copy)
+    t.join()
+    elapsed = watch.stop()
+    s.close()
+    return max(elapsed, 1)
+
+def main (argv):
+    if len (argv) > 2:
+        print ('usage: copy_threshold [message-count]')
+        sys.exit(1)
+
+    try:
+        message_count = int(argv[1]) if len(argv) > 1 else 10000
+    except (ValueError, OverflowError):
+        print ('message-count must be an integer')
+        sys.exit(1)
+
+    ctx = zmq.Context()
+    threshold = None
+    print ("%10s %14s %14s" % ("size [B]", "copy [msg/s]", "nocopy [msg/s]"))
+    for exp in range(6, 23):
+        message_size = 2**exp
+        # fewer messages for large sizes, to keep memory bounded
+        count = max(message_count >> max(exp - 16, 0), 100)
+        copied = 1e6 * count / time_sends(ctx, message_size, count, True)
+        nocopy = 1e6 * count / time_sends(ctx, message_size, count, False)
+        print ("%10i %14.0f %14.0f" % (message_size, copied, nocopy))
+        if threshold is None and nocopy > copied:
+            threshold = message_size
+
+    if threshold is None:
+        print ("copying was faster at every size")
+    else:
+        print ("suggested copy_threshold: %i [B]" % threshold)
+    ctx.term()
+    return threshold
+
+if __name__ == "__main__":
+    main (sys.argv)
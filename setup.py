@@ -525,7 +525,7 @@ monqueue = pxd('devices', 'monitoredqueue')
 submodules = dict(
     core = {'constants': [libzmq],
             'error':[libzmq],
-            '_poll':[libzmq, socket, context],
+            '_poll':[libzmq, socket, context, message, pxd('core','_poll')],
             'stopwatch':[libzmq, pxd('core','stopwatch')],
             'context':[context, libzmq],
             'message':[libzmq, buffers, message],
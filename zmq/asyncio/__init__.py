@@ -0,0 +1,41 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+"""zmq.asyncio - asyncio integration for zeromq.
+
+Usage
+-----
+
+Instead of importing zmq directly, do so in the following manner:
+
+..
+
+    import zmq.asyncio as zmq
+
+
+Socket methods that would have blocked, and Poller.poll, return asyncio
+Futures instead, which can be awaited in a coroutine::
+
+    ctx = zmq.Context()
+    s = ctx.socket(zmq.DEALER)
+    ...
+    msg = await s.recv_multipart()
+
+The sockets are watched with ``loop.add_reader`` on their ``zmq.FD``, so 0MQ
+shares one event loop with other asyncio I/O.  Sockets belong to the event
+loop that is current when they are created.
+"""
+
+from __future__ import absolute_import
+
+from zmq import *
+from zmq.asyncio.core import _Context, _Socket, _Poller
+Context = _Context
+Socket = _Socket
+Poller = _Poller
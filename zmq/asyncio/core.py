@@ -0,0 +1,490 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+"""This module wraps the :class:`Socket`, :class:`Context` and :class:`Poller`
+found in :mod:`pyzmq <zmq>` to return asyncio Futures instead of blocking.
+"""
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+from __future__ import absolute_import
+
+import asyncio
+import weakref
+from collections import deque
+
+import zmq
+from zmq import *
+
+# imported with different names as to not have the star import try to to clobber (when building with cython)
+from zmq.core.context import Context as _original_Context
+from zmq.core.socket import Socket as _original_Socket
+from zmq.core.poll import Poller as _original_Poller
+from zmq.core import pysocket
+from zmq.utils.serializers import get_serializer, deserialize_array
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+def _chain(loop, future, transform):
+    """A Future for transform(result) of another Future."""
+    chained = loop.create_future()
+    def done(f):
+        if chained.done():
+            return
+        if f.cancelled():
+            chained.cancel()
+            return
+        exc = f.exception()
+        if exc is not None:
+            chained.set_exception(exc)
+            return
+        try:
+            chained.set_result(transform(f.result()))
+        except Exception as e:
+            chained.set_exception(e)
+    future.add_done_callback(done)
+    return chained
+
+def _recv_some(method):
+    """Wrap a batch recv method, to raise EAGAIN instead of receiving nothing.
+
+    With NOBLOCK, the batch methods return an empty result when no message
+    is ready, which _Socket._try would take as done.
+    """
+    def recv_some(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if not result:
+            raise ZMQError(EAGAIN)
+        return result
+    return recv_some
+
+
+class _Socket(_original_Socket):
+    """asyncio version of :class:`zmq.core.socket.Socket`
+
+    The following methods return a Future instead of blocking:
+
+        * send
+        * recv
+        * send_multipart
+        * recv_multipart
+        * send_string, recv_string
+        * send_pyobj, recv_pyobj
+        * send_json, recv_json
+        * send_serialized, recv_serialized
+        * send_array, recv_array
+        * send_many
+        * recv_many, recv_multipart_many
+        * recv_into, recv_multipart_into
+        * recv_records
+        * poll
+
+    Each call tries the operation with ``zmq.NOBLOCK`` right away.  If it
+    would block, it is queued, and retried in order when the socket's
+    ``zmq.FD`` becomes readable and ``zmq.EVENTS`` says the socket is ready,
+    using ``loop.add_reader`` on the event loop that was current when the
+    socket was created.  Cancelling a queued Future drops its operation.
+
+    If the ``zmq.NOBLOCK`` flag is given, the call is made directly, and
+    returns (or raises EAGAIN) without a Future.
+
+    Closing the socket cancels the Futures of its queued operations and
+    polls.
+    """
+
+    def __init__(self, context, socket_type):
+        self._loop = asyncio.get_event_loop()
+        self._fd = self.getsockopt(FD)
+        self._recv_queue = deque()
+        self._send_queue = deque()
+        # (future, callback) of async polls waiting on this socket,
+        # callback is called with EVENTS
+        self._watchers = []
+        self._reading = False
+        self._scheduled = False
+
+    def close(self, linger=None):
+        if not self.closed:
+            if self._reading:
+                self._loop.remove_reader(self._fd)
+                self._reading = False
+            for queue in (self._recv_queue, self._send_queue):
+                while queue:
+                    queue.popleft()[0].cancel()
+            watchers = self._watchers
+            self._watchers = []
+            for future, callback in watchers:
+                future.cancel()
+        super(_Socket, self).close(linger)
+
+    def _watch(self):
+        """Make sure _handle_events runs when the socket's state changes."""
+        if not self._reading:
+            self._loop.add_reader(self._fd, self._handle_events)
+            self._reading = True
+        # zmq.FD is edge-triggered, so check once now in case the
+        # state changed before we started watching it
+        self._schedule()
+
+    def _schedule(self):
+        """Run _handle_events soon, if anything is waiting on the socket."""
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon(self._handle_events)
+
+    def _schedule_waiting(self):
+        """Check the socket again after an operation outside _handle_events.
+
+        The operation may have consumed the edge on zmq.FD that would have
+        woken a queued operation or poll.
+        """
+        if self._recv_queue or self._send_queue or self._watchers:
+            self._schedule()
+
+    def _noblock(self, method, *args):
+        """Call a method directly, for the zmq.NOBLOCK flag."""
+        result = method(self, *args)
+        self._schedule_waiting()
+        return result
+
+    def _add_watcher(self, future, callback):
+        self._watchers.append((future, callback))
+        self._watch()
+
+    def _remove_watcher(self, future, callback):
+        try:
+            self._watchers.remove((future, callback))
+        except ValueError:
+            pass
+
+    def _try(self, future, method, args, kwargs):
+        """Try a nonblocking operation, returns False if it would block."""
+        try:
+            result = method(self, *args, **kwargs)
+        except ZMQError as e:
+            if e.errno == EAGAIN:
+                return False
+            future.set_exception(e)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return True
+
+    def _add_op(self, queue, method, args, flags, kwargs):
+        kwargs['flags'] = flags | NOBLOCK
+        future = self._loop.create_future()
+        # don't jump ahead of operations that are already waiting
+        if queue or not self._try(future, method, args, kwargs):
+            queue.append((future, method, args, kwargs))
+            self._watch()
+        else:
+            self._schedule_waiting()
+        return future
+
+    def _flush(self, queue):
+        """Run queued operations until one would block, returns the count."""
+        count = 0
+        while queue:
+            future, method, args, kwargs = queue[0]
+            if future.done():
+                # cancelled while waiting
+                queue.popleft()
+                continue
+            if not self._try(future, method, args, kwargs):
+                break
+            queue.popleft()
+            count += 1
+        return count
+
+    def _handle_events(self):
+        self._scheduled = False
+        while not self.closed:
+            try:
+                events = self.getsockopt(EVENTS)
+            except ZMQError:
+                return
+            count = 0
+            if events & POLLIN and self._recv_queue:
+                count += self._flush(self._recv_queue)
+            if events & POLLOUT and self._send_queue:
+                count += self._flush(self._send_queue)
+            for future, callback in list(self._watchers):
+                callback(events)
+            if not count:
+                # otherwise the operations may have changed EVENTS
+                break
+
+    def send(self, data, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.send, data, flags, copy, track)
+        return self._add_op(self._send_queue, _original_Socket.send,
+                            (data,), flags, dict(copy=copy, track=track))
+
+    def recv(self, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv, flags, copy, track)
+        return self._add_op(self._recv_queue, _original_Socket.recv,
+                            (), flags, dict(copy=copy, track=track))
+
+    # the frames of a multipart message arrive and leave together,
+    # so the whole message is one nonblocking operation
+
+    def send_multipart(self, msg_parts, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.send_multipart, msg_parts,
+                                 flags, copy, track)
+        return self._add_op(self._send_queue, _original_Socket.send_multipart,
+                            (msg_parts,), flags, dict(copy=copy, track=track))
+
+    def recv_multipart(self, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_multipart, flags, copy, track)
+        return self._add_op(self._recv_queue, _original_Socket.recv_multipart,
+                            (), flags, dict(copy=copy, track=track))
+
+    # the batch methods return as soon as anything is ready, like their
+    # blocking versions, which only wait for the first message
+
+    def send_many(self, messages, flags=0, copy=True):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.send_many, messages, flags, copy)
+        messages = list(messages)
+        sent = [0]
+        def send_rest(self, flags=0, copy=True):
+            # sends as many as fit now, and is retried with the rest
+            sent[0] += _original_Socket.send_many(self, messages[sent[0]:], flags, copy)
+            if sent[0] < len(messages):
+                raise ZMQError(EAGAIN)
+            return sent[0]
+        return self._add_op(self._send_queue, send_rest, (), flags, dict(copy=copy))
+
+    def recv_many(self, max_messages, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_many, max_messages,
+                                 flags, copy, track)
+        return self._add_op(self._recv_queue, _recv_some(_original_Socket.recv_many),
+                            (max_messages,), flags, dict(copy=copy, track=track))
+
+    def recv_multipart_many(self, max_messages, flags=0, copy=True, track=False):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_multipart_many, max_messages,
+                                 flags, copy, track)
+        return self._add_op(self._recv_queue,
+                            _recv_some(_original_Socket.recv_multipart_many),
+                            (max_messages,), flags, dict(copy=copy, track=track))
+
+    def recv_into(self, buffer, flags=0):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_into, buffer, flags)
+        return self._add_op(self._recv_queue, _original_Socket.recv_into,
+                            (buffer,), flags, {})
+
+    def recv_multipart_into(self, buffer, flags=0):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_multipart_into, buffer, flags)
+        return self._add_op(self._recv_queue, _original_Socket.recv_multipart_into,
+                            (buffer,), flags, {})
+
+    def recv_records(self, records, flags=0):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_records, records, flags)
+        return self._add_op(self._recv_queue, _recv_some(_original_Socket.recv_records),
+                            (records,), flags, {})
+
+    def recv_string(self, flags=0, encoding='utf-8'):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_string, flags, encoding)
+        return _chain(self._loop, self.recv(flags), lambda msg: msg.decode(encoding))
+
+    def recv_pyobj(self, flags=0):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_pyobj, flags)
+        # take the whole message, in case it has out-of-band buffers
+        serializer = get_serializer('pickle')
+        return _chain(self._loop, self.recv_multipart(flags, copy=False),
+                      serializer.deserialize)
+
+    def recv_json(self, flags=0):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_json, flags)
+        return _chain(self._loop, self.recv(flags), pysocket.jsonapi.loads)
+
+    def recv_serialized(self, flags=0, serializer=None):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_serialized, flags, serializer)
+        if serializer is None:
+            serializer = self.serializer
+        serializer = get_serializer(serializer)
+        return _chain(self._loop, self.recv_multipart(flags, copy=serializer.copy),
+                      serializer.deserialize)
+
+    def recv_array(self, flags=0, out=None):
+        if flags & NOBLOCK:
+            return self._noblock(_original_Socket.recv_array, flags, out)
+        return _chain(self._loop, self.recv_multipart(flags, copy=False),
+                      lambda frames: deserialize_array(frames, out=out))
+
+    def poll(self, timeout=None, flags=POLLIN):
+        """s.poll(timeout=None, flags=POLLIN)
+
+        Return a Future for the events the socket is ready for.
+
+        The Future's result is 0 if `timeout` (in milliseconds) passes first.
+        """
+        if self.closed:
+            raise ZMQError(ENOTSUP)
+        future = self._loop.create_future()
+        events = self.getsockopt(EVENTS) & flags
+        if events or timeout == 0:
+            future.set_result(events)
+            return future
+
+        def on_events(events):
+            if events & flags and not future.done():
+                future.set_result(events & flags)
+        self._add_watcher(future, on_events)
+        _finish_poll(future, self._loop, timeout,
+                     lambda : self._remove_watcher(future, on_events))
+        return future
+
+
+def _finish_poll(future, loop, timeout, cleanup):
+    """Time out an async poll Future, and clean up when it is done."""
+    if timeout is not None and timeout >= 0:
+        def expire():
+            if not future.done():
+                future.set_result(0)
+        handle = loop.call_later(1e-3 * timeout, expire)
+    else:
+        handle = None
+
+    def done(f):
+        if handle is not None:
+            handle.cancel()
+        cleanup()
+    future.add_done_callback(done)
+
+
+# loop -> {(fd, writer): [callback]}, for fds watched by async polls
+_fd_callbacks = weakref.WeakKeyDictionary()
+
+def _add_fd_callback(loop, fd, writer, callback):
+    """Call `callback` when fd is readable, or writable if `writer`.
+
+    asyncio allows only one reader and one writer per fd, so every poll
+    waiting on an fd shares one that calls all of their callbacks.
+    """
+    fds = _fd_callbacks.setdefault(loop, {})
+    key = (fd, writer)
+    callbacks = fds.get(key)
+    if callbacks is None:
+        callbacks = fds[key] = []
+        def dispatch():
+            for cb in list(callbacks):
+                cb()
+        if writer:
+            loop.add_writer(fd, dispatch)
+        else:
+            loop.add_reader(fd, dispatch)
+    callbacks.append(callback)
+
+def _remove_fd_callback(loop, fd, writer, callback):
+    """Undo _add_fd_callback, stopping the watch when nobody is left."""
+    fds = _fd_callbacks.get(loop, {})
+    key = (fd, writer)
+    callbacks = fds.get(key)
+    if callbacks is None:
+        return
+    try:
+        callbacks.remove(callback)
+    except ValueError:
+        pass
+    if not callbacks:
+        del fds[key]
+        if writer:
+            loop.remove_writer(fd)
+        else:
+            loop.remove_reader(fd)
+
+
+class _Context(_original_Context):
+    """Replacement for :class:`zmq.core.context.Context`
+
+    Ensures that the asyncio Socket above is used in calls to `socket`.
+    """
+    _socket_class = _Socket
+
+
+class _Poller(_original_Poller):
+    """asyncio version of :class:`zmq.core.poll.Poller`
+
+    `poll` returns a Future for the list of ``(socket, flags)`` events,
+    instead of blocking.  It can watch asyncio Sockets, plain 0MQ Sockets
+    and native fds, all on the current event loop.  Any number of polls
+    may wait on the same fd, but plain Sockets and fds must not also have
+    a reader or writer of their own on the loop.
+    """
+
+    def poll(self, timeout=None):
+        """p.poll(timeout=None)
+
+        Return a Future for the events on the registered sockets.
+
+        The Future's result is an empty list if `timeout` (in milliseconds)
+        passes first.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        events = super(_Poller, self).poll(0)
+        if events or timeout == 0:
+            future.set_result(events)
+            return future
+
+        def check(*args):
+            if future.done():
+                return
+            try:
+                events = _original_Poller.poll(self, 0)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                if events:
+                    future.set_result(events)
+
+        # (fd, writer) watched with _add_fd_callback
+        fds = []
+        watched = []
+        for socket, flags in self.sockets.items():
+            if isinstance(socket, _Socket):
+                # the socket has its own reader on zmq.FD
+                socket._add_watcher(future, check)
+                watched.append(socket)
+            elif isinstance(socket, _original_Socket):
+                fds.append((socket.getsockopt(FD), False))
+            else:
+                fd = socket if isinstance(socket, int) else socket.fileno()
+                if flags & POLLIN:
+                    fds.append((fd, False))
+                if flags & POLLOUT:
+                    fds.append((fd, True))
+        for fd, writer in fds:
+            _add_fd_callback(loop, fd, writer, check)
+
+        def cleanup():
+            for socket in watched:
+                socket._remove_watcher(future, check)
+            for fd, writer in fds:
+                _remove_fd_callback(loop, fd, writer, check)
+        _finish_poll(future, loop, timeout, cleanup)
+        return future
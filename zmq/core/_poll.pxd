@@ -0,0 +1,46 @@
+"""0MQ Poller class declaration."""
+
+#
+#    Copyright (c) 2010-2012 Brian E. Granger & Min Ragan-Kelley
+#
+#    This file is part of pyzmq.
+#
+#    pyzmq is free software; you can redistribute it and/or modify it under
+#    the terms of the Lesser GNU General Public License as published by
+#    the Free Software Foundation; either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    pyzmq is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    Lesser GNU General Public License for more details.
+#
+#    You should have received a copy of the Lesser GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+from libzmq cimport zmq_pollitem_t
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+
+cdef class Poller:
+    """A stateful poll interface that mirrors Python's built-in poll."""
+
+    cdef zmq_pollitem_t *_items  # The pollitem array passed to zmq_poll.
+    cdef int _nitems             # The number of registered items.
+    cdef int _nalloc             # The number of items allocated.
+    cdef list _objects           # The registered object at each index.
+    cdef list _results           # The object poll returns for each index.
+    cdef dict _index             # Registered objects -> index in _items.
+    cdef readonly dict sockets   # Registered objects -> flags.
+    cdef unsigned long _closed   # sockets_closed() when the items were last checked.
+
+    cdef int _grow(self) except -1
+    cdef int _refresh(self) except -1
@@ -23,10 +23,14 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+from libc.stdlib cimport realloc, free
+
 from libzmq cimport zmq_poll, zmq_pollitem_t, allocate, ZMQ_VERSION_MAJOR
-from socket cimport Socket
+from socket cimport Socket, sockets_closed
+from message cimport release_deferred_frames
 
 import sys
+from zmq.core.constants import POLLIN, POLLOUT, ENOTSOCK
 from zmq.core.error import ZMQError
 
 #-----------------------------------------------------------------------------
@@ -39,6 +43,48 @@ if sys.version_info[0] >= 3:
 else:
     int_t = (int,long)
 
+cdef object _fill_pollitem(zmq_pollitem_t *item, object s, short events):
+    """Fill a pollitem for a 0MQ socket, integer fd or object with fileno().
+
+    Returns the object poll results are reported with: the socket itself
+    for 0MQ sockets, the integer fd otherwise.
+    """
+    cdef Socket current_socket
+    if isinstance(s, Socket):
+        current_socket = s
+        item.socket = current_socket.handle
+        item.fd = 0
+        result = s
+    elif isinstance(s, int_t):
+        item.socket = NULL
+        item.fd = s
+        result = s
+    elif hasattr(s, 'fileno'):
+        try:
+            fileno = int(s.fileno())
+        except:
+            raise ValueError('fileno() must return an valid integer fd')
+        else:
+            item.socket = NULL
+            item.fd = fileno
+            result = fileno
+    else:
+        raise TypeError(
+            "Socket must be a 0MQ socket, an integer fd or have "
+            "a fileno() method: %r" % s
+        )
+    item.events = events
+    item.revents = 0
+    return result
+
+cdef inline long _timeout_arg(long timeout):
+    """Scale a timeout in ms to the units zmq_poll expects."""
+    if ZMQ_VERSION_MAJOR < 3 and timeout > 0:
+        # timeout is us in 2.x, ms in 3.x
+        # expected input is ms (matches 3.x)
+        timeout = 1000*timeout
+    return timeout
+
 def _poll(sockets, long timeout=-1):
     """_poll(sockets, timeout=-1)
 
@@ -58,62 +104,206 @@ def _poll(sockets, long timeout=-1):
     cdef int rc, i
     cdef zmq_pollitem_t *pollitems = NULL
     cdef int nsockets = len(sockets)
-    cdef Socket current_socket
     pollitems_o = allocate(nsockets*sizeof(zmq_pollitem_t),<void**>&pollitems)
-    if ZMQ_VERSION_MAJOR < 3:
-        # timeout is us in 2.x, ms in 3.x
-        # expected input is ms (matches 3.x)
-        timeout = 1000*timeout
+    timeout = _timeout_arg(timeout)
 
+    returned = []
     for i in range(nsockets):
-        s = sockets[i][0]
-        events = sockets[i][1]
-        if isinstance(s, Socket):
-            current_socket = s
-            pollitems[i].socket = current_socket.handle
-            pollitems[i].events = events
-            pollitems[i].revents = 0
-        elif isinstance(s, int_t):
-            pollitems[i].socket = NULL
-            pollitems[i].fd = s
-            pollitems[i].events = events
-            pollitems[i].revents = 0
-        elif hasattr(s, 'fileno'):
-            try:
-                fileno = int(s.fileno())
-            except:
-                raise ValueError('fileno() must return an valid integer fd')
-            else:
-                pollitems[i].socket = NULL
-                pollitems[i].fd = fileno
-                pollitems[i].events = events
-                pollitems[i].revents = 0
-        else:
-            raise TypeError(
-                "Socket must be a 0MQ socket, an integer fd or have "
-                "a fileno() method: %r" % s
-            )
+        s, events = sockets[i]
+        returned.append(_fill_pollitem(&pollitems[i], s, events))
 
     with nogil:
         rc = zmq_poll(pollitems, nsockets, timeout)
     if rc == -1:
         raise ZMQError()
+    # release zero-copy buffers 0MQ finished with while we were waiting
+    release_deferred_frames()
 
     results = []
     for i in range(nsockets):
-        s = sockets[i][0]
-        # Return the fd for sockets, for compat. with select.poll.
-        if hasattr(s, 'fileno'):
-            s = s.fileno()
         revents = pollitems[i].revents
         # Only return sockets with non-zero status for compat. with select.poll.
         if revents > 0:
-            results.append((s, revents))
+            # Return the fd for sockets, for compat. with select.poll.
+            results.append((returned[i], revents))
 
     return results
 
+
+cdef class Poller:
+    """Poller()
+
+    A stateful poll interface that mirrors Python's built-in poll.
+
+    The pollitem array passed to zmq_poll is kept between polls, and only
+    updated by register/modify/unregister, so each poll only has to call
+    zmq_poll and collect the results.
+    """
+
+    def __cinit__(self):
+        self._items = NULL
+        self._nitems = 0
+        self._nalloc = 0
+        self._objects = []
+        self._results = []
+        self._index = {}
+        self.sockets = {}
+        self._closed = sockets_closed()
+
+    def __dealloc__(self):
+        if self._items != NULL:
+            free(self._items)
+            self._items = NULL
+
+    cdef int _grow(self) except -1:
+        """Make room for one more pollitem."""
+        cdef int nalloc
+        cdef zmq_pollitem_t *items
+        if self._nitems < self._nalloc:
+            return 0
+        nalloc = max(2*self._nalloc, 8)
+        items = <zmq_pollitem_t *>realloc(self._items, nalloc*sizeof(zmq_pollitem_t))
+        if items == NULL:
+            raise MemoryError()
+        self._items = items
+        self._nalloc = nalloc
+        return 0
+
+    cdef int _refresh(self) except -1:
+        """Check registered 0MQ sockets are still open before polling them.
+
+        This is only done after a Socket has been closed, so polling
+        doesn't have to look at every socket each time.
+        """
+        cdef int i
+        cdef unsigned long closed
+        cdef Socket s
+        closed = sockets_closed()
+        if closed == self._closed:
+            return 0
+        for i in range(self._nitems):
+            if self._items[i].socket != NULL:
+                s = self._objects[i]
+                if s.handle == NULL:
+                    raise ZMQError(ENOTSOCK)
+        self._closed = closed
+        return 0
+
+    def register(self, socket, flags=POLLIN|POLLOUT):
+        """p.register(socket, flags=POLLIN|POLLOUT)
+
+        Register a 0MQ socket or native fd for I/O monitoring.
+        
+        register(s,0) is equivalent to unregister(s).
+
+        Parameters
+        ----------
+        socket : zmq.Socket or native socket
+            A zmq.Socket or any Python object having a ``fileno()`` 
+            method that returns a valid file descriptor.
+        flags : int
+            The events to watch for.  Can be POLLIN, POLLOUT or POLLIN|POLLOUT.
+            If `flags=0`, socket will be unregistered.
+        """
+        cdef int idx
+        if flags:
+            if socket in self._index:
+                idx = self._index[socket]
+                self._items[idx].events = flags
+            else:
+                self._grow()
+                idx = self._nitems
+                result = _fill_pollitem(&self._items[idx], socket, flags)
+                self._objects.append(socket)
+                self._results.append(result)
+                self._index[socket] = idx
+                self._nitems += 1
+            self.sockets[socket] = flags
+        elif socket in self.sockets:
+            # uregister sockets registered with no events
+            self.unregister(socket)
+        else:
+            # ignore new sockets with no events
+            pass
+
+    def modify(self, socket, flags=POLLIN|POLLOUT):
+        """p.modify(socket, flags=POLLIN|POLLOUT)
+
+        Modify the flags for an already registered 0MQ socket or native fd.
+        """
+        self.register(socket, flags)
+
+    def unregister(self, socket):
+        """p.unregister(socket)
+
+        Remove a 0MQ socket or native fd for I/O monitoring.
+
+        Parameters
+        ----------
+        socket : Socket
+            The socket instance to stop polling.
+        """
+        cdef int idx, last
+        idx = self._index.pop(socket)
+        del self.sockets[socket]
+        last = self._nitems - 1
+        if idx != last:
+            # move the last item into the hole
+            self._items[idx] = self._items[last]
+            moved = self._objects[last]
+            self._objects[idx] = moved
+            self._results[idx] = self._results[last]
+            self._index[moved] = idx
+        self._objects.pop()
+        self._results.pop()
+        self._nitems = last
+
+    def poll(self, timeout=None):
+        """p.poll(timeout=None)
+
+        Poll the registered 0MQ or native fds for I/O.
+
+        Parameters
+        ----------
+        timeout : float, int
+            The timeout in milliseconds. If None, no `timeout` (infinite). This
+            is in milliseconds to be compatible with ``select.poll()``. The
+            underlying zmq_poll uses microseconds and we convert to that in
+            this function.
+
+        Returns
+        -------
+        events : list of tuples
+            A list of (socket, flags) for every socket with events. Native
+            sockets are reported by their integer fd, as in ``select.poll()``.
+        """
+        cdef int rc, i
+        cdef long timeout_c
+        if timeout is None:
+            timeout = -1
+        timeout_c = int(timeout)
+        if timeout_c < 0:
+            timeout_c = -1
+        timeout_c = _timeout_arg(timeout_c)
+
+        self._refresh()
+        with nogil:
+            rc = zmq_poll(self._items, self._nitems, timeout_c)
+        if rc == -1:
+            raise ZMQError()
+        # release zero-copy buffers 0MQ finished with while we were waiting
+        release_deferred_frames()
+
+        results = []
+        if rc == 0:
+            return results
+        for i in range(self._nitems):
+            if self._items[i].revents > 0:
+                results.append((self._results[i], self._items[i].revents))
+        return results
+
 #-----------------------------------------------------------------------------
 # Symbols to export
 #-----------------------------------------------------------------------------
 
-__all__ = [ '_poll' ]
+__all__ = [ 'Poller', '_poll' ]
@@ -37,4 +37,5 @@ cdef class Context:
     
     cdef public dict sockopts   # dict to store default sockopts
     cdef dict _attrs            # dict needed for *non-sockopt* get/setattr in subclasses
+    cdef public int copy_threshold  # default copy_threshold for new sockets
 
@@ -37,6 +37,12 @@ from constants import *
 
 _instance = None
 
+# Non-copying sends of messages smaller than this are copied, because
+# building a Frame costs more than the copy.  The crossover depends on the
+# machine, so it is off (0) by default: measure it with
+# perf/copy_threshold.py, and set Context.copy_threshold to the result.
+COPY_THRESHOLD = 0
+
 cdef class Context:
     """Context(io_threads=1)
 
@@ -46,6 +52,12 @@ cdef class Context:
     ----------
     io_threads : int
         The number of IO threads.
+
+    Attributes
+    ----------
+    copy_threshold : int
+        The default `copy_threshold` of Sockets created by this Context,
+        0 (off) by default.
     """
     
     def __cinit__(self, int io_threads=1):
@@ -67,6 +79,7 @@ cdef class Context:
         
         self.sockopts = {}
         self._attrs = {}
+        self.copy_threshold = COPY_THRESHOLD
 
     def __del__(self):
         """deleting a Context should terminate it, without trying non-threadsafe destroy"""
@@ -218,6 +231,9 @@ cdef class Context:
     
     def __setattr__(self, key, value):
         """set default sockopts as attributes"""
+        if key == 'copy_threshold':
+            self.copy_threshold = value
+            return
         try:
             opt = getattr(constants, key.upper())
         except AttributeError:
@@ -34,7 +34,14 @@ cdef class MessageTracker(object):
 
     cdef set events  # Message Event objects to track.
     cdef set peers   # Other Message or MessageTracker objects.
-    
+    cdef Py_ssize_t _pending  # Number of messages and peers not yet done.
+    cdef object _cond         # Condition for wait, created on first use.
+    cdef list _callbacks      # Callables to run when done.
+
+    cdef int _add(self) except -1     # Track one more message.
+    cdef int _release(self) except -1 # One tracked message is done.
+    cdef int _finish(self) except -1  # Wake waiters and run callbacks.
+
 
 cdef class Frame:
     """A Message Frame class for non-copy send/recvs."""
@@ -44,7 +51,6 @@ cdef class Frame:
     cdef object _buffer    # A Python Buffer/View of the message contents
     cdef object _bytes     # A bytes/str copy of the message.
     cdef bint _failed_init # Flag to handle failed zmq_msg_init
-    cdef public object tracker_event  # Event for use with zmq_free_fn.
     cdef public object tracker        # MessageTracker object.
     cdef public bint more             # whether RCVMORE was set
 
@@ -52,3 +58,4 @@ cdef class Frame:
     cdef object _getbuffer(self) # Construct self._buffer.
 
 cdef inline object copy_zmq_msg_bytes(zmq_msg_t *zmq_msg)
+cdef Py_ssize_t release_deferred_frames() except -1
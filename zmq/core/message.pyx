@@ -29,6 +29,7 @@ cdef extern from "pyversion_compat.h":
 
 from cpython cimport PyBytes_FromStringAndSize
 from cpython cimport Py_DECREF, Py_INCREF
+from libc.stdlib cimport free
 
 from buffers cimport asbuffer_r, viewfromobject_r
 
@@ -37,7 +38,18 @@ cdef extern from "Python.h":
 
 from libzmq cimport *
 
+cdef extern from "deferred_free.h" nogil:
+    ctypedef struct deferred_node:
+        void *hint
+        deferred_node *next
+    int deferred_push(void *hint)
+    deferred_node *deferred_take()
+    void deferred_done(long n)
+    long deferred_pending()
+
+import logging
 import time
+from threading import Condition
 
 try:
     # below 3.3
@@ -57,13 +69,102 @@ from zmq.utils.strtypes import bytes,unicode,basestring
 cdef void free_python_msg(void *data, void *hint) with gil:
     """A function for DECREF'ing Python based messages."""
     if hint != NULL:
-        tracker_event = (<tuple>hint)[1]
+        tracker = (<tuple>hint)[1]
         Py_DECREF(<object>hint)
-        if isinstance(tracker_event, Event):
-            # don't assert before DECREF:
-            # assert tracker_queue.empty(), "somebody else wrote to my Queue!"
-            tracker_event.set()
-        tracker_event = None
+        if tracker is not None:
+            (<MessageTracker>tracker)._release()
+        tracker = None
+
+cdef void free_python_msg_deferred(void *data, void *hint) nogil:
+    """A function for releasing untracked Python based messages later.
+
+    Rather than acquiring the GIL in the IO thread, the hint is pushed onto
+    a lock-free stack, to be DECREF'd by release_deferred().
+    """
+    if hint != NULL:
+        if deferred_push(hint) != 0:
+            # out of memory, release it now
+            free_python_msg(data, hint)
+
+# whether untracked Frames are released with free_python_msg_deferred
+cdef bint _deferred_release = False
+# total number of deferred releases done so far
+cdef Py_ssize_t _deferred_released = 0
+
+cdef Py_ssize_t _release_deferred() except -1:
+    """DECREF every message buffer pushed by free_python_msg_deferred."""
+    global _deferred_released
+    cdef deferred_node *node
+    cdef deferred_node *next_node
+    cdef long n=0
+    with nogil:
+        node = deferred_take()
+    while node != NULL:
+        next_node = node.next
+        Py_DECREF(<object>node.hint)
+        free(node)
+        node = next_node
+        n += 1
+    if n:
+        deferred_done(n)
+        _deferred_released += n
+    return n
+
+cdef Py_ssize_t release_deferred_frames() except -1:
+    """Cheap check for deferred releases, for calling on every send or poll."""
+    if deferred_pending():
+        return _release_deferred()
+    return 0
+
+def set_deferred_release(enabled=True):
+    """set_deferred_release(enabled=True)
+
+    Release zero-copy message buffers in batches, rather than one at a time.
+
+    By default, when 0MQ is done with the buffer of an untracked non-copying
+    send, the IO thread acquires the GIL to DECREF it. With deferred release,
+    the IO thread only records the buffer, and the buffers are DECREF'd in
+    batches by the next send or poll, or by calling `release_deferred`.
+    This avoids contention for the GIL at high rates of non-copying sends,
+    at the cost of holding on to buffers a little longer.
+
+    Tracked messages are always released immediately.
+    This only affects Frames created after it is called.
+    """
+    global _deferred_release
+    _deferred_release = bool(enabled)
+    if not enabled:
+        _release_deferred()
+
+def release_deferred():
+    """release_deferred()
+
+    Release every zero-copy buffer that 0MQ is done with, but which has
+    not been released yet, when using `set_deferred_release`.
+
+    Returns
+    -------
+    n : int
+        The number of buffers released.
+    """
+    return _release_deferred()
+
+def deferred_release_stats():
+    """deferred_release_stats()
+
+    Counters for deferred release of zero-copy buffers.
+
+    Returns
+    -------
+    stats : dict
+        with keys 'enabled', 'pending' (buffers waiting to be released),
+        and 'released' (buffers released so far).
+    """
+    return dict(
+        enabled=bool(_deferred_release),
+        pending=deferred_pending(),
+        released=_deferred_released,
+    )
 
 cdef inline object copy_zmq_msg_bytes(zmq_msg_t *zmq_msg):
     """ Copy the data from a zmq_msg_t """
@@ -86,6 +187,10 @@ cdef class MessageTracker(object):
     a single 0MQ message can be sent multiple times using different sockets.
     This class allows you to track all of the 0MQ usages of a message.
 
+    A MessageTracker is a count of the messages it is waiting for, so one
+    tracker can be shared by any number of Frames (``Frame(data, track=mt)``),
+    and waiting on it takes a single wakeup, however many messages it tracks.
+
     Parameters
     ----------
     *towatch : tuple of Event, MessageTracker, Message instances.
@@ -108,29 +213,93 @@ cdef class MessageTracker(object):
         """
         self.events = set()
         self.peers = set()
+        self._pending = 0
+        self._cond = None
+        self._callbacks = []
         for obj in towatch:
             if isinstance(obj, Event):
                 self.events.add(obj)
             elif isinstance(obj, MessageTracker):
-                self.peers.add(obj)
+                self._add_peer(obj)
             elif isinstance(obj, Frame):
                 if not obj.tracker:
                     raise ValueError("Not a tracked message")
-                self.peers.add(obj.tracker)
+                self._add_peer(obj.tracker)
             else:
                 raise TypeError("Require Events or Message Frames, not %s"%type(obj))
-    
+
+    def _add_peer(self, MessageTracker peer):
+        """Track another MessageTracker, which notifies us when it is done."""
+        if peer in self.peers:
+            return
+        self.peers.add(peer)
+        if peer._pending:
+            self._add()
+            peer._callbacks.append(self._peer_done)
+
+    def _peer_done(self, peer):
+        self._release()
+
+    cdef int _add(self) except -1:
+        self._pending += 1
+        return 0
+
+    cdef int _release(self) except -1:
+        # only called with the GIL held, so the count can't race
+        self._pending -= 1
+        if self._pending == 0:
+            self._finish()
+        return 0
+
+    cdef int _finish(self) except -1:
+        cond = self._cond
+        if cond is not None:
+            with cond:
+                cond.notify_all()
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.error("Exception in MessageTracker callback %r",
+                              callback, exc_info=True)
+        return 0
+
+    @property
+    def pending(self):
+        """The number of tracked messages and trackers that are not done.
+
+        Legacy Events passed to the constructor are not counted.
+        """
+        return self._pending
+
     @property
     def done(self):
         """Is 0MQ completely done with the message(s) being tracked?"""
+        if self._pending:
+            return False
         for evt in self.events:
             if not evt.is_set():
                 return False
-        for pm in self.peers:
-            if not pm.done:
-                return False
         return True
-    
+
+    def add_done_callback(self, callback):
+        """mt.add_done_callback(callback)
+
+        Call ``callback(mt)`` when 0MQ is done with the tracked messages.
+
+        If the tracker is already done, `callback` is called immediately.
+        Otherwise it is called in whichever thread finishes the last message,
+        which is usually the 0MQ IO thread, so callbacks should be short,
+        and should hand off to their own thread or loop,
+        e.g. with ``IOLoop.add_callback``. Legacy Events are not waited for.
+        """
+        if self._pending:
+            self._callbacks.append(callback)
+        else:
+            callback(self)
+
     def wait(self, timeout=-1):
         """mt.wait(timeout=-1)
 
@@ -151,34 +320,54 @@ cdef class MessageTracker(object):
         NotDone
             if `timeout` reached before I am done.
         """
-        tic = time.time()
         if timeout is False or timeout < 0:
-            remaining = 3600*24*7 # a week
-        else:
-            remaining = timeout
-        done = False
+            timeout = None
+        deadline = None if timeout is None else time.time() + timeout
+
         for evt in self.events:
-            if remaining < 0:
-                raise NotDone
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
             evt.wait(timeout=remaining)
             if not evt.is_set():
                 raise NotDone
-            toc = time.time()
-            remaining -= (toc-tic)
-            tic = toc
-        
-        for peer in self.peers:
-            if remaining < 0:
-                raise NotDone
-            peer.wait(timeout=remaining)
-            toc = time.time()
-            remaining -= (toc-tic)
-            tic = toc
-    
-    def old_wait(self):
-        """If the new wait works, remove this method."""
-        while not self.done:
-            time.sleep(.001)
+
+        if not self._pending:
+            return
+        if self._cond is None:
+            self._cond = Condition()
+        cond = self._cond
+        with cond:
+            while self._pending:
+                if deadline is None:
+                    # wait in chunks, so that KeyboardInterrupt works
+                    cond.wait(3600)
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise NotDone
+                    cond.wait(remaining)
+
+    @classmethod
+    def wait_all(cls, towatch, timeout=-1):
+        """MessageTracker.wait_all(towatch, timeout=-1)
+
+        Wait for 0MQ to be done with a group of messages or until `timeout`.
+
+        This waits on a single tracker for the whole group, so it wakes
+        once, when the last message is done, rather than once per message.
+
+        Parameters
+        ----------
+        towatch : iterable of Event, MessageTracker, Message instances.
+            The objects to wait for, as for the MessageTracker constructor.
+        timeout : float [default: -1, wait forever]
+            Maximum time in (s) to wait before raising NotDone.
+
+        Raises
+        ------
+        NotDone
+            if `timeout` reached before all are done.
+        """
+        cls(*towatch).wait(timeout)
 
 
 cdef class Frame:
@@ -201,10 +390,10 @@ cdef class Frame:
     data : object, optional
         any object that provides the buffer interface will be used to
         construct the 0MQ message data.
-    track : bool [default: False]
+    track : bool or MessageTracker [default: False]
         whether a MessageTracker_ should be created to track this object.
-        Tracking a message has a cost at creation, because it creates a threadsafe
-        Event object.
+        If a MessageTracker is given, this Frame is added to it, so that
+        one tracker can be shared by many Frames.
     
     """
 
@@ -213,6 +402,7 @@ cdef class Frame:
         cdef char *data_c = NULL
         cdef Py_ssize_t data_len_c=0
         cdef object hint
+        cdef zmq_free_fn *free_fn
 
         # init more as False
         self.more = False
@@ -223,13 +413,12 @@ cdef class Frame:
         self._buffer = None       # buffer view of data
         self._bytes = None        # bytes copy of data
 
-        # Event and MessageTracker for monitoring when zmq is done with data:
-        if track:
-            evt = Event()
-            self.tracker_event = evt
-            self.tracker = MessageTracker(evt)
+        # MessageTracker for monitoring when zmq is done with data:
+        if isinstance(track, MessageTracker):
+            self.tracker = track
+        elif track:
+            self.tracker = MessageTracker()
         else:
-            self.tracker_event = None
             self.tracker = None
 
         if isinstance(data, unicode):
@@ -247,16 +436,22 @@ cdef class Frame:
         # We INCREF the *original* Python object (not self) and pass it
         # as the hint below. This allows other copies of this Frame
         # object to take over the ref counting of data properly.
-        hint = (data, self.tracker_event)
+        hint = (data, self.tracker)
         Py_INCREF(hint)
+        if _deferred_release and self.tracker is None:
+            free_fn = <zmq_free_fn *>free_python_msg_deferred
+        else:
+            free_fn = <zmq_free_fn *>free_python_msg
         with nogil:
             rc = zmq_msg_init_data(
                 &self.zmq_msg, <void *>data_c, data_len_c, 
-                <zmq_free_fn *>free_python_msg, <void *>hint
+                free_fn, <void *>hint
             )
         if rc != 0:
             Py_DECREF(hint)
             raise ZMQError()
+        if self.tracker is not None:
+            (<MessageTracker>self.tracker)._add()
         self._failed_init = False
     
     def __init__(self, object data=None, track=False):
@@ -342,8 +537,7 @@ cdef class Frame:
         if self._bytes is not None:
             new_msg._bytes = self._bytes
 
-        # Frame copies share the tracker and tracker_event
-        new_msg.tracker_event = self.tracker_event
+        # Frame copies share the tracker
         new_msg.tracker = self.tracker
 
         return new_msg
@@ -400,4 +594,5 @@ cdef class Frame:
 # legacy Message name
 Message = Frame
 
-__all__ = ['MessageTracker', 'Frame', 'Message']
+__all__ = ['MessageTracker', 'Frame', 'Message', 'set_deferred_release',
+           'release_deferred', 'deferred_release_stats']
@@ -23,48 +23,156 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import select as select_mod
+import sys
+
 import zmq
-from zmq.core._poll import _poll
-from zmq.core.constants import POLLIN, POLLOUT, POLLERR
+from zmq.core._poll import _poll, Poller
+from zmq.core.constants import POLLIN, POLLOUT, POLLERR, FD, EVENTS
+from zmq.core.message import release_deferred
+from zmq.core.socket import Socket
 
 #-----------------------------------------------------------------------------
 # Polling related methods
 #-----------------------------------------------------------------------------
 
+# version-independent typecheck for int/long
+if sys.version_info[0] >= 3:
+    int_t = int
+else:
+    int_t = (int,long)
+
+
+class EpollPoller(object):
+    """EpollPoller()
+
+    A Poller that scales with the number of active sockets, using epoll.
 
-class Poller(object):
-    """Poller()
+    This has the same interface as Poller, but rather than passing every
+    registered socket to zmq_poll, each 0MQ socket's ``zmq.FD`` and each
+    native fd is registered with ``select.epoll``, so idle sockets cost
+    nothing per poll.
 
-    A stateful poll interface that mirrors Python's built-in poll.
+    The ``zmq.FD`` of a 0MQ socket only signals that its state may have
+    changed, so ``zmq.EVENTS`` is checked for sockets whose FD fired.
+    Using a socket, e.g. to send or receive, can consume that signal, so
+    sockets that were reported by the previous poll, passed to register or
+    modify, or used in any way since, are checked again on the next poll.
+
+    Only available where ``select.epoll`` is (Linux).  Elsewhere,
+    creating one raises ImportError.
     """
 
     def __init__(self):
+        if not hasattr(select_mod, 'epoll'):
+            raise ImportError("epoll is not available on this platform")
+        self._epoll = select_mod.epoll()
         self.sockets = {}
+        # fd -> registered object
+        self._fds = {}
+        # registered object -> (fd, object reported by poll)
+        self._registered = {}
+        # 0MQ sockets whose EVENTS must be checked on the next poll.
+        # Registered sockets add themselves to it when they are used.
+        self._recheck = set()
+
+    def fileno(self):
+        """The fd of the underlying epoll object."""
+        return self._epoll.fileno()
+
+    def close(self):
+        """Close the underlying epoll object."""
+        for socket in self._registered:
+            if isinstance(socket, Socket):
+                self._detach(socket)
+        self._epoll.close()
+
+    def _detach(self, socket):
+        """Stop a 0MQ socket adding itself to our recheck set."""
+        recheck_sets = socket._recheck_sets
+        for i in range(len(recheck_sets)):
+            # by identity, since empty sets are equal
+            if recheck_sets[i] is self._recheck:
+                del recheck_sets[i]
+                break
+
+    @staticmethod
+    def _epoll_events(flags):
+        """translate zmq.POLLIN/OUT/ERR into epoll events"""
+        events = 0
+        if flags & POLLIN:
+            events |= select_mod.EPOLLIN
+        if flags & POLLOUT:
+            events |= select_mod.EPOLLOUT
+        if flags & POLLERR:
+            events |= select_mod.EPOLLERR | select_mod.EPOLLHUP
+        return events
+
+    @staticmethod
+    def _zmq_events(events):
+        """translate epoll events into zmq.POLLIN/OUT/ERR"""
+        flags = 0
+        if events & select_mod.EPOLLIN:
+            flags |= POLLIN
+        if events & select_mod.EPOLLOUT:
+            flags |= POLLOUT
+        if events & (select_mod.EPOLLERR | select_mod.EPOLLHUP):
+            flags |= POLLERR
+        return flags
 
     def register(self, socket, flags=POLLIN|POLLOUT):
         """p.register(socket, flags=POLLIN|POLLOUT)
 
         Register a 0MQ socket or native fd for I/O monitoring.
-        
+
         register(s,0) is equivalent to unregister(s).
 
         Parameters
         ----------
         socket : zmq.Socket or native socket
-            A zmq.Socket or any Python object having a ``fileno()`` 
+            A zmq.Socket or any Python object having a ``fileno()``
             method that returns a valid file descriptor.
         flags : int
             The events to watch for.  Can be POLLIN, POLLOUT or POLLIN|POLLOUT.
             If `flags=0`, socket will be unregistered.
         """
-        if flags:
-            self.sockets[socket] = flags
-        elif socket in self.sockets:
-            # uregister sockets registered with no events
-            self.unregister(socket)
+        if not flags:
+            if socket in self.sockets:
+                # uregister sockets registered with no events
+                self.unregister(socket)
+            return
+        is_zmq = isinstance(socket, Socket)
+        if socket in self._registered:
+            fd = self._registered[socket][0]
+            if not is_zmq:
+                self._epoll.modify(fd, self._epoll_events(flags))
         else:
-            # ignore new sockets with no events
-            pass
+            if is_zmq:
+                fd = socket.getsockopt(FD)
+                result = socket
+            elif isinstance(socket, int_t):
+                fd = result = socket
+            elif hasattr(socket, 'fileno'):
+                try:
+                    fd = result = int(socket.fileno())
+                except:
+                    raise ValueError('fileno() must return an valid integer fd')
+            else:
+                raise TypeError(
+                    "Socket must be a 0MQ socket, an integer fd or have "
+                    "a fileno() method: %r" % socket
+                )
+            if is_zmq:
+                # the 0MQ FD is only ever readable, whatever the events
+                self._epoll.register(fd, select_mod.EPOLLIN)
+                socket._recheck_sets.append(self._recheck)
+            else:
+                self._epoll.register(fd, self._epoll_events(flags))
+            self._fds[fd] = socket
+            self._registered[socket] = (fd, result)
+        if is_zmq:
+            self._recheck.add(socket)
+        self.sockets[socket] = flags
 
     def modify(self, socket, flags=POLLIN|POLLOUT):
         """p.modify(socket, flags=POLLIN|POLLOUT)
@@ -84,6 +192,22 @@ class Poller(object):
             The socket instance to stop polling.
         """
         del self.sockets[socket]
+        fd, result = self._registered.pop(socket)
+        del self._fds[fd]
+        if isinstance(socket, Socket):
+            self._detach(socket)
+            self._recheck.discard(socket)
+        try:
+            self._epoll.unregister(fd)
+        except (OSError, IOError):
+            # already closed
+            pass
+
+    def _check_events(self, socket, ready):
+        """Add a 0MQ socket to `ready` if EVENTS has any we want."""
+        flags = socket.getsockopt(EVENTS) & self.sockets[socket]
+        if flags:
+            ready[socket] = flags
 
     def poll(self, timeout=None):
         """p.poll(timeout=None)
@@ -94,17 +218,44 @@ class Poller(object):
         ----------
         timeout : float, int
             The timeout in milliseconds. If None, no `timeout` (infinite). This
-            is in milliseconds to be compatible with ``select.poll()``. The
-            underlying zmq_poll uses microseconds and we convert to that in
-            this function.
+            is in milliseconds to be compatible with ``select.poll()``.
         """
-        if timeout is None:
-            timeout = -1
-        
-        timeout = int(timeout)
-        if timeout < 0:
+        ready = {}
+        for socket in list(self._recheck):
+            self._check_events(socket, ready)
+
+        if timeout is None or timeout < 0:
             timeout = -1
-        return _poll(list(self.sockets.items()), timeout=timeout)
+        else:
+            # epoll takes seconds
+            timeout = 1e-3 * timeout
+        if ready:
+            # don't wait if any sockets are ready already
+            timeout = 0
+        epoll_events = self._epoll.poll(timeout)
+        # release zero-copy buffers 0MQ finished with while we were waiting
+        release_deferred()
+
+        results = []
+        for fd, events in epoll_events:
+            socket = self._fds.get(fd)
+            if socket is None:
+                continue
+            if isinstance(socket, Socket):
+                if socket in ready:
+                    continue
+                self._check_events(socket, ready)
+            else:
+                results.append((self._registered[socket][1], self._zmq_events(events)))
+
+        # our own EVENTS checks added the sockets back, but we know their
+        # state now.  Check sockets we report again next time, since the
+        # FD signal may have been consumed with the events we report.
+        self._recheck.clear()
+        for socket, flags in ready.items():
+            results.append((socket, flags))
+            self._recheck.add(socket)
+        return results
 
 
 def select(rlist, wlist, xlist, timeout=None):
@@ -164,4 +315,4 @@ def select(rlist, wlist, xlist, timeout=None):
 # Symbols to export
 #-----------------------------------------------------------------------------
 
-__all__ = [ 'Poller', 'select' ]
+__all__ = [ 'Poller', 'EpollPoller', 'select' ]
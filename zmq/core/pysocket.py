@@ -31,6 +31,9 @@ from zmq.core import constants
 from zmq.core.constants import *
 from zmq.core.error import ZMQError, ZMQBindError
 from zmq.utils import jsonapi
+from zmq.utils.serializers import (get_serializer, pickle_out_of_band,
+                                   have_pickle_buffers, serialize_array,
+                                   deserialize_array)
 from zmq.utils.strtypes import bytes,unicode,basestring
 
 try:
@@ -181,6 +184,33 @@ def send_multipart(self, msg_parts, flags=0, copy=True, track=False):
     # Send the last part without the extra SNDMORE flag.
     return self.send(msg_parts[-1], flags, copy=copy, track=track)
 
+def send_many(self, messages, flags=0, copy=True):
+    """s.send_many(messages, flags=0, copy=True)
+
+    Send a sequence of messages in one call.
+
+    Each element of `messages` is either a single sendable object, or a
+    list or tuple of them to be sent as a multipart message.
+    Sending stops at EAGAIN.
+
+    Returns
+    -------
+    nsent : int
+        The number of messages that were sent.
+    """
+    nsent = 0
+    for msg in messages:
+        if not isinstance(msg, (list, tuple)):
+            msg = [msg]
+        try:
+            self.send_multipart(msg, flags, copy=copy)
+        except ZMQError as e:
+            if e.errno != zmq.EAGAIN and not nsent:
+                raise
+            break
+        nsent += 1
+    return nsent
+
 def recv_multipart(self, flags=0, copy=True, track=False):
     """s.recv_multipart(flags=0, copy=True, track=False)
 
@@ -215,6 +245,145 @@ def recv_multipart(self, flags=0, copy=True, track=False):
     
     return parts
 
+def recv_into(self, buffer, flags=0):
+    """s.recv_into(buffer, flags=0)
+
+    Receive a message frame directly into a writable buffer.
+
+    Returns
+    -------
+    nbytes : int
+        The size of the message, which is larger than the buffer
+        if the content was truncated.
+    """
+    return _copy_into(buffer, [self.recv(flags)])[0]
+
+def recv_multipart_into(self, buffer, flags=0):
+    """s.recv_multipart_into(buffer, flags=0)
+
+    Receive a multipart message directly into a writable buffer.
+
+    Returns
+    -------
+    sizes : list of ints
+        The size of each frame.
+    """
+    return _copy_into(buffer, self.recv_multipart(flags))
+
+def _copy_into(buffer, frames):
+    """copy frames one after the other into a buffer, truncating to fit"""
+    view = memoryview(buffer)
+    if view.ndim != 1 or view.format != 'B':
+        # py3 only, for e.g. multi-dimensional arrays
+        view = view.cast('B')
+    offset = 0
+    sizes = []
+    for frame in frames:
+        n = min(len(frame), len(view) - offset)
+        view[offset:offset+n] = memoryview(frame)[:n]
+        offset += n
+        sizes.append(len(frame))
+    return sizes
+
+def recv_many(self, max_messages, flags=0, copy=True, track=False):
+    """s.recv_many(max_messages, flags=0, copy=True, track=False)
+
+    Receive up to `max_messages` message frames in one call.
+
+    The first frame is received with `flags`, the rest are drained
+    with NOBLOCK, stopping at EAGAIN.
+
+    Returns
+    -------
+    msgs : list
+        A list of at most `max_messages` frames; either Frames or bytes,
+        depending on `copy`.
+    """
+    return _recv_many(self.recv, max_messages, flags, copy, track)
+
+def recv_multipart_many(self, max_messages, flags=0, copy=True, track=False):
+    """s.recv_multipart_many(max_messages, flags=0, copy=True, track=False)
+
+    Receive up to `max_messages` complete multipart messages in one call.
+
+    The first message is received with `flags`, the rest are drained
+    with NOBLOCK, stopping at EAGAIN.
+
+    Returns
+    -------
+    msgs : list of lists
+        A list of at most `max_messages` multipart messages, each a list
+        as returned by `recv_multipart`.
+    """
+    return _recv_many(self.recv_multipart, max_messages, flags, copy, track)
+
+def _recv_many(recv, max_messages, flags, copy, track):
+    """drain up to max_messages with a recv or recv_multipart method"""
+    msgs = []
+    while len(msgs) < max_messages:
+        try:
+            msgs.append(recv(flags, copy=copy, track=track))
+        except ZMQError as e:
+            if e.errno != zmq.EAGAIN and not msgs:
+                raise
+            break
+        flags |= NOBLOCK
+    return msgs
+
+def recv_records(self, records, flags=0):
+    """s.recv_records(records, flags=0)
+
+    Receive fixed-size messages into consecutive records of an array.
+
+    The first message is received with `flags`, the rest are drained
+    with NOBLOCK, stopping at EAGAIN, or when the array is full.
+
+    Returns
+    -------
+    n : int
+        The number of records filled, from the start of `records`.
+
+    Raises
+    ------
+    ValueError
+        if a message is not `itemsize` bytes, with the number of records
+        filled before it as its `filled` attribute.
+    """
+    try:
+        itemsize = records.itemsize
+    except AttributeError:
+        raise TypeError("records must be an array with an itemsize, not %r" % type(records))
+    view = memoryview(records)
+    if view.ndim != 1 or view.format != 'B':
+        try:
+            view = view.cast('B')
+        except (TypeError, ValueError):
+            # structured NumPy arrays can't be cast, but can be viewed as bytes
+            view = memoryview(records.view('u1').reshape(-1))
+    nrecords = len(view) // itemsize
+    filled = 0
+    while filled < nrecords:
+        try:
+            frame = self.recv(flags, copy=False)
+        except ZMQError as e:
+            if e.errno != zmq.EAGAIN and not filled:
+                raise
+            break
+        if len(frame) != itemsize:
+            raise _record_size_error(len(frame), itemsize, filled)
+        start = filled * itemsize
+        view[start:start + itemsize] = frame.buffer
+        filled += 1
+        flags |= NOBLOCK
+    return filled
+
+def _record_size_error(size, itemsize, filled):
+    """a ValueError for a message of the wrong size, with the records filled before it"""
+    e = ValueError("Message of %i bytes received into records of %i bytes,"
+                   " after filling %i records" % (size, itemsize, filled))
+    e.filled = filled
+    return e
+
 def send_string(self, u, flags=0, copy=False, encoding='utf-8'):
     """s.send_string(u, flags=0, copy=False, encoding='utf-8')
 
@@ -256,8 +425,8 @@ def recv_string(self, flags=0, encoding='utf-8'):
     msg = self.recv(flags=flags, copy=False)
     return codecs.decode(msg.bytes, encoding)
 
-def send_pyobj(self, obj, flags=0, protocol=-1):
-    """s.send_pyobj(obj, flags=0, protocol=-1)
+def send_pyobj(self, obj, flags=0, protocol=-1, out_of_band=False):
+    """s.send_pyobj(obj, flags=0, protocol=-1, out_of_band=False)
 
     Send a Python object as a message using pickle to serialize.
 
@@ -271,15 +440,40 @@ def send_pyobj(self, obj, flags=0, protocol=-1):
         The pickle protocol number to use. Default of -1 will select
         the highest supported number. Use 0 for multiple platform
         support.
+    out_of_band : bool
+        Send large buffers in the object, such as the data of NumPy arrays,
+        as separate frames after the pickle, without copying them into the
+        pickle or into 0MQ.  The buffers must not be modified until they
+        have been sent.  Requires pickle protocol 5 (Python >= 3.8).
+        recv_pyobj receives these messages as usual.
     """
-    msg = pickle.dumps(obj, protocol)
+    if out_of_band:
+        frames = pickle_out_of_band(obj, protocol)
+        if len(frames) > 1:
+            return self.send_multipart(frames, flags, copy=False)
+        msg = frames[0]
+    else:
+        msg = pickle.dumps(obj, protocol)
     return self.send(msg, flags)
 
+def _out_of_band_frames(socket):
+    """Receive the out-of-band buffers of a pickle, as it asks for them.
+
+    The rest of a multipart message has already arrived, so this doesn't
+    block, and frames the pickle doesn't ask for are left unread.
+    """
+    while socket.getsockopt(RCVMORE):
+        yield socket.recv(NOBLOCK, copy=False).buffer
+
 def recv_pyobj(self, flags=0):
     """s.recv_pyobj(flags=0)
 
     Receive a Python object as a message using pickle to serialize.
 
+    If the object was sent with out-of-band buffers, they are taken from
+    the following frames of the message, and NumPy arrays are rebuilt as
+    read-only views on those frames, without copying.
+
     Parameters
     ----------
     flags : int
@@ -291,6 +485,8 @@ def recv_pyobj(self, flags=0):
         The Python object that arrives as a message.
     """
     s = self.recv(flags)
+    if have_pickle_buffers:
+        return pickle.loads(s, buffers=_out_of_band_frames(self))
     return pickle.loads(s)
 
 def send_json(self, obj, flags=0):
@@ -332,6 +528,99 @@ def recv_json(self, flags=0):
         msg = self.recv(flags)
         return jsonapi.loads(msg)
 
+def send_serialized(self, obj, flags=0, serializer=None, copy=True, track=False):
+    """s.send_serialized(obj, flags=0, serializer=None, copy=True, track=False)
+
+    Send a Python object as a message, serialized with a registered serializer.
+
+    Parameters
+    ----------
+    obj : Python object
+        The Python object to send.
+    flags : int
+        Any valid send flag.
+    serializer : str or Serializer, optional
+        The name of a serializer registered with
+        zmq.utils.serializers.register_serializer, or a Serializer.
+        The default is the socket's `serializer` attribute, which is
+        'pickle' if it is not set.
+    copy, track : bool
+        Passed to send_multipart, for the frames of the serialized object.
+    """
+    if serializer is None:
+        serializer = self.serializer
+    frames = get_serializer(serializer).serialize(obj)
+    return self.send_multipart(frames, flags, copy=copy, track=track)
+
+def recv_serialized(self, flags=0, serializer=None):
+    """s.recv_serialized(flags=0, serializer=None)
+
+    Receive a Python object as a message, serialized with a registered serializer.
+
+    Parameters
+    ----------
+    flags : int
+        Any valid recv flag.
+    serializer : str or Serializer, optional
+        The serializer the message was sent with, see send_serialized.
+
+    Returns
+    -------
+    obj : Python object
+        The Python object that arrives as a message.
+    """
+    if serializer is None:
+        serializer = self.serializer
+    serializer = get_serializer(serializer)
+    frames = self.recv_multipart(flags, copy=serializer.copy)
+    return serializer.deserialize(frames)
+
+def send_array(self, A, flags=0, copy=False, track=False):
+    """s.send_array(A, flags=0, copy=False, track=False)
+
+    Send a NumPy array, with its dtype and shape, as a multipart message.
+
+    A contiguous array is sent without copying it, so it must not be
+    modified until it has been sent (use `track` to find out when).
+    A non-contiguous array is sent as several frames, one for each
+    contiguous block, see zmq.utils.serializers.serialize_array.
+
+    Parameters
+    ----------
+    A : numpy.ndarray
+        The array to send.
+    flags : int
+        Any valid send flag.
+    copy : bool
+        Whether to copy the array data into the message.
+    track : bool
+        Whether to track the message, see send.
+    """
+    return self.send_multipart(serialize_array(A), flags, copy=copy, track=track)
+
+def recv_array(self, flags=0, out=None):
+    """s.recv_array(flags=0, out=None)
+
+    Receive a NumPy array sent with send_array.
+
+    The array is built on the received Frame without copying it, so it is
+    read-only, unless the array arrived in several frames, or `out` is given.
+
+    Parameters
+    ----------
+    flags : int
+        Any valid recv flag.
+    out : numpy.ndarray, optional
+        An array of the same shape and dtype to receive the data into.
+
+    Returns
+    -------
+    A : numpy.ndarray
+        The array that arrives as a message, which is `out` if it was given.
+    """
+    frames = self.recv_multipart(flags, copy=False)
+    return deserialize_array(frames, out=out)
+
 def poll(self, timeout=None, flags=POLLIN):
     """s.poll(timeout=None, flags=POLLIN)
 
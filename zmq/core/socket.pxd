@@ -40,8 +40,19 @@ cdef class Socket:
     cdef public Context context # The zmq Context object that owns this.
     cdef public bint _closed   # bool property for a closed socket.
     cdef dict _attrs   # dict needed for *non-sockopt* get/setattr in subclasses
+    cdef public int copy_threshold # non-copying sends of smaller messages are copied
+    cdef public object serializer # default serializer for send/recv_serialized
+    cdef public object compression # Compressor for every frame, or None
+    cdef int _compress_skip     # leading frames of each message left uncompressed
+    cdef bint _compress_envelope # leave ROUTER/DEALER envelopes uncompressed
+    cdef int _send_index        # frames sent so far of the current message
+    cdef int _recv_index        # frames received so far of the current message
+    cdef bint _send_body        # the current message's envelope has been sent
+    cdef bint _recv_body        # the current message's envelope has been received
+    cdef readonly list _recheck_sets # sets of EpollPollers to add the socket to when used
 
     # cpdef methods for direct-cython access:
     cpdef object send(self, object data, int flags=*, copy=*, track=*)
     cpdef object recv(self, int flags=*, copy=*, track=*)
 
+cdef unsigned long sockets_closed()
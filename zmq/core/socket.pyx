@@ -30,11 +30,12 @@ cdef extern from "pyversion_compat.h":
 from cpython cimport PyBytes_FromStringAndSize
 from cpython cimport PyBytes_AsString, PyBytes_Size
 from cpython cimport Py_DECREF, Py_INCREF
+from libc.stdlib cimport malloc, realloc, free
 
-from buffers cimport asbuffer_r, viewfromobject_r
+from buffers cimport asbuffer_r, asbuffer_w, viewfromobject_r
 
 from libzmq cimport *
-from message cimport Frame, copy_zmq_msg_bytes
+from message cimport Frame, MessageTracker, copy_zmq_msg_bytes, release_deferred_frames
 
 from context cimport Context
 
@@ -70,6 +71,7 @@ from zmq.core import constants, pysocket
 from zmq.core.constants import *
 from zmq.core.error import ZMQError, ZMQBindError
 from zmq.utils.strtypes import bytes,unicode,basestring
+from zmq.utils.compression import Compressor, _nbytes
 
 #-----------------------------------------------------------------------------
 # Code
@@ -77,6 +79,14 @@ from zmq.utils.strtypes import bytes,unicode,basestring
 
 IPC_PATH_MAX_LEN = get_ipc_path_max_len()
 
+# the number of Sockets closed so far, so a Poller only has to check
+# its sockets are still open after one is closed
+cdef unsigned long _sockets_closed = 0
+
+cdef unsigned long sockets_closed():
+    """The number of Sockets closed so far."""
+    return _sockets_closed
+
 # inline some small socket submethods:
 # true methods frequently cannot be inlined, acc. Cython docs
 
@@ -100,6 +110,11 @@ cdef inline _check_closed(Socket s, bint raise_notsup):
                 return True
         elif rc:
             raise ZMQError()
+    if raise_notsup and s._recheck_sets:
+        # using the socket may consume the edge on its zmq.FD,
+        # so have the EpollPollers it is registered with check it again
+        for recheck in s._recheck_sets:
+            recheck.add(s)
     return False
 
 cdef inline Frame _recv_frame(void *handle, int flags=0, track=False):
@@ -173,6 +188,588 @@ cdef inline object _send_copy(void *handle, object msg, int flags=0):
     if rc < 0 or rc2 != 0:
         raise ZMQError()
 
+cdef inline int _getsockopt_rcvmore(void *handle) nogil:
+    """Check RCVMORE without the GIL.
+
+    RCVMORE is int64 in 2.x and int in 3.x.
+    Returns 1 if more frames follow, 0 if not, -1 on error.
+    """
+    cdef int rc
+    cdef int more=0
+    cdef int64_t more64=0
+    cdef size_t sz
+    if ZMQ_VERSION_MAJOR < 3:
+        sz = sizeof(int64_t)
+        rc = zmq_getsockopt(handle, ZMQ_RCVMORE, <void *>&more64, &sz)
+        more = more64 != 0
+    else:
+        sz = sizeof(int)
+        rc = zmq_getsockopt(handle, ZMQ_RCVMORE, <void *>&more, &sz)
+    if rc < 0:
+        return -1
+    return more != 0
+
+cdef inline int _recv_frames(void *handle, int flags, zmq_msg_t **parts,
+                             Py_ssize_t *nparts, Py_ssize_t *nalloc,
+                             bint multipart) nogil:
+    """Receive one message onto the end of a growable array of zmq_msg_t.
+
+    If `multipart`, every frame of the message is received, otherwise
+    just one frame.  Frames received before an error are left in the array.
+    Returns 0 on success, or the errno of the failure.
+    """
+    cdef int rc
+    cdef int err
+    cdef int more=1
+    cdef Py_ssize_t i
+    cdef zmq_msg_t *grown = NULL
+
+    while more > 0:
+        if nparts[0] == nalloc[0]:
+            # grow the array, moving received frames over
+            grown = <zmq_msg_t *>malloc(2*nalloc[0]*sizeof(zmq_msg_t))
+            if grown == NULL:
+                return ZMQ_ENOMEM
+            for i in range(nparts[0]):
+                zmq_msg_init(&grown[i])
+                zmq_msg_move(&grown[i], &parts[0][i])
+                zmq_msg_close(&parts[0][i])
+            free(parts[0])
+            parts[0] = grown
+            nalloc[0] = 2*nalloc[0]
+        zmq_msg_init(&parts[0][nparts[0]])
+        rc = zmq_recvmsg(handle, &parts[0][nparts[0]], flags)
+        if rc < 0:
+            err = zmq_errno()
+            zmq_msg_close(&parts[0][nparts[0]])
+            return err
+        nparts[0] += 1
+        if not multipart:
+            break
+        more = _getsockopt_rcvmore(handle)
+        if more < 0:
+            return zmq_errno()
+    return 0
+
+cdef inline void _close_frames(zmq_msg_t *parts, Py_ssize_t nparts) nogil:
+    """Close every zmq_msg_t in an array from _recv_frames, and free it."""
+    cdef Py_ssize_t i
+    for i in range(nparts):
+        zmq_msg_close(&parts[i])
+    free(parts)
+
+cdef inline object _frame_object(zmq_msg_t *zmq_msg, bint copy, track, bint more):
+    """Turn a received zmq_msg_t into bytes or a Frame.
+
+    For Frames, the message is moved, leaving `zmq_msg` empty.
+    """
+    cdef Frame frame
+    if copy:
+        return copy_zmq_msg_bytes(zmq_msg)
+    frame = Frame(track=track)
+    zmq_msg_move(&frame.zmq_msg, zmq_msg)
+    frame.more = more
+    return frame
+
+cdef inline object _recv_multipart(void *handle, int flags=0, bint copy=True, track=False):
+    """Receive all frames of a multipart message, and return them as a list.
+
+    Every frame is received inside a single nogil block, and only then
+    turned into bytes or Frames.
+    """
+    cdef int err=0
+    cdef Py_ssize_t i
+    cdef Py_ssize_t nparts=0
+    cdef Py_ssize_t nalloc=8
+    cdef zmq_msg_t *parts = NULL
+
+    parts = <zmq_msg_t *>malloc(nalloc*sizeof(zmq_msg_t))
+    if parts == NULL:
+        raise MemoryError()
+
+    with nogil:
+        err = _recv_frames(handle, flags, &parts, &nparts, &nalloc, True)
+
+    try:
+        if err:
+            raise ZMQError(err)
+        msg_parts = []
+        for i in range(nparts):
+            msg_parts.append(_frame_object(&parts[i], copy, track, i < nparts-1))
+    finally:
+        with nogil:
+            _close_frames(parts, nparts)
+    return msg_parts
+
+cdef inline object _recv_into(void *handle, object buf, int flags=0, bint multipart=False):
+    """Receive a message, copying its content into a writable buffer.
+
+    Frames of a multipart message are written one after the other.
+    Content that doesn't fit in the buffer is truncated.
+    Returns the list of frame sizes, which are those of the frames
+    as sent, even if they were truncated.
+    """
+    cdef int err=0
+    cdef char *data_c = NULL
+    cdef Py_ssize_t data_len_c=0
+    cdef Py_ssize_t offset=0
+    cdef size_t n
+    cdef Py_ssize_t i
+    cdef Py_ssize_t nparts=0
+    cdef Py_ssize_t nalloc=1
+    cdef zmq_msg_t *parts = NULL
+
+    asbuffer_w(buf, <void **>&data_c, &data_len_c)
+    if multipart:
+        nalloc = 8
+    parts = <zmq_msg_t *>malloc(nalloc*sizeof(zmq_msg_t))
+    if parts == NULL:
+        raise MemoryError()
+
+    with nogil:
+        err = _recv_frames(handle, flags, &parts, &nparts, &nalloc, multipart)
+        if not err:
+            for i in range(nparts):
+                n = zmq_msg_size(&parts[i])
+                if n > <size_t>(data_len_c - offset):
+                    n = data_len_c - offset
+                memcpy(data_c + offset, zmq_msg_data(&parts[i]), n)
+                offset += n
+
+    try:
+        if err:
+            raise ZMQError(err)
+        sizes = []
+        for i in range(nparts):
+            sizes.append(zmq_msg_size(&parts[i]))
+    finally:
+        with nogil:
+            _close_frames(parts, nparts)
+    return sizes
+
+cdef inline bint _in_envelope(part, bint more, bint *body):
+    """Whether a frame of a ROUTER or DEALER message is part of its envelope.
+
+    The envelope is every frame before the body, up to and including the
+    first empty delimiter, which libzmq must see as they are.  `body` is
+    whether the delimiter was already seen, and is set by it.  The last
+    frame of a message (`more` is False) is never envelope, so messages
+    without a delimiter are still compressed.
+    """
+    if body[0]:
+        return False
+    if isinstance(part, Frame):
+        part = part.buffer
+    if not _nbytes(part):
+        body[0] = True
+        return True
+    return more
+
+cdef inline list _compress_parts(compression, parts, int skip, bint envelope,
+                                 bint more, bint *body):
+    """Compress each part of a message after the first `skip`.
+
+    If `envelope`, the envelope is left alone too.  `more` is whether the
+    message continues after `parts`.
+    """
+    cdef Py_ssize_t i, n
+    parts = list(parts)
+    n = len(parts)
+    compressed = []
+    for i in range(n):
+        part = parts[i]
+        if skip > 0:
+            skip -= 1
+        elif not (envelope and _in_envelope(part, more or i < n - 1, body)):
+            if isinstance(part, Frame):
+                part = part.buffer
+            part = compression.compress(part)
+        compressed.append(part)
+    return compressed
+
+cdef inline object _decompress_part(compression, part, bint copy):
+    """Decompress a received part, keeping it bytes or a Frame."""
+    cdef Frame frame
+    if copy:
+        return compression.decompress(part)
+    frame = Frame(compression.decompress(part.buffer))
+    frame.more = part.more
+    return frame
+
+cdef inline list _decompress_parts(compression, parts, bint copy, int skip,
+                                   bint envelope, bint *body):
+    """Decompress each part of a message after the first `skip`.
+
+    If `envelope`, the envelope is left alone too.  `parts` ends the message.
+    """
+    cdef Py_ssize_t i, n
+    n = len(parts)
+    decompressed = []
+    for i in range(n):
+        part = parts[i]
+        if skip > 0:
+            skip -= 1
+        elif not (envelope and _in_envelope(part, i < n - 1, body)):
+            part = _decompress_part(compression, part, copy)
+        decompressed.append(part)
+    return decompressed
+
+cdef inline object _recv_many(void *handle, int max_messages, int flags=0,
+                              bint copy=True, track=False, bint multipart=False):
+    """Receive up to `max_messages` messages, and return them as a list.
+
+    Only the first message is received with `flags` as given, so a blocking
+    call waits for at least one message.  The rest are received with NOBLOCK,
+    stopping at EAGAIN.  Every message is received inside a single nogil block.
+    The arrays start small, so a large `max_messages` costs nothing unless
+    that many messages are waiting.
+    """
+    cdef int err=0
+    cdef int noblock
+    cdef Py_ssize_t i
+    cdef Py_ssize_t start=0
+    cdef Py_ssize_t nmsgs=0
+    cdef Py_ssize_t nparts=0
+    cdef Py_ssize_t nalloc
+    cdef Py_ssize_t msgs_alloc
+    cdef zmq_msg_t *parts = NULL
+    cdef Py_ssize_t *ends = NULL
+    cdef char *mores = NULL
+    cdef Py_ssize_t *grown_ends = NULL
+    cdef char *grown_mores = NULL
+
+    if max_messages <= 0:
+        return []
+    if ZMQ_VERSION_MAJOR >= 3:
+        noblock = ZMQ_DONTWAIT
+    else:
+        noblock = ZMQ_NOBLOCK
+
+    msgs_alloc = min(max_messages, 16)
+    nalloc = msgs_alloc
+    parts = <zmq_msg_t *>malloc(nalloc*sizeof(zmq_msg_t))
+    # message boundaries, or RCVMORE for single frames
+    ends = <Py_ssize_t *>malloc(msgs_alloc*sizeof(Py_ssize_t))
+    mores = <char *>malloc(msgs_alloc*sizeof(char))
+    if parts == NULL or ends == NULL or mores == NULL:
+        free(parts)
+        free(ends)
+        free(mores)
+        raise MemoryError()
+
+    with nogil:
+        while nmsgs < max_messages:
+            if nmsgs == msgs_alloc:
+                # _recv_frames grows parts, ends and mores grow together here
+                msgs_alloc = min(2*msgs_alloc, max_messages)
+                grown_ends = <Py_ssize_t *>realloc(ends, msgs_alloc*sizeof(Py_ssize_t))
+                if grown_ends == NULL:
+                    err = ZMQ_ENOMEM
+                    break
+                ends = grown_ends
+                grown_mores = <char *>realloc(mores, msgs_alloc*sizeof(char))
+                if grown_mores == NULL:
+                    err = ZMQ_ENOMEM
+                    break
+                mores = grown_mores
+            err = _recv_frames(handle, flags, &parts, &nparts, &nalloc, multipart)
+            if err:
+                break
+            ends[nmsgs] = nparts
+            if not multipart:
+                mores[nmsgs] = _getsockopt_rcvmore(handle) > 0
+            nmsgs += 1
+            flags = flags | noblock
+
+    try:
+        # don't discard messages that were already received, so an error
+        # after the first message is dropped.  One that persists, like ETERM,
+        # is raised by the next recv, but a one-off, like EINTR, is not.
+        if err and err != ZMQ_EAGAIN and nmsgs == 0:
+            raise ZMQError(err)
+        msgs = []
+        for i in range(nmsgs):
+            if multipart:
+                msg_parts = []
+                while start < ends[i]:
+                    msg_parts.append(_frame_object(&parts[start], copy, track, start < ends[i]-1))
+                    start += 1
+                msgs.append(msg_parts)
+            else:
+                msgs.append(_frame_object(&parts[i], copy, track, mores[i]))
+    finally:
+        free(ends)
+        free(mores)
+        with nogil:
+            _close_frames(parts, nparts)
+    return msgs
+
+cdef inline object _recv_records(void *handle, object records, int flags=0):
+    """Receive fixed-size messages into consecutive records of an array.
+
+    Only the first message is received with `flags` as given, the rest
+    are received with NOBLOCK, stopping at EAGAIN, or when the array is full.
+    Every message is received and copied inside a single nogil block.
+    Returns the number of records filled.
+    """
+    cdef int rc
+    cdef int err=0
+    cdef int noblock
+    cdef char *data_c = NULL
+    cdef Py_ssize_t data_len_c=0
+    cdef Py_ssize_t itemsize
+    cdef Py_ssize_t nrecords
+    cdef Py_ssize_t filled=0
+    cdef size_t size=0
+    cdef bint bad_size=False
+    cdef zmq_msg_t zmq_msg
+
+    try:
+        itemsize = records.itemsize
+    except AttributeError:
+        raise TypeError("records must be an array with an itemsize, not %r" % type(records))
+    if itemsize <= 0:
+        raise ValueError("records must have a positive itemsize")
+    asbuffer_w(records, <void **>&data_c, &data_len_c)
+    nrecords = data_len_c // itemsize
+    if ZMQ_VERSION_MAJOR >= 3:
+        noblock = ZMQ_DONTWAIT
+    else:
+        noblock = ZMQ_NOBLOCK
+
+    with nogil:
+        while filled < nrecords:
+            zmq_msg_init(&zmq_msg)
+            rc = zmq_recvmsg(handle, &zmq_msg, flags)
+            if rc < 0:
+                err = zmq_errno()
+                zmq_msg_close(&zmq_msg)
+                break
+            size = zmq_msg_size(&zmq_msg)
+            if size != <size_t>itemsize:
+                bad_size = True
+                zmq_msg_close(&zmq_msg)
+                break
+            memcpy(data_c + filled*itemsize, zmq_msg_data(&zmq_msg), itemsize)
+            zmq_msg_close(&zmq_msg)
+            filled += 1
+            flags = flags | noblock
+
+    if bad_size:
+        raise pysocket._record_size_error(size, itemsize, filled)
+    # records already filled are kept, so an error after the first is dropped,
+    # as in _recv_many
+    if err and err != ZMQ_EAGAIN and filled == 0:
+        raise ZMQError(err)
+    return filled
+
+cdef inline int _send_parts(void *handle, char **bufs, Py_ssize_t *lens,
+                            zmq_msg_t **msgs, Py_ssize_t nparts, int flags) nogil:
+    """Send arrays of prepared parts as one multipart message.
+
+    Parts with a zmq_msg_t in `msgs` are sent without copying,
+    the others are copied from `bufs`.
+    Returns 0 on success, or the errno of the failure.
+    """
+    cdef int rc
+    cdef int err=0
+    cdef int part_flags
+    cdef Py_ssize_t i
+    cdef zmq_msg_t data
+
+    for i in range(nparts):
+        part_flags = flags|ZMQ_SNDMORE if i < nparts-1 else flags
+        if msgs[i] != NULL:
+            rc = zmq_sendmsg(handle, msgs[i], part_flags)
+            if rc < 0:
+                return zmq_errno()
+            continue
+        rc = zmq_msg_init_size(&data, lens[i])
+        if rc != 0:
+            return zmq_errno()
+        memcpy(zmq_msg_data(&data), bufs[i], lens[i])
+        rc = zmq_sendmsg(handle, &data, part_flags)
+        if rc < 0:
+            err = zmq_errno()
+        rc = zmq_msg_close(&data)
+        if rc != 0 and not err:
+            err = zmq_errno()
+        if err:
+            return err
+    return 0
+
+cdef inline object _prepare_parts(list parts, char **bufs, Py_ssize_t *lens,
+                                  zmq_msg_t **msgs, list copies, bint copy,
+                                  track=False, int copy_threshold=0):
+    """Prepare a list of sendable objects for _send_parts.
+
+    Parts to be copied get a buffer pointer and length.  Parts to be sent
+    without copying are turned into Frames, and shallow copies of those
+    (kept in `copies`) get a zmq_msg_t, so the originals aren't garbage
+    collected.  Parts in `parts` are replaced by the object that holds
+    their data, to keep a reference until the send is done.
+
+    If `copy_threshold` is set, untracked non-copying sends of small
+    messages are copied, and copying sends of large immutable bytes are not.
+
+    Returns a MessageTracker shared by every non-copied part if `track`
+    is set, otherwise None.
+    """
+    cdef Py_ssize_t i
+    cdef bint copy_part
+    cdef Frame msg_copy
+    cdef MessageTracker tracker = None
+    if track and not copy:
+        tracker = MessageTracker()
+    for i in range(len(parts)):
+        part = parts[i]
+        msgs[i] = NULL
+        if isinstance(part, unicode):
+            raise TypeError("unicode not allowed, use send_unicode")
+        if isinstance(part, Frame):
+            copy_part = copy
+            if copy:
+                part = part.buffer
+                parts[i] = part
+            elif track:
+                if not part.tracker:
+                    raise ValueError('Not a tracked message')
+                tracker._add_peer(part.tracker)
+        else:
+            copy_part = copy
+            if copy_threshold > 0 and not track:
+                asbuffer_r(part, NULL, &lens[i])
+                if copy:
+                    copy_part = not (type(part) is bytes and lens[i] >= copy_threshold)
+                else:
+                    copy_part = lens[i] < copy_threshold
+            if not copy_part:
+                part = Frame(part, track=tracker)
+                parts[i] = part
+        if copy_part:
+            asbuffer_r(part, <void **>&bufs[i], &lens[i])
+        else:
+            msg_copy = (<Frame>part).fast_copy()
+            copies.append(msg_copy)
+            msgs[i] = &msg_copy.zmq_msg
+    return tracker
+
+cdef inline object _send_multipart(void *handle, object msg_parts, int flags=0,
+                                   bint copy=True, track=False, int copy_threshold=0):
+    """Send a sequence of buffers as a multipart message.
+
+    Sendable objects are prepared with the GIL, and then every frame
+    is sent inside a single nogil block.
+    """
+    cdef int err=0
+    cdef Py_ssize_t nparts
+    cdef char **bufs = NULL
+    cdef Py_ssize_t *lens = NULL
+    cdef zmq_msg_t **msgs = NULL
+
+    msg_parts = list(msg_parts)
+    nparts = len(msg_parts)
+    if nparts == 0:
+        raise ValueError("Cannot send an empty multipart message")
+
+    bufs_o = allocate(nparts*sizeof(char *), <void **>&bufs)
+    lens_o = allocate(nparts*sizeof(Py_ssize_t), <void **>&lens)
+    msgs_o = allocate(nparts*sizeof(zmq_msg_t *), <void **>&msgs)
+    copies = []
+    tracker = _prepare_parts(msg_parts, bufs, lens, msgs, copies, copy,
+                             track, copy_threshold)
+    with nogil:
+        err = _send_parts(handle, bufs, lens, msgs, nparts, flags)
+    if err:
+        raise ZMQError(err)
+    return tracker
+
+cdef inline object _send_many(void *handle, object messages, int flags=0,
+                              bint copy=True, int copy_threshold=0):
+    """Send a sequence of messages, stopping at EAGAIN.
+
+    Each message is a single sendable object, or a list or tuple of them
+    for a multipart message.  Every message is sent inside a single
+    nogil block.  Returns the number of messages that were sent.
+    """
+    cdef int err=0
+    cdef Py_ssize_t i
+    cdef Py_ssize_t start=0
+    cdef Py_ssize_t nmsgs
+    cdef Py_ssize_t nsent=0
+    cdef Py_ssize_t nparts
+    cdef Py_ssize_t *ends = NULL
+    cdef char **bufs = NULL
+    cdef Py_ssize_t *lens = NULL
+    cdef zmq_msg_t **msgs = NULL
+
+    # flatten the messages into one list of parts, and record where each ends
+    messages = list(messages)
+    nmsgs = len(messages)
+    if nmsgs == 0:
+        return 0
+    ends_o = allocate(nmsgs*sizeof(Py_ssize_t), <void **>&ends)
+    parts = []
+    for i in range(nmsgs):
+        msg = messages[i]
+        if isinstance(msg, (list, tuple)):
+            if len(msg) == 0:
+                raise ValueError("Cannot send an empty multipart message")
+            parts.extend(msg)
+        else:
+            parts.append(msg)
+        ends[i] = len(parts)
+    nparts = len(parts)
+
+    bufs_o = allocate(nparts*sizeof(char *), <void **>&bufs)
+    lens_o = allocate(nparts*sizeof(Py_ssize_t), <void **>&lens)
+    msgs_o = allocate(nparts*sizeof(zmq_msg_t *), <void **>&msgs)
+    copies = []
+    _prepare_parts(parts, bufs, lens, msgs, copies, copy, False, copy_threshold)
+    with nogil:
+        for i in range(nmsgs):
+            err = _send_parts(handle, &bufs[start], &lens[start], &msgs[start],
+                              ends[i]-start, flags)
+            if err:
+                break
+            start = ends[i]
+            nsent += 1
+
+    # report how many were sent, rather than raising, if any were,
+    # so the error is dropped, as in _recv_many
+    if err and err != ZMQ_EAGAIN and nsent == 0:
+        raise ZMQError(err)
+    return nsent
+
+
+cdef object _send_data(Socket self, object data, int flags, copy, track):
+    """Send one frame, copying it or not, for Socket.send."""
+    cdef Py_ssize_t data_len_c=0
+
+    if copy:
+        # msg.bytes never returns the input data object
+        # it is always a copy, but always the same copy
+        if isinstance(data, Frame):
+            data = data.buffer
+        elif (self.copy_threshold > 0 and type(data) is bytes
+                and len(data) >= self.copy_threshold):
+            # bytes can't change under us, so large ones needn't be copied
+            _send_frame(self.handle, Frame(data), flags)
+            return None
+        return _send_copy(self.handle, data, flags)
+    else:
+        if isinstance(data, Frame):
+            if track and not data.tracker:
+                raise ValueError('Not a tracked message')
+            msg = data
+        else:
+            if self.copy_threshold > 0 and not track:
+                asbuffer_r(data, NULL, &data_len_c)
+                if data_len_c < self.copy_threshold:
+                    return _send_copy(self.handle, data, flags)
+            msg = Frame(data, track=track)
+        return _send_frame(self.handle, msg, flags)
+
 
 cdef class Socket:
     """Socket(context, socket_type)
@@ -190,6 +787,29 @@ cdef class Socket:
     socket_type : int
         The socket type, which can be any of the 0MQ socket types: 
         REQ, REP, PUB, SUB, PAIR, XREQ, DEALER, XREP, ROUTER, PULL, PUSH, XPUB, XSUB.
+
+    Attributes
+    ----------
+    copy_threshold : int
+        Untracked non-copying sends of messages smaller than this many bytes
+        are copied, and copying sends of bytes at least this large are not,
+        since each is faster than the other for that size. 0 always
+        honors `copy`. Defaults to the Context's `copy_threshold`.
+    serializer : str or Serializer
+        The serializer used by send_serialized and recv_serialized, when
+        none is given.  None (the default) selects 'pickle'.
+        See zmq.utils.serializers.
+    compression : Compressor
+        If set, every frame sent is compressed if it is large enough, and
+        every frame received is decompressed, so the peer must set
+        compression too.  Setting a codec name, e.g. 'zlib', sets a
+        Compressor with the default threshold.  None (the default)
+        disables compression.  See zmq.utils.compression.
+        Frames that libzmq routes by are left alone: the envelope on
+        ROUTER and DEALER (every frame up to and including the first empty
+        delimiter, except the last frame of a message), so messages can be
+        routed through any number of hops, and the topic (the first frame)
+        on PUB and SUB.  XPUB and XSUB sockets don't support compression.
     
     See Also
     --------
@@ -209,6 +829,16 @@ cdef class Socket:
             raise ZMQError()
         self._closed = False
         self._attrs = {}
+        self.copy_threshold = context.copy_threshold
+        self.serializer = None
+        self.compression = None
+        self._compress_skip = 0
+        self._compress_envelope = False
+        self._send_index = 0
+        self._recv_index = 0
+        self._send_body = False
+        self._recv_body = False
+        self._recheck_sets = []
         context._add_socket(self.handle)
 
     def __del__(self):
@@ -244,6 +874,7 @@ cdef class Socket:
         called, the socket will automatically be closed when it is
         garbage collected.
         """
+        global _sockets_closed
         cdef int rc=0
         cdef int linger_c
         cdef bint setlinger=False
@@ -263,6 +894,7 @@ cdef class Socket:
             self.context._remove_socket(self.handle)
             self.handle = NULL
             self._closed = True
+            _sockets_closed += 1
 
     def setsockopt(self, int option, optval):
         """s.setsockopt(option, optval)
@@ -397,6 +1029,31 @@ cdef class Socket:
     def __setattr__(self, key, value):
         """set sockopts by attr"""
         key = key
+        if key == 'copy_threshold':
+            self.copy_threshold = value
+            return
+        if key == 'serializer':
+            self.serializer = value
+            return
+        if key == 'compression':
+            if value is not None:
+                if self.socket_type in (XPUB, XSUB):
+                    raise ZMQError(ENOTSUP, "XPUB and XSUB sockets don't support compression")
+                if isinstance(value, basestring):
+                    value = Compressor(value)
+            self.compression = value
+            # leave the envelope of ROUTER/DEALER messages, and the topic of
+            # PUB/SUB messages, as libzmq sees them
+            self._compress_envelope = self.socket_type in (ROUTER, DEALER)
+            if self.socket_type in (PUB, SUB):
+                self._compress_skip = 1
+            else:
+                self._compress_skip = 0
+            self._send_index = 0
+            self._recv_index = 0
+            self._send_body = False
+            self._recv_body = False
+            return
         try:
             opt = getattr(constants, key.upper())
         except AttributeError:
@@ -506,6 +1163,8 @@ cdef class Socket:
             Any supported flag: NOBLOCK, SNDMORE.
         copy : bool
             Should the message be sent in a copying or non-copying manner.
+            Depending on `copy_threshold`, small untracked messages may be
+            copied anyway, and large bytes may be sent without copying.
         track : bool
             Should the message be tracked for notification that ZMQ has
             finished with it? (ignored if copy=True)
@@ -528,25 +1187,29 @@ cdef class Socket:
             If the send does not succeed for any reason.
         
         """
+        cdef bint more, body
+
         _check_closed(self, True)
+        release_deferred_frames()
         
         if isinstance(data, unicode):
             raise TypeError("unicode not allowed, use send_unicode")
         
-        if copy:
-            # msg.bytes never returns the input data object
-            # it is always a copy, but always the same copy
-            if isinstance(data, Frame):
-                data = data.buffer
-            return _send_copy(self.handle, data, flags)
+        if self.compression is None:
+            return _send_data(self, data, flags, copy, track)
+        more = flags & ZMQ_SNDMORE
+        body = self._send_body
+        if self._send_index >= self._compress_skip:
+            data = _compress_parts(self.compression, [data], 0,
+                                   self._compress_envelope, more, &body)[0]
+        result = _send_data(self, data, flags, copy, track)
+        if more:
+            self._send_index += 1
+            self._send_body = body
         else:
-            if isinstance(data, Frame):
-                if track and not data.tracker:
-                    raise ValueError('Not a tracked message')
-                msg = data
-            else:
-                msg = Frame(data, track=track)
-            return _send_frame(self.handle, msg, flags)
+            self._send_index = 0
+            self._send_body = False
+        return result
 
     cpdef object recv(self, int flags=0, copy=True, track=False):
         """s.recv(flags=0, copy=True, track=False)
@@ -579,15 +1242,365 @@ cdef class Socket:
         ZMQError
             for any of the reasons zmq_recvmsg might fail.
         """
+        cdef bint more, skip, body
+
         _check_closed(self, True)
         
         if copy:
-            return _recv_copy(self.handle, flags)
+            msg = _recv_copy(self.handle, flags)
+        else:
+            msg = _recv_frame(self.handle, flags, track)
+            msg.more = self.getsockopt(zmq.RCVMORE)
+        if self.compression is None:
+            return msg
+        if copy:
+            more = _getsockopt_rcvmore(self.handle) > 0
+        else:
+            more = msg.more
+        body = self._recv_body
+        skip = (self._recv_index < self._compress_skip or
+                self._compress_envelope and _in_envelope(msg, more, &body))
+        # count the frame before decompressing, which may raise
+        if more:
+            self._recv_index += 1
+            self._recv_body = body
         else:
-            frame = _recv_frame(self.handle, flags, track)
-            frame.more = self.getsockopt(zmq.RCVMORE)
-            return frame
+            self._recv_index = 0
+            self._recv_body = False
+        if skip:
+            return msg
+        return _decompress_part(self.compression, msg, copy)
     
+    def send_multipart(self, msg_parts, int flags=0, copy=True, track=False):
+        """s.send_multipart(msg_parts, flags=0, copy=True, track=False)
+
+        Send a sequence of buffers as a multipart message.
+
+        All of the frames are sent in a single pass through libzmq,
+        without releasing and reacquiring the GIL for each frame.
+
+        Parameters
+        ----------
+        msg_parts : iterable
+            A sequence of objects to send as a multipart message. Each element
+            can be any sendable object (Frame, bytes, buffer-providers)
+        flags : int, optional
+            SNDMORE is handled automatically for frames before the last.
+        copy : bool, optional
+            Should the frame(s) be sent in a copying or non-copying manner.
+            Depending on `copy_threshold`, small untracked frames may be
+            copied anyway, and large bytes may be sent without copying.
+        track : bool, optional
+            Should the frame(s) be tracked for notification that ZMQ has
+            finished with it (ignored if copy=True).
+    
+        Returns
+        -------
+        None : if copy or not track
+        MessageTracker : if track and not copy
+            a single MessageTracker for every frame, whose `done` property
+            will be False until 0MQ is done with all of them.
+        """
+        cdef bint more, body
+
+        _check_closed(self, True)
+        release_deferred_frames()
+        if self.compression is None:
+            return _send_multipart(self.handle, msg_parts, flags, copy, track,
+                                   self.copy_threshold)
+        more = flags & ZMQ_SNDMORE
+        body = self._send_body
+        msg_parts = _compress_parts(self.compression, msg_parts,
+                                    self._compress_skip - self._send_index,
+                                    self._compress_envelope, more, &body)
+        tracker = _send_multipart(self.handle, msg_parts, flags, copy, track,
+                                  self.copy_threshold)
+        if more:
+            self._send_index += len(msg_parts)
+            self._send_body = body
+        else:
+            self._send_index = 0
+            self._send_body = False
+        return tracker
+
+    def send_many(self, messages, int flags=0, copy=True):
+        """s.send_many(messages, flags=0, copy=True)
+
+        Send a sequence of messages in one call.
+
+        Sending stops at the first message that cannot be queued
+        (EAGAIN, e.g. with NOBLOCK when HWM is reached), and the number
+        of messages that were sent is returned, so that the caller can
+        retry the rest later.
+
+        Parameters
+        ----------
+        messages : iterable
+            The messages to send. Each element is either a single sendable
+            object (Frame, bytes, buffer-providers), or a list or tuple of
+            them to be sent as a multipart message.
+        flags : int, optional
+            Any supported flag: NOBLOCK. SNDMORE is handled automatically
+            for frames before the last of each message.
+        copy : bool, optional
+            Should the frame(s) be sent in a copying or non-copying manner,
+            subject to `copy_threshold`.
+
+        Returns
+        -------
+        nsent : int
+            The number of messages that were sent.
+
+        Raises
+        ------
+        ZMQError
+            if no message could be sent, for any reason other than EAGAIN.
+        """
+        _check_closed(self, True)
+        release_deferred_frames()
+        if self.compression is not None:
+            return pysocket.send_many(self, messages, flags, copy)
+        return _send_many(self.handle, messages, flags, copy, self.copy_threshold)
+
+    def recv_multipart(self, int flags=0, copy=True, track=False):
+        """s.recv_multipart(flags=0, copy=True, track=False)
+
+        Receive a multipart message as a list of bytes or Frame objects.
+
+        All of the frames are received in a single pass through libzmq,
+        without releasing and reacquiring the GIL for each frame.
+
+        Parameters
+        ----------
+        flags : int, optional
+            Any supported flag: NOBLOCK. If NOBLOCK is set, this method
+            will raise a ZMQError with EAGAIN if a message is not ready.
+            If NOBLOCK is not set, then this method will block until a
+            message arrives.
+        copy : bool, optional
+            Should the message frame(s) be received in a copying or non-copying manner?
+            If False a Frame object is returned for each part, if True a copy of
+            the bytes is made for each frame.
+        track : bool, optional
+            Should the message frame(s) be tracked for notification that ZMQ has
+            finished with it? (ignored if copy=True)
+
+        Returns
+        -------
+        msg_parts : list
+            A list of frames in the multipart message; either Frames or bytes,
+            depending on `copy`.
+        """
+        cdef int skip
+        cdef bint body
+
+        _check_closed(self, True)
+        msg_parts = _recv_multipart(self.handle, flags, copy, track)
+        if self.compression is not None:
+            # the message may have been started with recv
+            skip = self._compress_skip - self._recv_index
+            body = self._recv_body
+            self._recv_index = 0
+            self._recv_body = False
+            msg_parts = _decompress_parts(self.compression, msg_parts, copy,
+                                          skip, self._compress_envelope, &body)
+        return msg_parts
+
+    def recv_into(self, buffer, int flags=0):
+        """s.recv_into(buffer, flags=0)
+
+        Receive a message frame directly into a writable buffer.
+
+        This copies the message content into `buffer` (a bytearray,
+        memoryview, NumPy array, or any writable buffer-provider),
+        without allocating a new object for each message.
+
+        Parameters
+        ----------
+        buffer : writable buffer
+            The contiguous buffer to fill.  If the message is larger than
+            the buffer, its content is truncated to fit.
+        flags : int
+            Any supported flag: NOBLOCK. If NOBLOCK is set, this method
+            will raise a ZMQError with EAGAIN if a message is not ready.
+
+        Returns
+        -------
+        nbytes : int
+            The size of the message, which is larger than the buffer
+            if the content was truncated.
+        """
+        _check_closed(self, True)
+        if self.compression is not None:
+            # decompress first, then copy
+            return pysocket.recv_into(self, buffer, flags)
+        return _recv_into(self.handle, buffer, flags, False)[0]
+
+    def recv_multipart_into(self, buffer, int flags=0):
+        """s.recv_multipart_into(buffer, flags=0)
+
+        Receive a multipart message directly into a writable buffer.
+
+        The frames are copied one after the other into consecutive
+        slices of `buffer`.
+
+        Parameters
+        ----------
+        buffer : writable buffer
+            The contiguous buffer to fill.  Content that does not fit
+            is truncated.
+        flags : int
+            Any supported flag: NOBLOCK. If NOBLOCK is set, this method
+            will raise a ZMQError with EAGAIN if a message is not ready.
+
+        Returns
+        -------
+        sizes : list of ints
+            The size of each frame.  Frame ``i`` occupies
+            ``buffer[sum(sizes[:i]):sum(sizes[:i+1])]``, unless the total
+            is larger than the buffer, and the content was truncated.
+        """
+        _check_closed(self, True)
+        if self.compression is not None:
+            return pysocket.recv_multipart_into(self, buffer, flags)
+        return _recv_into(self.handle, buffer, flags, True)
+
+    def recv_many(self, int max_messages, int flags=0, copy=True, track=False):
+        """s.recv_many(max_messages, flags=0, copy=True, track=False)
+
+        Receive up to `max_messages` message frames in one call.
+
+        The first frame is received with `flags`, so unless NOBLOCK is set
+        this waits for at least one frame. Any frames that are already
+        waiting are then drained without blocking, stopping at EAGAIN.
+
+        Parameters
+        ----------
+        max_messages : int
+            The maximum number of frames to receive.
+        flags : int
+            Any supported flag: NOBLOCK. If NOBLOCK is set, and no message
+            is ready, an empty list is returned.
+        copy : bool
+            Should the message(s) be received in a copying or non-copying manner?
+            If False, Frame objects are returned, if True, bytes copies.
+        track : bool
+            Should the message(s) be tracked for notification that ZMQ has
+            finished with it? (ignored if copy=True)
+
+        Returns
+        -------
+        msgs : list
+            A list of at most `max_messages` frames; either Frames or bytes,
+            depending on `copy`.
+
+        Raises
+        ------
+        ZMQError
+            if nothing could be received, for any reason other than EAGAIN.
+            An error after the first message just ends the batch: one that
+            persists, like ETERM, is raised by the next call, but a one-off,
+            like EINTR, is not raised at all.
+        """
+        _check_closed(self, True)
+        if self.compression is not None:
+            # recv keeps track of where each message starts
+            return pysocket.recv_many(self, max_messages, flags, copy, track)
+        return _recv_many(self.handle, max_messages, flags, copy, track, False)
+
+    def recv_multipart_many(self, int max_messages, int flags=0, copy=True, track=False):
+        """s.recv_multipart_many(max_messages, flags=0, copy=True, track=False)
+
+        Receive up to `max_messages` complete multipart messages in one call.
+
+        The first message is received with `flags`, so unless NOBLOCK is set
+        this waits for at least one message. Any messages that are already
+        waiting are then drained without blocking, stopping at EAGAIN.
+
+        Parameters
+        ----------
+        max_messages : int
+            The maximum number of multipart messages to receive.
+        flags : int
+            Any supported flag: NOBLOCK. If NOBLOCK is set, and no message
+            is ready, an empty list is returned.
+        copy : bool
+            Should the message frame(s) be received in a copying or non-copying manner?
+            If False a Frame object is returned for each part, if True a copy of
+            the bytes is made for each frame.
+        track : bool
+            Should the message frame(s) be tracked for notification that ZMQ has
+            finished with it? (ignored if copy=True)
+
+        Returns
+        -------
+        msgs : list of lists
+            A list of at most `max_messages` multipart messages, each a list
+            as returned by `recv_multipart`.
+
+        Raises
+        ------
+        ZMQError
+            if nothing could be received, for any reason other than EAGAIN.
+            An error after the first message just ends the batch: one that
+            persists, like ETERM, is raised by the next call, but a one-off,
+            like EINTR, is not raised at all.
+        """
+        _check_closed(self, True)
+        if self.compression is not None:
+            return pysocket.recv_multipart_many(self, max_messages, flags, copy, track)
+        return _recv_many(self.handle, max_messages, flags, copy, track, True)
+
+    def recv_records(self, records, int flags=0):
+        """s.recv_records(records, flags=0)
+
+        Receive fixed-size messages into consecutive records of an array.
+
+        This drains up to ``len(records)`` waiting messages in one C loop,
+        copying each one into the next record, so a feed of small
+        fixed-layout messages can be decoded as a NumPy structured array,
+        rather than one message at a time with ``struct.unpack``::
+
+            records = numpy.empty(1000, dtype=struct_dtype('!Iqd'))
+            n = socket.recv_records(records)
+            prices = records['f2'][:n]
+
+        The first message is received with `flags`, so unless NOBLOCK is
+        set this waits for at least one message.  Any messages that are
+        already waiting are then drained without blocking, stopping at EAGAIN.
+        Pass a slice, e.g. ``records[n:]``, to continue filling an array.
+
+        Parameters
+        ----------
+        records : array
+            A contiguous writable array, such as a NumPy array, whose
+            `itemsize` is the size of every message.
+        flags : int
+            Any supported flag: NOBLOCK. If NOBLOCK is set, and no message
+            is ready, 0 is returned.
+
+        Returns
+        -------
+        n : int
+            The number of records filled, from the start of `records`.
+
+        Raises
+        ------
+        ValueError
+            if a message is not `itemsize` bytes.  That message is
+            discarded, and records received before it are kept; the
+            exception's `filled` attribute is how many.
+        ZMQError
+            if nothing could be received, for any reason other than EAGAIN.
+
+        See Also
+        --------
+        zmq.utils.serializers.struct_dtype : a NumPy dtype from a struct format
+        """
+        _check_closed(self, True)
+        if self.compression is not None:
+            return pysocket.recv_records(self, records, flags)
+        return _recv_records(self.handle, records, flags)
 
     # pure Python methods - import from pysocket so we can change them without
     # having to rebuild socket.pyx
@@ -596,8 +1609,6 @@ cdef class Socket:
     setsockopt_unicode = setsockopt_string
     getsockopt_unicode = getsockopt_string
     bind_to_random_port = pysocket.bind_to_random_port
-    send_multipart = pysocket.send_multipart
-    recv_multipart = pysocket.recv_multipart
     send_string = pysocket.send_string
     recv_string = pysocket.recv_string
     send_unicode = send_string
@@ -606,6 +1617,10 @@ cdef class Socket:
     recv_pyobj = pysocket.recv_pyobj
     send_json = pysocket.send_json
     recv_json = pysocket.recv_json
+    send_serialized = pysocket.send_serialized
+    recv_serialized = pysocket.recv_serialized
+    send_array = pysocket.send_array
+    recv_array = pysocket.recv_array
     poll = pysocket.poll
 
 __all__ = ['Socket', 'IPC_PATH_MAX_LEN']
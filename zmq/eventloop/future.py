@@ -0,0 +1,257 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+"""A lightweight Future, for results that the IOLoop will provide later."""
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import logging
+
+from zmq.core.error import ZMQBaseError, NotDone
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+_PENDING = 0
+_FINISHED = 1
+_FAILED = 2
+_CANCELLED = 3
+
+
+class CancelledError(ZMQBaseError):
+    """The result of a Future that was cancelled."""
+    pass
+
+
+class Future(object):
+    """The result of an operation that the IOLoop will finish later.
+
+    This follows the ``concurrent.futures.Future`` interface, but it is not
+    thread-safe and has no locks: it is resolved on the IOLoop's thread, and
+    its done callbacks run there, as soon as it is resolved.  Callbacks are
+    not wrapped in a StackContext.
+
+    Because it never blocks, `result` raises NotDone if the Future has not
+    been resolved yet.  Use `add_done_callback` to find out when it is, or
+    wait for it in a `coroutine`, with ``yield future``, or on Python >= 3.5,
+    ``await future``.
+    """
+
+    # these are made per message, so keep them small
+    __slots__ = ['_state', '_result', '_callbacks']
+
+    def __init__(self):
+        self._state = _PENDING
+        self._result = None
+        self._callbacks = None
+
+    def __repr__(self):
+        state = ['pending', 'finished', 'failed', 'cancelled'][self._state]
+        return "<%s %s>" % (self.__class__.__name__, state)
+
+    def __iter__(self):
+        """Wait for the Future with ``yield from`` in a `coroutine`."""
+        return _FutureIter(self)
+
+    __await__ = __iter__
+
+    def done(self):
+        """Whether the Future has a result or exception, or was cancelled."""
+        return self._state != _PENDING
+
+    def cancelled(self):
+        """Whether the Future was cancelled."""
+        return self._state == _CANCELLED
+
+    def cancel(self):
+        """Cancel the Future, if it is not done yet.
+
+        Returns whether it was cancelled.
+        """
+        if self._state != _PENDING:
+            return self._state == _CANCELLED
+        self._state = _CANCELLED
+        self._run_callbacks()
+        return True
+
+    def result(self):
+        """Return the result, or raise the exception, of the operation.
+
+        Raises NotDone if it is not done yet, and CancelledError if it
+        was cancelled.
+        """
+        if self._state == _FINISHED:
+            return self._result
+        if self._state == _FAILED:
+            raise self._result
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        raise NotDone()
+
+    def exception(self):
+        """Return the exception of the operation, or None if it succeeded.
+
+        Raises NotDone if it is not done yet, and CancelledError if it
+        was cancelled.
+        """
+        if self._state == _FAILED:
+            return self._result
+        if self._state == _FINISHED:
+            return None
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        raise NotDone()
+
+    def add_done_callback(self, callback):
+        """Call ``callback(future)`` when the Future is done.
+
+        If it is already done, the callback is called right away.
+        """
+        if self._state != _PENDING:
+            callback(self)
+        elif self._callbacks is None:
+            self._callbacks = [callback]
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        """Resolve the Future with a result.
+
+        Does nothing if the Future is already done, e.g. cancelled.
+        """
+        if self._state == _PENDING:
+            self._result = result
+            self._state = _FINISHED
+            self._run_callbacks()
+
+    def set_exception(self, exception):
+        """Resolve the Future with an exception.
+
+        Does nothing if the Future is already done, e.g. cancelled.
+        """
+        if self._state == _PENDING:
+            self._result = exception
+            self._state = _FAILED
+            self._run_callbacks()
+
+    def _run_callbacks(self):
+        callbacks = self._callbacks
+        if callbacks is None:
+            return
+        self._callbacks = None
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.error("Exception in Future callback %r", callback,
+                              exc_info=True)
+
+
+class _FutureIter(object):
+    """Iterator for ``yield from future`` and ``await future``.
+
+    It yields the Future to the `coroutine` running it, and then stops
+    with its result.  This is not a generator, since a generator can't
+    return a value on Python 2.
+    """
+
+    __slots__ = ['_future']
+
+    def __init__(self, future):
+        self._future = future
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        future = self._future
+        if future is None:
+            raise StopIteration()
+        if not future.done():
+            return future
+        self._future = None
+        raise StopIteration(future.result())
+
+    next = __next__
+
+    def send(self, value):
+        # the coroutine sends the result, which __next__ gets again
+        return self.__next__()
+
+
+def coroutine(func):
+    """Decorator to run a generator function as a coroutine of Futures.
+
+    Calling the function returns a Future for its result.  It runs until
+    it yields a Future, and resumes with its result when that is done,
+    in the callback that resolves it, so on the IOLoop's thread::
+
+        @coroutine
+        def echo(stream):
+            while True:
+                msg = yield stream.recv_future()
+                yield stream.send_future(msg)
+
+    If the Future fails, the exception is raised at the ``yield``.
+    On Python >= 3.3, ``yield from future`` works too, and the function's
+    return value is the result.  On Python >= 3.5, an ``async def``
+    function can ``await`` Futures instead.
+    """
+    def wrapper(*args, **kwargs):
+        future = Future()
+        try:
+            gen = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        if not hasattr(gen, 'send'):
+            future.set_result(gen)
+            return future
+        _step(gen, future, None, None)
+        return future
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def _step(gen, future, value, error):
+    """Run a coroutine until it waits for a Future that is not done."""
+    while True:
+        try:
+            if error is not None:
+                waiting = gen.throw(error)
+            else:
+                waiting = gen.send(value)
+        except StopIteration as e:
+            future.set_result(getattr(e, 'value', None))
+            return
+        except Exception as e:
+            future.set_exception(e)
+            return
+        if not isinstance(waiting, Future):
+            error = TypeError("coroutines can only wait for Futures, not %r" % waiting)
+            value = None
+            continue
+        if not waiting.done():
+            waiting.add_done_callback(
+                lambda f: _step(gen, future, *_outcome(f)))
+            return
+        value, error = _outcome(waiting)
+
+def _outcome(future):
+    """The (result, exception) of a done Future."""
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+
+__all__ = ['Future', 'CancelledError', 'coroutine']
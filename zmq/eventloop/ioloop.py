@@ -23,27 +23,30 @@ case.
 
 In addition to I/O events, the `IOLoop` can also schedule time-based events.
 `IOLoop.add_timeout` is a non-blocking alternative to `time.sleep`.
+Timeouts are scheduled with a monotonic clock, where available, so they
+are not affected by changes to the system time.
 """
 
 from __future__ import absolute_import, division, with_statement
 
+import bisect
+import collections
 import datetime
 import errno
+import functools
 import heapq
+import math
 import os
 import sys
 import logging
-import threading
 import time
 import traceback
 
 try:
-    import thread
+    # a clock that doesn't jump when the system time is changed (python >= 3.3)
+    from time import monotonic
 except ImportError:
-    # py3k removed thread
-    thread_get_ident = lambda : threading.current_thread().ident
-else:
-    thread_get_ident = thread.get_ident
+    monotonic = time.time
 
 from zmq.eventloop import stack_context
 
@@ -55,7 +58,7 @@ except ImportError:
 from zmq.eventloop.platform.auto import set_close_exec, Waker
 
 from zmq import (
-    Poller,
+    Poller, EpollPoller,
     POLLIN, POLLOUT, POLLERR,
     ZMQError, ETERM,
 )
@@ -67,7 +70,18 @@ if sys.version_info[0] >= 3:
 class IOLoop(object):
     """A level-triggered I/O loop.
 
-    We use the zmq Poller for polling events.
+    We use the zmq Poller for polling events. To use epoll instead, which
+    scales better with many idle sockets, pass ``impl=ZMQEpollPoller()``.
+
+    Timeouts are kept in a heap by default. For many outstanding timeouts
+    that are mostly cancelled, such as per-request timeouts, pass
+    ``timers=TimerWheel()`` for O(1) add_timeout and remove_timeout.
+
+    Callbacks, timeouts and handlers are wrapped with stack_context.wrap,
+    so they run in the StackContext they were added in.  If you don't use
+    StackContexts, pass ``use_stack_context=False`` (or set the attribute
+    before adding callbacks) to skip the wrapping.  Exceptions in callbacks
+    are still caught and logged by the loop.
     
     Example usage for a simple TCP server::
 
@@ -115,19 +129,31 @@ class IOLoop(object):
     WRITE = _EPOLLOUT
     ERROR = _EPOLLERR | _EPOLLHUP
 
-    def __init__(self, impl=None):
+    def __init__(self, impl=None, timers=None, use_stack_context=True):
         self._impl = impl or _poll()
+        # whether callbacks and handlers are wrapped to restore the
+        # StackContext they were added in, see stack_context.wrap
+        self.use_stack_context = use_stack_context
         if hasattr(self._impl, 'fileno'):
             set_close_exec(self._impl.fileno())
         self._handlers = {}
         self._events = {}
-        self._callbacks = []
-        self._callback_lock = threading.Lock()
-        self._timeouts = []
+        # callbacks are handed over without a lock: deque append and
+        # popleft are atomic, and the loop only pops as many as it saw
+        self._callbacks = collections.deque()
+        # whether the loop may be waiting in poll, so add_callback must wake it
+        self._polling = False
+        # whether somebody has woken the loop since it started polling
+        self._woken = False
+        self._timeouts = timers if timers is not None else HeapTimers()
+        if getattr(self._timeouts, 'time_func', False) is None:
+            # a TimerWheel's ticks must follow the clock of our deadlines
+            self._timeouts.time_func = self.time
         self._running = False
         self._stopped = False
-        self._thread_ident = None
         self._blocking_signal_threshold = None
+        # a _LoopStats when instrumentation is enabled, see enable_stats
+        self._stats = None
 
         # Create a pipe that we send bogus data to when we want to wake
         # the I/O loop when it is idle
@@ -205,7 +231,9 @@ class IOLoop(object):
 
     def add_handler(self, fd, handler, events):
         """Registers the given handler to receive the given events for fd."""
-        self._handlers[fd] = stack_context.wrap(handler)
+        if self.use_stack_context:
+            handler = stack_context.wrap(handler)
+        self._handlers[fd] = handler
         self._impl.register(fd, events | self.ERROR)
 
     def update_handler(self, fd, events):
@@ -216,6 +244,9 @@ class IOLoop(object):
         """Stop listening for events on fd."""
         self._handlers.pop(fd, None)
         self._events.pop(fd, None)
+        if self._stats is not None:
+            # don't keep closed sockets alive for their stats
+            self._stats.handlers.pop(fd, None)
         try:
             self._impl.unregister(fd)
         except (OSError, IOError):
@@ -247,6 +278,69 @@ class IOLoop(object):
         """
         self.set_blocking_signal_threshold(seconds, self.log_stack)
 
+    def enable_stats(self):
+        """Start collecting statistics about what the IOLoop spends its time on.
+
+        Instrumentation is off by default.  When enabled, the loop records
+        the time spent waiting in poll and working in each iteration, the
+        count and cumulative time of each handler and callback, and a
+        histogram of how late timeouts run.  See `loop_stats`.
+
+        Times are wall-clock time, measured with the monotonic clock.
+        """
+        if self._stats is None:
+            self._stats = _LoopStats()
+
+    def disable_stats(self):
+        """Stop collecting statistics, and discard those collected so far.
+
+        This also disables the slow callback hook.
+        """
+        self._stats = None
+
+    def loop_stats(self, reset=False):
+        """Return a snapshot of the loop statistics as a dict.
+
+        Returns None if instrumentation is not enabled.  The dict has:
+
+        * iterations: the number of loop iterations
+        * poll_time, work_time: total seconds spent waiting in poll, and
+          running callbacks, timeouts and handlers
+        * max_work_time: the longest time spent working in one iteration
+        * callbacks, handlers: dicts, keyed by callback name or fd, of
+          dicts with the ``count``, total ``time`` and ``max`` time of calls.
+          Handlers are only reported while they are registered.
+        * lag: a list of ``(upper_bound, count)`` pairs, a histogram of
+          seconds timeouts ran after their deadline
+        * max_lag: the latest a timeout has run, in seconds
+        * slow: the number of calls that exceeded the slow callback threshold
+
+        If `reset` is True, the counters are cleared after the snapshot.
+        """
+        stats = self._stats
+        if stats is None:
+            return None
+        snapshot = stats.snapshot()
+        if reset:
+            stats.reset()
+        return snapshot
+
+    def set_slow_callback_threshold(self, seconds, hook=None):
+        """Call `hook` for any callback or handler that takes too long.
+
+        Every callback, timeout and handler that runs for at least `seconds`
+        results in ``hook(callback, elapsed)``.  If `hook` is None, a
+        warning is logged.  This enables instrumentation (see
+        `enable_stats`); pass seconds=None to remove the hook.
+        """
+        if seconds is None:
+            if self._stats is not None:
+                self._stats.slow_threshold = None
+            return
+        self.enable_stats()
+        self._stats.slow_threshold = seconds
+        self._stats.slow_hook = hook if hook is not None else _log_slow_callback
+
     def log_stack(self, signal, frame):
         """Signal handler to log the stack trace of the current thread.
 
@@ -265,39 +359,45 @@ class IOLoop(object):
         if self._stopped:
             self._stopped = False
             return
-        self._thread_ident = thread_get_ident()
         self._running = True
         while True:
             poll_timeout = 3600.0
+            # enabling or disabling stats takes effect on the next iteration
+            stats = self._stats
+            if stats is not None:
+                iteration_start = monotonic()
 
             # Prevent IO event starvation by delaying new callbacks
             # to the next iteration of the event loop.
-            with self._callback_lock:
-                callbacks = self._callbacks
-                self._callbacks = []
-            for callback in callbacks:
-                self._run_callback(callback)
+            callbacks = self._callbacks
+            for i in range(len(callbacks)):
+                self._run_callback(callbacks.popleft())
 
             if self._timeouts:
-                now = time.time()
-                while self._timeouts:
-                    if self._timeouts[0].callback is None:
-                        # the timeout was cancelled
-                        heapq.heappop(self._timeouts)
-                    elif self._timeouts[0].deadline <= now:
-                        timeout = heapq.heappop(self._timeouts)
+                now = self.time()
+                for timeout in self._timeouts.pop_due(now):
+                    # an earlier timeout may have cancelled this one
+                    if timeout.callback is not None:
+                        if stats is not None:
+                            stats.record_lag(now - timeout.deadline)
                         self._run_callback(timeout.callback)
-                    else:
-                        seconds = self._timeouts[0].deadline - now
-                        poll_timeout = min(seconds, poll_timeout)
-                        break
-
+                deadline = self._timeouts.next_deadline()
+                if deadline is not None:
+                    poll_timeout = min(max(deadline - now, 0.0), poll_timeout)
+
+            # From here on, add_callback from other threads must wake us.
+            # Callbacks added before this are seen by the check below.
+            self._woken = False
+            self._polling = True
             if self._callbacks:
                 # If any callbacks or timeouts called add_callback,
                 # we don't want to wait in poll() before we run them.
                 poll_timeout = 0.0
 
             if not self._running:
+                self._polling = False
+                if stats is not None:
+                    stats.record_iteration(0.0, monotonic() - iteration_start)
                 break
 
             if self._blocking_signal_threshold is not None:
@@ -305,9 +405,13 @@ class IOLoop(object):
                 # events.
                 signal.setitimer(signal.ITIMER_REAL, 0, 0)
 
+            if stats is not None:
+                poll_start = monotonic()
             try:
                 event_pairs = self._impl.poll(poll_timeout)
+                self._polling = False
             except Exception as e:
+                self._polling = False
                 # Depending on python version and IOLoop implementation,
                 # different exception types may be thrown and there are
                 # two ways EINTR might be signaled:
@@ -325,6 +429,9 @@ class IOLoop(object):
                 else:
                     raise
 
+            if stats is not None:
+                poll_time = monotonic() - poll_start
+
             if self._blocking_signal_threshold is not None:
                 signal.setitimer(signal.ITIMER_REAL,
                                  self._blocking_signal_threshold, 0)
@@ -337,7 +444,10 @@ class IOLoop(object):
             while self._events:
                 fd, events = self._events.popitem()
                 try:
-                    self._handlers[fd](fd, events)
+                    if stats is None:
+                        self._handlers[fd](fd, events)
+                    else:
+                        stats.run_handler(fd, self._handlers[fd], events)
                 except (OSError, IOError) as e:
                     if e.args[0] == errno.EPIPE:
                         # Happens when the client closes the connection
@@ -348,6 +458,9 @@ class IOLoop(object):
                 except Exception:
                     logging.error("Exception in I/O handler for fd %s",
                                   fd, exc_info=True)
+            if stats is not None:
+                stats.record_iteration(poll_time,
+                        monotonic() - iteration_start - poll_time)
         # reset the stopped flag so another start/stop pair can be issued
         self._stopped = False
         if self._blocking_signal_threshold is not None:
@@ -379,6 +492,15 @@ class IOLoop(object):
         """Returns true if this IOLoop is currently running."""
         return self._running
 
+    def time(self):
+        """Returns the current time according to the IOLoop's clock.
+
+        This is a monotonic clock where available (python >= 3.3), so it
+        is not affected by changes to the system time, but it is not a unix
+        timestamp. Use it with `call_at`.
+        """
+        return monotonic()
+
     def add_timeout(self, deadline, callback):
         """Calls the given callback at the time deadline from the I/O loop.
 
@@ -388,25 +510,52 @@ class IOLoop(object):
         by ``time.time()`` or a ``datetime.timedelta`` object for a deadline
         relative to the current time.
 
+        A unix timestamp is converted to the IOLoop's clock when the timeout
+        is added, so later changes to the system time don't move it.
+
         Note that it is not safe to call `add_timeout` from other threads.
         Instead, you must use `add_callback` to transfer control to the
         IOLoop's thread, and then call `add_timeout` from there.
         """
-        timeout = _Timeout(deadline, stack_context.wrap(callback))
-        heapq.heappush(self._timeouts, timeout)
+        if isinstance(deadline, (int, long, float)):
+            deadline = self.time() + (deadline - time.time())
+        elif isinstance(deadline, datetime.timedelta):
+            deadline = self.time() + _Timeout.timedelta_to_seconds(deadline)
+        return self.call_at(deadline, callback)
+
+    def call_at(self, deadline, callback):
+        """Calls the given callback at `deadline`, a time on the IOLoop's clock.
+
+        Returns a handle that may be passed to remove_timeout to cancel.
+        See `time`.
+        """
+        if self.use_stack_context:
+            callback = stack_context.wrap(callback)
+        timeout = _Timeout(deadline, callback)
+        self._timeouts.add(timeout)
         return timeout
 
+    def call_later(self, delay, callback):
+        """Calls the given callback after `delay` seconds.
+
+        Returns a handle that may be passed to remove_timeout to cancel.
+        """
+        return self.call_at(self.time() + delay, callback)
+
     def remove_timeout(self, timeout):
         """Cancels a pending timeout.
 
         The argument is a handle as returned by add_timeout.
         """
-        # Removing from a heap is complicated, so just leave the defunct
-        # timeout object in the queue (see discussion in
-        # http://docs.python.org/library/heapq.html).
-        # If this turns out to be a problem, we could add a garbage
-        # collection pass whenever there are too many dead timeouts.
-        timeout.callback = None
+        self._timeouts.remove(timeout)
+
+    def timer_stats(self):
+        """Return a dict with the number of live and cancelled timeouts.
+
+        ``cancelled`` counts cancelled timeouts that are still taking up
+        space, waiting to be compacted away.
+        """
+        return self._timeouts.stats()
 
     def add_callback(self, callback):
         """Calls the given callback on the next I/O loop iteration.
@@ -417,23 +566,45 @@ class IOLoop(object):
         from that IOLoop's thread.  add_callback() may be used to transfer
         control from other threads to the IOLoop's thread.
         """
-        with self._callback_lock:
-            list_empty = not self._callbacks
-            self._callbacks.append(stack_context.wrap(callback))
-        if list_empty and thread_get_ident() != self._thread_ident:
-            # If we're in the IOLoop's thread, we know it's not currently
-            # polling.  If we're not, and we added the first callback to an
-            # empty list, we may need to wake it up (it may wake up on its
-            # own, but an occasional extra wake is harmless).  Waking
-            # up a polling IOLoop is relatively expensive, so we try to
-            # avoid it when we can.
+        if self.use_stack_context:
+            callback = stack_context.wrap(callback)
+        self._callbacks.append(callback)
+        self._wake_for_callbacks()
+
+    def add_callbacks_batch(self, callbacks):
+        """Calls each of the given callbacks on the next I/O loop iteration.
+
+        Like calling `add_callback` for each, but the loop is woken at most
+        once for the whole batch. It is safe to call this method from any
+        thread at any time.
+        """
+        if self.use_stack_context:
+            wrap = stack_context.wrap
+            callbacks = [ wrap(callback) for callback in callbacks ]
+        self._callbacks.extend(callbacks)
+        self._wake_for_callbacks()
+
+    def _wake_for_callbacks(self):
+        """Wake the loop for new callbacks, if it may be waiting in poll."""
+        if self._polling and not self._woken:
+            # The loop may be polling, so wake it.  Once it has been woken,
+            # it will see every callback added before it runs callbacks,
+            # so later callers needn't wake it again.  Waking up a polling
+            # IOLoop is relatively expensive, so we try to avoid it when
+            # we can, but an occasional extra wake is harmless.
+            self._woken = True
             self._waker.wake()
 
     def _run_callback(self, callback):
+        stats = self._stats
+        if stats is not None:
+            start = monotonic()
         try:
             callback()
         except Exception:
             self.handle_callback_exception(callback)
+        if stats is not None:
+            stats.record_callback(callback, monotonic() - start)
 
     def handle_callback_exception(self, callback):
         """This method is called whenever a callback run by the IOLoop
@@ -448,20 +619,142 @@ class IOLoop(object):
         logging.error("Exception in callback %r", callback, exc_info=True)
 
 
+def _callback_key(callback):
+    """A stable key for the function a callback will call.
+
+    Callbacks are usually wrapped in fresh partials by stack_context.wrap,
+    and closures are often created per call, so we key on the code object.
+    """
+    while isinstance(callback, functools.partial):
+        if (callback.__class__ is stack_context._StackContextWrapper
+                and callback.args):
+            # wrapped(fn, contexts)
+            callback = callback.args[0]
+        else:
+            callback = callback.func
+    func = getattr(callback, '__func__', callback)
+    return getattr(func, '__code__', func)
+
+
+def _callback_name(key):
+    """A readable name for a key from _callback_key."""
+    if hasattr(key, 'co_name'):
+        return '%s (%s:%i)' % (key.co_name, key.co_filename, key.co_firstlineno)
+    return getattr(key, '__name__', None) or repr(key)
+
+
+def _log_slow_callback(callback, elapsed):
+    logging.warning("IOLoop callback %r took %.3f seconds", callback, elapsed)
+
+
+class _LoopStats(object):
+    """Counters for an instrumented IOLoop.
+
+    Per-call updates are in-place on preallocated lists, so recording
+    doesn't allocate once a callback or handler has been seen.
+    """
+
+    # upper bounds of the timeout lag histogram buckets, in seconds
+    lag_bounds = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    def __init__(self):
+        self.slow_threshold = None
+        self.slow_hook = _log_slow_callback
+        self.reset()
+
+    def reset(self):
+        self.iterations = 0
+        self.poll_time = 0.0
+        self.work_time = 0.0
+        self.max_work_time = 0.0
+        # key: [count, total time, max time]
+        self.callbacks = {}
+        self.handlers = {}
+        self.lag_counts = [0] * (len(self.lag_bounds) + 1)
+        self.max_lag = 0.0
+        self.slow = 0
+
+    def record_iteration(self, poll_time, work_time):
+        self.iterations += 1
+        self.poll_time += poll_time
+        self.work_time += work_time
+        if work_time > self.max_work_time:
+            self.max_work_time = work_time
+
+    def record_lag(self, lag):
+        self.lag_counts[bisect.bisect_left(self.lag_bounds, lag)] += 1
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def record_callback(self, callback, elapsed):
+        self._record(self.callbacks, _callback_key(callback), callback, elapsed)
+
+    def run_handler(self, fd, handler, events):
+        start = monotonic()
+        try:
+            handler(fd, events)
+        finally:
+            self._record(self.handlers, fd, handler, monotonic() - start)
+
+    def _record(self, table, key, callback, elapsed):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self.slow += 1
+            try:
+                self.slow_hook(callback, elapsed)
+            except Exception:
+                logging.error("Exception in slow callback hook", exc_info=True)
+
+    @staticmethod
+    def _summarize(table, name):
+        summary = {}
+        for key, (count, total, longest) in table.items():
+            key = name(key)
+            if key in summary:
+                # different functions with the same name
+                entry = summary[key]
+                entry['count'] += count
+                entry['time'] += total
+                entry['max'] = max(entry['max'], longest)
+            else:
+                summary[key] = dict(count=count, time=total, max=longest)
+        return summary
+
+    def snapshot(self):
+        bounds = self.lag_bounds + (float('inf'),)
+        return dict(
+            iterations=self.iterations,
+            poll_time=self.poll_time,
+            work_time=self.work_time,
+            max_work_time=self.max_work_time,
+            callbacks=self._summarize(self.callbacks, _callback_name),
+            handlers=self._summarize(self.handlers, lambda fd: fd),
+            lag=list(zip(bounds, self.lag_counts)),
+            max_lag=self.max_lag,
+            slow=self.slow,
+        )
+
+
 class _Timeout(object):
-    """An IOLoop timeout, a UNIX timestamp and a callback"""
+    """An IOLoop timeout, a deadline on the IOLoop's clock and a callback"""
 
     # Reduce memory overhead when there are lots of pending callbacks
-    __slots__ = ['deadline', 'callback']
+    # _bucket is where the timer queue is keeping us, None when we are not queued
+    __slots__ = ['deadline', 'callback', '_bucket']
 
     def __init__(self, deadline, callback):
-        if isinstance(deadline, (int, long, float)):
-            self.deadline = deadline
-        elif isinstance(deadline, datetime.timedelta):
-            self.deadline = time.time() + _Timeout.timedelta_to_seconds(deadline)
-        else:
+        # IOLoop.add_timeout converts timestamps and timedeltas to the loop's clock
+        if not isinstance(deadline, (int, long, float)):
             raise TypeError("Unsupported deadline %r" % deadline)
+        self.deadline = deadline
         self.callback = callback
+        self._bucket = None
 
     @staticmethod
     def timedelta_to_seconds(td):
@@ -481,24 +774,335 @@ class _Timeout(object):
                 (other.deadline, id(other)))
 
 
+class HeapTimers(object):
+    """The default IOLoop timer queue, a heap of timeouts ordered by deadline.
+
+    Adding a timeout is O(log n). A cancelled timeout is only marked as
+    cancelled, and left in the heap until it is popped. Once cancelled
+    timeouts are more than half of the heap, the heap is rebuilt without
+    them, so cancelled timeouts can't pile up.
+    """
+
+    # don't bother compacting small heaps
+    compact_threshold = 512
+
+    def __init__(self):
+        self._heap = []
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def add(self, timeout):
+        timeout._bucket = self._heap
+        heapq.heappush(self._heap, timeout)
+
+    def remove(self, timeout):
+        timeout.callback = None
+        if timeout._bucket is self._heap:
+            timeout._bucket = None
+            self._cancelled += 1
+            if self._cancelled > self.compact_threshold and \
+                    2 * self._cancelled > len(self._heap):
+                self._compact()
+
+    def _compact(self):
+        """Rebuild the heap without cancelled timeouts."""
+        self._heap = [ t for t in self._heap if t._bucket is not None ]
+        for t in self._heap:
+            t._bucket = self._heap
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def _drop_cancelled(self):
+        """Pop cancelled timeouts off the top of the heap."""
+        heap = self._heap
+        while heap and heap[0]._bucket is None:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+
+    def pop_due(self, now):
+        """Remove and return the timeouts due by `now`, earliest first."""
+        heap = self._heap
+        due = []
+        while heap and heap[0].deadline <= now:
+            timeout = heapq.heappop(heap)
+            if timeout._bucket is None:
+                self._cancelled -= 1
+            else:
+                timeout._bucket = None
+                due.append(timeout)
+        return due
+
+    def next_deadline(self):
+        """The deadline of the next timeout, or None if there are none."""
+        self._drop_cancelled()
+        if self._heap:
+            return self._heap[0].deadline
+        return None
+
+    def stats(self):
+        return dict(live=len(self), cancelled=self._cancelled)
+
+
+class _Slot(set):
+    """A slot of a TimerWheel, which knows its level."""
+    __slots__ = ['level']
+
+    def __init__(self, level):
+        set.__init__(self)
+        self.level = level
+
+
+class TimerWheel(object):
+    """A hierarchical timer wheel, for IOLoops with very many timeouts.
+
+    Adding and cancelling a timeout are O(1), and cancelled timeouts are
+    removed right away. Deadlines are rounded up to `resolution` seconds,
+    so timeouts may run up to one `resolution` late.
+
+    The wheel has `levels` levels of 256 slots each. Level 0 has a slot for
+    each of the next 256 ticks, and each slot of level n covers a whole
+    turn of level n-1. As time passes, the timeouts in the next slot of
+    a higher level are moved down to the levels below. Timeouts beyond the
+    last level are kept in an overflow set until they are in range.
+
+    Parameters
+    ----------
+    resolution : float
+        The length of a tick, in seconds.
+    levels : int
+        The number of levels.
+    time_func : callable
+        The clock that deadlines are measured with.  An IOLoop sets its
+        own `IOLoop.time` if this is None, the default.
+    """
+
+    _bits = 8
+    _slots = 1 << _bits
+    _mask = _slots - 1
+
+    def __init__(self, resolution=0.001, levels=4, time_func=None):
+        self.resolution = resolution
+        self.time_func = time_func
+        self._levels = [ [ _Slot(level) for i in range(self._slots) ]
+                         for level in range(levels) ]
+        self._level_counts = [0] * levels
+        self._overflow = _Slot(levels)
+        self._due = []
+        self._count = 0
+        # the current tick, None until the wheel is first used
+        self._tick = None
+        # a lower bound on the tick of the next event, or None if unknown
+        self._next = None
+
+    def __len__(self):
+        return self._count
+
+    def _tick_of(self, t):
+        return int(t / self.resolution)
+
+    def _deadline_tick(self, timeout):
+        return int(math.ceil(timeout.deadline / self.resolution))
+
+    def add(self, timeout):
+        tick = self._deadline_tick(timeout)
+        if not self._count:
+            # catch up, so an idle wheel isn't far behind
+            now = self._tick_of((self.time_func or monotonic)())
+            if self._tick is None or now > self._tick:
+                self._tick = now
+        self._count += 1
+        self._insert(timeout, tick)
+        if self._next is not None and tick < self._next:
+            self._next = tick
+
+    def _insert(self, timeout, tick):
+        delta = tick - self._tick
+        if delta <= 0:
+            timeout._bucket = self._due
+            self._due.append(timeout)
+            return
+        bits = self._bits
+        for level in range(len(self._levels)):
+            if delta >> (bits * (level + 1)) == 0:
+                slot = self._levels[level][(tick >> (bits * level)) & self._mask]
+                self._level_counts[level] += 1
+                break
+        else:
+            slot = self._overflow
+        slot.add(timeout)
+        timeout._bucket = slot
+
+    def remove(self, timeout):
+        timeout.callback = None
+        slot = timeout._bucket
+        if slot is None:
+            return
+        timeout._bucket = None
+        self._count -= 1
+        if slot is self._due:
+            # skipped by the next pop_due
+            return
+        slot.discard(timeout)
+        if slot is not self._overflow:
+            self._level_counts[slot.level] -= 1
+
+    def _lowest_level(self):
+        """The lowest level with any timeouts, len(levels) for overflow only."""
+        for level, count in enumerate(self._level_counts):
+            if count:
+                return level
+        return len(self._levels)
+
+    def _cascade(self, level, index):
+        """Move the timeouts in a slot of `level` down to lower levels."""
+        slot = self._levels[level][index]
+        if not slot:
+            return
+        self._levels[level][index] = _Slot(level)
+        self._level_counts[level] -= len(slot)
+        for timeout in slot:
+            self._insert(timeout, self._deadline_tick(timeout))
+
+    def _advance(self, target):
+        """Advance the wheel to tick `target`, collecting expired timeouts."""
+        if self._tick is None:
+            # nothing has been added yet
+            self._tick = target
+        bits = self._bits
+        mask = self._mask
+        levels = self._levels
+        counts = self._level_counts
+        nlevels = len(levels)
+        while self._tick < target:
+            if counts[0]:
+                tick = self._tick + 1
+            else:
+                level = self._lowest_level()
+                if level == nlevels and not self._overflow:
+                    # the wheel is empty
+                    self._tick = target
+                    break
+                # skip to the next time the lowest used level cascades
+                shift = bits * level
+                tick = min(((self._tick >> shift) + 1) << shift, target)
+            self._tick = tick
+            if tick & mask == 0:
+                for level in range(1, nlevels):
+                    index = (tick >> (bits * level)) & mask
+                    self._cascade(level, index)
+                    if index:
+                        break
+                else:
+                    overflow = self._overflow
+                    if overflow:
+                        self._overflow = _Slot(nlevels)
+                        for timeout in overflow:
+                            self._insert(timeout, self._deadline_tick(timeout))
+            slot = levels[0][tick & mask]
+            if slot:
+                levels[0][tick & mask] = _Slot(0)
+                counts[0] -= len(slot)
+                for timeout in slot:
+                    timeout._bucket = self._due
+                self._due.extend(slot)
+
+    def pop_due(self, now):
+        """Remove and return the timeouts due by `now`, earliest first."""
+        self._advance(self._tick_of(now))
+        if self._next is not None and self._next <= self._tick:
+            self._next = None
+        due = self._due
+        if not due:
+            return due
+        self._due = []
+        result = []
+        for timeout in due:
+            if timeout._bucket is not None:
+                timeout._bucket = None
+                result.append(timeout)
+        self._count -= len(result)
+        result.sort()
+        return result
+
+    def next_deadline(self):
+        """The time of the next timeout, or of the next cascade from a higher
+        level, which may be earlier. None if there are no timeouts.
+        """
+        if not self._count:
+            return None
+        if self._due:
+            return self._tick * self.resolution
+        if self._next is None:
+            self._next = self._find_next()
+        return self._next * self.resolution
+
+    def _find_next(self):
+        """Find the tick of the next timeout in level 0, or of the next cascade
+        from a higher level, whichever is first.
+        """
+        bits = self._bits
+        mask = self._mask
+        tick = self._tick
+        level = self._lowest_level()
+        if level == 0:
+            # level 0 timeouts are all in the next turn
+            slots = self._levels[0]
+            for i in range(1, self._slots + 1):
+                if slots[(tick + i) & mask]:
+                    next_tick = tick + i
+                    break
+            level = 1
+            while level < len(self._levels) and not self._level_counts[level]:
+                level += 1
+        else:
+            next_tick = None
+        shift = bits * level
+        cascade = ((tick >> shift) + 1) << shift
+        if next_tick is None:
+            return cascade
+        return min(next_tick, cascade)
+
+    def stats(self):
+        return dict(live=self._count, cancelled=0)
+
+
 class PeriodicCallback(object):
     """Schedules the given callback to be called periodically.
 
-    The callback is called every callback_time milliseconds.
+    The callback is called every callback_time milliseconds, on a fixed
+    schedule from when `start` is called, so that the time the callback
+    takes doesn't make the ticks drift.
+
+    If the IOLoop is too busy to run a tick on time, `policy` decides what
+    happens to the missed ticks:
+
+    * SKIP (default): missed ticks are dropped, and the callback runs once,
+      then again at the next tick on the original schedule.
+    * CATCH_UP: every missed tick is run, as soon as possible, so the
+      callback runs the same number of times in the long run.
 
     `start` must be called after the PeriodicCallback is created.
     """
-    def __init__(self, callback, callback_time, io_loop=None):
+
+    SKIP = 'skip'
+    CATCH_UP = 'catch_up'
+
+    def __init__(self, callback, callback_time, io_loop=None, policy=SKIP):
+        if policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError("policy must be SKIP or CATCH_UP, not %r" % policy)
         self.callback = callback
         self.callback_time = callback_time
         self.io_loop = io_loop or IOLoop.instance()
+        self.policy = policy
         self._running = False
         self._timeout = None
 
     def start(self):
         """Starts the timer."""
         self._running = True
-        self._next_timeout = time.time()
+        self._next_timeout = self.io_loop.time()
         self._schedule_next()
 
     def stop(self):
@@ -519,10 +1123,15 @@ class PeriodicCallback(object):
 
     def _schedule_next(self):
         if self._running:
-            current_time = time.time()
-            while self._next_timeout <= current_time:
-                self._next_timeout += self.callback_time / 1000.0
-            self._timeout = self.io_loop.add_timeout(self._next_timeout, self._run)
+            period = self.callback_time / 1000.0
+            # always step from the last deadline, not from now, to avoid drift
+            self._next_timeout += period
+            if self.policy == self.SKIP:
+                current_time = self.io_loop.time()
+                if self._next_timeout <= current_time:
+                    missed = (current_time - self._next_timeout) // period + 1
+                    self._next_timeout += missed * period
+            self._timeout = self.io_loop.call_at(self._next_timeout, self._run)
 
 class DelayedCallback(PeriodicCallback):
     """Schedules the given callback to be called once.
@@ -538,8 +1147,8 @@ class DelayedCallback(PeriodicCallback):
         """Starts the timer."""
         self._running = True
         self._firstrun = True
-        self._next_timeout = time.time() + self.callback_time / 1000.0
-        self.io_loop.add_timeout(self._next_timeout, self._run)
+        self._next_timeout = self.io_loop.time() + self.callback_time / 1000.0
+        self._timeout = self.io_loop.call_at(self._next_timeout, self._run)
     
     def _run(self):
         if not self._running: return
@@ -597,13 +1206,39 @@ class ZMQPoller(object):
         """poll in seconds rather than milliseconds.
         
         Event masks will be IOLoop.READ/WRITE/ERROR
+        
+        The timeout is rounded up to whole milliseconds, so that waiting
+        for a sub-millisecond deadline doesn't spin with zero timeouts.
+        The IOLoop checks deadlines again with its precise clock after
+        each poll.
         """
-        z_events = self._poller.poll(1000*timeout)
+        z_events = self._poller.poll(int(math.ceil(1000*timeout)))
         return [ (fd,self._remap_events(evt)) for (fd,evt) in z_events ]
     
     def close(self):
         pass
 
+
+class ZMQEpollPoller(ZMQPoller):
+    """A ZMQPoller using epoll, for loops with many mostly idle sockets.
+
+    This wraps a zmq.EpollPoller, so the cost of each poll scales with
+    the number of active sockets, not the number registered::
+
+        loop = IOLoop(impl=ZMQEpollPoller())
+
+    Only available on Linux, creating one elsewhere raises ImportError.
+    """
+
+    def __init__(self):
+        self._poller = EpollPoller()
+
+    def fileno(self):
+        return self._poller.fileno()
+
+    def close(self):
+        self._poller.close()
+
 _poll = ZMQPoller
 
 def install():
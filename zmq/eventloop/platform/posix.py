@@ -17,6 +17,8 @@
 
 import fcntl
 import os
+import struct
+import sys
 
 from zmq.utils.strtypes import b
 
@@ -28,7 +30,8 @@ def _set_nonblocking(fd):
     flags = fcntl.fcntl(fd, fcntl.F_GETFL)
     fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
     
-class Waker(object):
+class PipeWaker(object):
+    """A Waker using a non-blocking pipe."""
     def __init__(self):
         r, w = os.pipe()
         _set_nonblocking(r)
@@ -58,3 +61,69 @@ class Waker(object):
     def close(self):
         self.reader.close()
         self.writer.close()
+
+
+# eventfd flags, from sys/eventfd.h
+_EFD_CLOEXEC = 0o2000000
+_EFD_NONBLOCK = 0o4000
+
+def _find_eventfd():
+    """Return a function creating an eventfd, or None if there isn't one."""
+    if hasattr(os, 'eventfd'):
+        # python >= 3.10
+        return os.eventfd
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        c_eventfd = libc.eventfd
+    except (ImportError, OSError, AttributeError):
+        return None
+    c_eventfd.argtypes = [ctypes.c_uint, ctypes.c_int]
+    c_eventfd.restype = ctypes.c_int
+    def eventfd(initval, flags):
+        fd = c_eventfd(initval, flags)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        return fd
+    return eventfd
+
+_eventfd = _find_eventfd()
+
+class EventFDWaker(object):
+    """A Waker using a Linux eventfd.
+
+    This needs one fd rather than two, and consume is a single read,
+    however many times wake was called.
+    """
+    _one = struct.pack('=Q', 1)
+
+    def __init__(self):
+        self._fd = _eventfd(0, _EFD_NONBLOCK | _EFD_CLOEXEC)
+
+    def fileno(self):
+        return self._fd
+
+    def wake(self):
+        try:
+            os.write(self._fd, self._one)
+        except (OSError, IOError):
+            # EAGAIN: the counter is full, so we are awake anyway
+            pass
+
+    def consume(self):
+        try:
+            os.read(self._fd, 8)
+        except (OSError, IOError):
+            # EAGAIN: nothing to consume
+            pass
+
+    def close(self):
+        os.close(self._fd)
+
+if _eventfd is not None:
+    Waker = EventFDWaker
+else:
+    Waker = PipeWaker
@@ -0,0 +1,292 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+"""A pipelining request/reply client on a DEALER socket.
+
+Unlike a REQ socket, which allows one outstanding request at a time, an
+RPCClient can have many requests in flight over one connection.  Each
+request is prefixed with a 4-byte correlation id frame, and the server
+must send the reply with the same id as its first frame.  A ROUTER server
+receives ``[identity, id, request frames...]`` and replies with
+``[identity, id, reply frames...]``.
+"""
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import bisect
+import heapq
+import logging
+import struct
+
+import zmq
+from zmq.core.error import ZMQBaseError
+from zmq.eventloop.ioloop import IOLoop, PeriodicCallback
+from zmq.eventloop.zmqstream import ZMQStream
+from zmq.eventloop.future import Future
+from zmq.utils.strtypes import bytes
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+_id_struct = struct.Struct('!I')
+_max_id = 2**32
+
+
+class RPCTimeout(ZMQBaseError):
+    """No reply arrived before the deadline of the last attempt."""
+    pass
+
+
+class _Request(object):
+    """An in-flight request."""
+
+    __slots__ = ['id', 'msg', 'future', 'timeout', 'retries', 'attempts',
+                 'start', 'deadline']
+
+    def __init__(self, req_id, msg, future, timeout, retries, start):
+        self.id = req_id
+        self.msg = msg
+        self.future = future
+        self.timeout = timeout
+        self.retries = retries
+        self.attempts = 0
+        self.start = start
+        self.deadline = None
+
+
+class RPCClient(object):
+    """A client for pipelined request/reply over a single DEALER socket.
+
+    `request` sends a multipart message, and returns a Future for the reply
+    frames.  Requests that get no reply within `timeout` milliseconds are
+    sent again up to `retries` times, with the timeout multiplied by
+    `backoff` for each retry, and then fail with RPCTimeout.  Because
+    DEALER load-balances, a retry may go to a different backend.
+
+    Deadlines are not individual timeouts: they are kept in a heap and
+    swept in bulk every `resolution` milliseconds, so a timeout can fire
+    up to `resolution` late.
+
+    At most `max_in_flight` requests can be waiting for replies.  Beyond
+    that, `request` fails right away with EAGAIN.
+
+    The latency stats describe the backends this client is connected to,
+    so use one RPCClient per backend service you want to measure.
+
+    Parameters
+    ----------
+    context : zmq.Context, optional
+        The Context for the DEALER socket, Context.instance() by default.
+    loop : IOLoop, optional
+        The IOLoop, IOLoop.instance() by default.
+    timeout : int
+        The default timeout for each attempt, in milliseconds.  0 for none.
+    retries : int
+        The default number of times a request is sent again after a timeout.
+    backoff : float
+        The factor applied to the timeout for each retry.
+    max_in_flight : int
+        The most requests that may be waiting for replies at once.
+    resolution : int
+        How often to check deadlines, in milliseconds.
+    """
+
+    # upper bounds of the latency histogram buckets, in seconds
+    latency_bounds = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    def __init__(self, context=None, loop=None, timeout=1000, retries=0,
+                 backoff=2.0, max_in_flight=10000, resolution=10):
+        self.loop = loop if loop is not None else IOLoop.instance()
+        self.context = context if context is not None else zmq.Context.instance()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight
+        self.socket = self.context.socket(zmq.DEALER)
+        self.stream = ZMQStream(self.socket, self.loop)
+        self.stream.on_recv(self._handle_reply, batch=64)
+        self._in_flight = {}
+        # heap of (deadline, sequence, request), stale entries are skipped
+        self._deadlines = []
+        self._sequence = 0
+        self._next_id = 0
+        self._sweeper = PeriodicCallback(self._sweep, resolution, self.loop)
+        self._sweeping = False
+        self._reset_stats()
+
+    def connect(self, url):
+        """Connect the client to the proto://ip:port given in the url."""
+        self.socket.connect(url)
+
+    def bind(self, url):
+        """Bind the client to the proto://ip:port given in the url."""
+        self.socket.bind(url)
+
+    def __len__(self):
+        """The number of requests in flight."""
+        return len(self._in_flight)
+
+    def close(self):
+        """Close the client, failing any requests still in flight."""
+        if self._sweeping:
+            self._sweeper.stop()
+            self._sweeping = False
+        in_flight = list(self._in_flight.values())
+        self._in_flight.clear()
+        self._deadlines = []
+        self.stream.close()
+        for req in in_flight:
+            req.future.set_exception(IOError("RPCClient is closed"))
+
+    def request(self, msg, timeout=None, retries=None):
+        """Send a request, and return a Future for the reply.
+
+        Parameters
+        ----------
+        msg : bytes or list
+            The request, a single frame or a list of frames.
+        timeout : int, optional
+            The timeout for this request, in milliseconds.
+        retries : int, optional
+            How many times to send the request again after a timeout.
+
+        Returns
+        -------
+        future : Future
+            The Future's result is the list of reply frames, after the id.
+        """
+        future = Future()
+        if len(self._in_flight) >= self.max_in_flight:
+            future.set_exception(zmq.ZMQError(zmq.EAGAIN,
+                                              "too many RPC requests in flight"))
+            return future
+        if isinstance(msg, bytes):
+            msg = [msg]
+        req = _Request(self._new_id(), msg, future,
+                       self.timeout if timeout is None else timeout,
+                       self.retries if retries is None else retries,
+                       self.loop.time())
+        self._in_flight[req.id] = req
+        self._stats['sent'] += 1
+        self._send(req)
+        return future
+
+    def _new_id(self):
+        """Allocate the next id that isn't in flight."""
+        req_id = self._next_id
+        while req_id in self._in_flight:
+            req_id = (req_id + 1) % _max_id
+        self._next_id = (req_id + 1) % _max_id
+        return req_id
+
+    def _send(self, req):
+        """Send an attempt of a request, and set its deadline."""
+        req.attempts += 1
+        if req.timeout > 0:
+            timeout = req.timeout * self.backoff ** (req.attempts - 1)
+            req.deadline = self.loop.time() + 1e-3 * timeout
+            self._sequence += 1
+            heapq.heappush(self._deadlines, (req.deadline, self._sequence, req))
+            if not self._sweeping:
+                self._sweeping = True
+                self._sweeper.start()
+        self.stream.send_multipart([_id_struct.pack(req.id)] + list(req.msg))
+
+    def _sweep(self):
+        """Retry or fail every request past its deadline."""
+        now = self.loop.time()
+        deadlines = self._deadlines
+        in_flight = self._in_flight
+        stats = self._stats
+        expired = []
+        while deadlines and deadlines[0][0] <= now:
+            deadline, _, req = heapq.heappop(deadlines)
+            # skip requests that were answered, or sent again since
+            if in_flight.get(req.id) is not req or req.deadline != deadline:
+                continue
+            if req.attempts <= req.retries:
+                stats['retries'] += 1
+                self._send(req)
+            else:
+                del in_flight[req.id]
+                stats['timeouts'] += 1
+                expired.append(req)
+        if not deadlines and self._sweeping:
+            self._sweeper.stop()
+            self._sweeping = False
+        for req in expired:
+            req.future.set_exception(RPCTimeout("no reply after %i attempts"
+                                                % req.attempts))
+
+    def _handle_reply(self, msg):
+        if not msg or len(msg[0]) != _id_struct.size:
+            self._stats['errors'] += 1
+            logging.error("Unexpected reply in RPCClient: %r", msg[:1])
+            return
+        req = self._in_flight.pop(_id_struct.unpack(msg[0])[0], None)
+        if req is None:
+            # the reply to a request that timed out, or to a retried one
+            self._stats['late'] += 1
+            return
+        self._record_latency(self.loop.time() - req.start)
+        req.future.set_result(msg[1:])
+
+    def _record_latency(self, latency):
+        stats = self._stats
+        stats['replies'] += 1
+        self._latency_counts[bisect.bisect_left(self.latency_bounds, latency)] += 1
+        self._latency_total += latency
+        if stats['replies'] == 1 or latency < self._latency_min:
+            self._latency_min = latency
+        if latency > self._latency_max:
+            self._latency_max = latency
+
+    def _reset_stats(self):
+        self._stats = dict(sent=0, replies=0, retries=0, timeouts=0,
+                           late=0, errors=0)
+        self._latency_counts = [0] * (len(self.latency_bounds) + 1)
+        self._latency_total = 0.0
+        self._latency_min = 0.0
+        self._latency_max = 0.0
+
+    def stats(self, reset=False):
+        """Return a dict of counters for the client.
+
+        * sent: requests sent, not counting retries
+        * replies: requests answered
+        * retries: requests sent again after a timeout
+        * timeouts: requests that failed with RPCTimeout
+        * late: replies to requests no longer in flight
+        * errors: replies without a valid id
+        * in_flight: requests waiting for replies now
+        * latency: a dict of the ``mean``, ``min`` and ``max`` seconds from
+          first sending a request to its reply, and ``buckets``, a list of
+          ``(upper_bound, count)`` pairs
+
+        If `reset` is True, the counters are cleared after the snapshot.
+        """
+        stats = dict(self._stats)
+        replies = stats['replies']
+        bounds = self.latency_bounds + (float('inf'),)
+        stats['in_flight'] = len(self._in_flight)
+        stats['latency'] = dict(
+            mean=self._latency_total / replies if replies else 0.0,
+            min=self._latency_min,
+            max=self._latency_max,
+            buckets=list(zip(bounds, self._latency_counts)),
+        )
+        if reset:
+            self._reset_stats()
+        return stats
+
+
+__all__ = ['RPCClient', 'RPCTimeout']
@@ -19,25 +19,37 @@ from __future__ import with_statement
 
 import sys
 import logging
+from collections import deque
 
 import zmq
 from zmq.core.socket import jsonapi, pickle
 
 from zmq.eventloop.ioloop import IOLoop
 from zmq.eventloop import stack_context
-
-try:
-    from queue import Queue
-except ImportError:
-    from Queue import Queue
+from zmq.eventloop.future import Future
 
 from zmq.utils.strtypes import bytes, unicode, basestring
+from zmq.utils.serializers import get_serializer
 
 try:
     callable
 except NameError:
     callable = lambda obj: hasattr(obj, '__call__')
 
+# policies for a full send queue, see ZMQStream.set_send_queue_limit
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+RAISE = 'raise'
+PAUSE = 'pause'
+_queue_policies = (DROP_NEWEST, DROP_OLDEST, RAISE, PAUSE)
+
+def _msg_bytes(msg):
+    """The number of bytes in a multipart message, for send queue limits."""
+    nbytes = 0
+    for part in msg:
+        nbytes += getattr(part, 'nbytes', None) or len(part)
+    return nbytes
+
 
 class ZMQStream(object):
     """A utility class to register callbacks when a zmq socket sends and receives
@@ -48,15 +60,23 @@ class ZMQStream(object):
     
     Methods:
     
-    * **on_recv(callback, copy=True):**
+    * **on_recv(callback, copy=True, batch=1):**
         register a callback to be run every time the socket has something to receive
+    * **on_recv_batch(callback, copy=True, batch=100):**
+        register a callback to be run with a list of all the messages
+        received at once
     * **on_send(callback):**
         register a callback to be run every time you call send
     * **send(self, msg, flags=0, copy=False, callback=None):**
         perform a send that will trigger the callback
         if callback is passed, on_send is also called.
         
-        There are also send_multipart(), send_json(), send_pyobj()
+        There are also send_multipart(), send_json(), send_pyobj(),
+        send_serialized()
+    
+    For code that waits on replies, rather than registering callbacks,
+    send_future() and recv_future() return Futures that the loop resolves
+    when the message is sent or received.
     
     Three other methods for deactivating the callbacks:
     
@@ -67,6 +87,14 @@ class ZMQStream(object):
     
     which simply call ``on_<evt>(None)``.
     
+    set_compression() compresses large frames, for links where bandwidth
+    costs more than CPU, and compression_stats() reports the savings.
+    
+    By default the send queue is unbounded. Use set_send_queue_limit() to
+    bound it, along with on_pressure() and on_drain() to be notified when
+    it fills and empties, and link_input() to stop reading from other
+    streams while it is full.
+    
     The entire socket interface, excluding direct recv methods, is also
     provided, primarily through direct-linking the methods.
     e.g.
@@ -74,20 +102,46 @@ class ZMQStream(object):
     >>> stream.bind is stream.socket.bind
     True
     
+    Callbacks are wrapped to run in the StackContext they were registered
+    in, and each runs inside a NullContext.  Pass ``use_stack_context=False``
+    to skip both, for hot streams that don't use StackContexts; the default
+    follows the IOLoop's ``use_stack_context``.  An exception in a callback
+    still closes the stream either way.
+    
     """
     
     socket = None
     io_loop = None
     poller = None
     
-    def __init__(self, socket, io_loop=None):
+    def __init__(self, socket, io_loop=None, use_stack_context=None):
         self.socket = socket
         self.io_loop = io_loop or IOLoop.instance()
         self.poller = zmq.Poller()
-        
-        self._send_queue = Queue()
+        if use_stack_context is None:
+            use_stack_context = getattr(self.io_loop, 'use_stack_context', True)
+        self.use_stack_context = use_stack_context
+        
+        self._send_queue = deque()
+        self._send_queue_bytes = 0
+        self._send_limit_messages = 0
+        self._send_limit_bytes = 0
+        self._send_policy = DROP_NEWEST
+        self._pressured = False
+        self._pressure_callback = None
+        self._drain_callback = None
+        self._linked_inputs = []
+        self._recv_paused = 0
+        self._send_stats = dict(peak_messages=0, peak_bytes=0,
+                                dropped=0, pressure_events=0)
         self._recv_callback = None
+        # (future, copy) for each pending recv_future
+        self._recv_futures = deque()
+        self._recv_batch = 1
+        self._recv_batch_callback = False
         self._send_callback = None
+        # the callback given to on_send, before _wrap
+        self._send_callback_raw = None
         self._close_callback = None
         self._recv_copy = False
         self._flushed = False
@@ -123,7 +177,7 @@ class ZMQStream(object):
         """DEPRECATED, does nothing"""
         logging.warn("on_err does nothing, and will be removed")
     
-    def on_recv(self, callback, copy=True):
+    def on_recv(self, callback, copy=True, batch=1):
         """Register a callback for when a message is ready to recv.
         
         There can be only one callback registered at a time, so each
@@ -145,20 +199,48 @@ class ZMQStream(object):
             copy is passed directly to recv, so if copy is False,
             callback will receive Message objects. If copy is True,
             then callback will receive bytes/str objects.
+        batch : int
+            The maximum number of messages to receive for each event
+            on the socket. Messages are received until there are none
+            waiting, or `batch` have been received, calling `callback`
+            once for each.
         
         Returns : None
         """
+        self._set_recv_callback(callback, copy, batch, False)
+    
+    def on_recv_batch(self, callback, copy=True, batch=100):
+        """Register a callback for when messages are ready to recv,
+        which receives every waiting message in a single call.
+        
+        Like on_recv, but all the messages that are waiting, up to `batch`,
+        are received at once, and passed to `callback` as a list::
+        
+            callback(msgs)
         
+        where each element of `msgs` is a list, as returned by
+        socket.recv_multipart().
+        
+        on_recv_batch(None) disables recv event polling.
+        """
+        self._set_recv_callback(callback, copy, batch, True)
+    
+    def _set_recv_callback(self, callback, copy, batch, batch_callback):
+        """Register a recv callback, for on_recv and on_recv_batch."""
         self._check_closed()
         assert callback is None or callable(callback)
-        self._recv_callback = stack_context.wrap(callback)
+        if batch < 1:
+            raise ValueError("batch must be at least 1, not %r" % batch)
+        self._recv_callback = self._wrap(callback)
         self._recv_copy = copy
-        if callback is None:
-            self._drop_io_state(self.io_loop.READ)
-        else:
+        self._recv_batch = batch
+        self._recv_batch_callback = batch_callback
+        if self.receiving():
             self._add_io_state(self.io_loop.READ)
+        else:
+            self._drop_io_state(self.io_loop.READ)
     
-    def on_recv_stream(self, callback, copy=True):
+    def on_recv_stream(self, callback, copy=True, batch=1):
         """Same as on_recv, but callback will get this stream as first argument
         
         callback must take exactly two arguments, as it will be called as::
@@ -170,7 +252,26 @@ class ZMQStream(object):
         if callback is None:
             self.stop_on_recv()
         else:
-            self.on_recv(lambda msg: callback(self, msg), copy=copy)
+            self.on_recv(lambda msg: callback(self, msg), copy=copy, batch=batch)
+    
+    def on_recv_serialized(self, callback, serializer=None):
+        """Register a callback for deserialized messages.
+        
+        Like on_recv, but each message is deserialized with `serializer`
+        (a registered name or a Serializer, the socket's `serializer` by
+        default), and the callback is called with the object::
+        
+            callback(obj)
+        
+        on_recv_serialized(None) disables recv event polling.
+        """
+        if callback is None:
+            return self.stop_on_recv()
+        if serializer is None:
+            serializer = self.socket.serializer
+        serializer = get_serializer(serializer)
+        deserialize = serializer.deserialize
+        self.on_recv(lambda msg: callback(deserialize(msg)), copy=serializer.copy)
     
     def on_send(self, callback):
         """Register a callback to be called on each send
@@ -210,7 +311,8 @@ class ZMQStream(object):
         
         self._check_closed()
         assert callback is None or callable(callback)
-        self._send_callback = stack_context.wrap(callback)
+        self._send_callback = self._wrap(callback)
+        self._send_callback_raw = callback
         
     
     def on_send_stream(self, callback):
@@ -228,24 +330,239 @@ class ZMQStream(object):
             self.on_send(lambda msg, status: callback(stream, msg, status))
         
         
+    def set_send_queue_limit(self, max_messages=0, max_bytes=0, policy=DROP_NEWEST):
+        """Bound the queue of messages waiting to be sent.
+        
+        When the queue is full, sends are handled according to `policy`,
+        and the on_pressure callback is called. Once sending has drained
+        the queue to half of the limits, the on_drain callback is called.
+        
+        Parameters
+        ----------
+        max_messages : int
+            The maximum number of queued messages, 0 for no limit.
+        max_bytes : int
+            The maximum number of queued bytes, 0 for no limit.
+        policy : str
+            What to do with a send when the queue is full:
+            
+            * DROP_NEWEST: discard the message being sent.
+            * DROP_OLDEST: queue the message, and discard the oldest
+              queued messages to make room.
+            * RAISE: raise ZMQError(EAGAIN).
+            * PAUSE: queue the message anyway, and stop receiving on
+              the streams passed to link_input() until the queue drains.
+            
+            Dropped messages are counted in send_queue_stats().
+        """
+        if policy not in _queue_policies:
+            raise ValueError("policy must be one of %s, not %r" % (_queue_policies, policy))
+        if max_messages < 0 or max_bytes < 0:
+            raise ValueError("send queue limits must not be negative")
+        if self._pressured and self._send_policy == PAUSE:
+            for stream in self._linked_inputs:
+                stream.resume_recv()
+        self._pressured = False
+        self._send_limit_messages = max_messages
+        self._send_limit_bytes = max_bytes
+        self._send_policy = policy
+        if self._send_queue_full():
+            self._set_pressure()
+    
+    def on_pressure(self, callback):
+        """Register a callback for when the send queue becomes full.
+        
+        callback will be called with this stream as its only argument.
+        """
+        assert callback is None or callable(callback)
+        self._pressure_callback = self._wrap(callback)
+    
+    def on_drain(self, callback):
+        """Register a callback for when a full send queue has drained.
+        
+        callback will be called with this stream as its only argument,
+        once the queue is down to half of its limits.
+        """
+        assert callback is None or callable(callback)
+        self._drain_callback = self._wrap(callback)
+    
+    def link_input(self, stream):
+        """Pause receiving on `stream` while this stream's send queue is full.
+        
+        Only used with the PAUSE send queue policy. This lets a proxy stop
+        reading from its inputs while its output can't keep up.
+        """
+        if stream not in self._linked_inputs:
+            self._linked_inputs.append(stream)
+            if self._pressured:
+                stream.pause_recv()
+    
+    def unlink_input(self, stream):
+        """Stop pausing `stream` when this stream's send queue is full."""
+        if stream in self._linked_inputs:
+            self._linked_inputs.remove(stream)
+            if self._pressured:
+                stream.resume_recv()
+    
+    def pause_recv(self):
+        """Stop receiving, keeping the recv callback, until resume_recv().
+        
+        Calls nest, so receiving resumes after as many resume_recv()
+        calls as there were pause_recv() calls.
+        """
+        self._recv_paused += 1
+        if self.socket is not None:
+            self._drop_io_state(self.io_loop.READ)
+    
+    def resume_recv(self):
+        """Undo one pause_recv()."""
+        if self._recv_paused:
+            self._recv_paused -= 1
+        if self.socket is not None and self.receiving():
+            self._add_io_state(self.io_loop.READ)
+    
+    def send_queue_stats(self):
+        """Return a dict of counters for the send queue.
+        
+        messages, bytes : the messages and bytes queued now
+        peak_messages, peak_bytes : the most queued at once
+        dropped : messages dropped because the queue was full
+        pressure_events : how many times the queue became full
+        pressured : whether the queue is full now
+        """
+        stats = dict(self._send_stats)
+        stats.update(messages=len(self._send_queue),
+                     bytes=self._send_queue_bytes,
+                     pressured=self._pressured)
+        return stats
+    
+    def set_compression(self, compression):
+        """Compress the frames this stream sends, and decompress those it receives.
+        
+        This sets the socket's `compression`, so the peer must set
+        compression too.
+        
+        Parameters
+        ----------
+        compression : Compressor, str or None
+            A zmq.utils.compression.Compressor, the name of a codec to use
+            with the default threshold, or None to disable compression.
+        """
+        self.socket.compression = compression
+    
+    def compression_stats(self, reset=False):
+        """Return the counters of the socket's Compressor, see Compressor.stats.
+        
+        Returns None if compression is not enabled.
+        """
+        compression = self.socket.compression
+        if compression is None:
+            return None
+        return compression.stats(reset)
+    
+    def _send_queue_full(self):
+        """Whether the send queue is at its limits."""
+        if self._send_limit_messages and \
+                len(self._send_queue) >= self._send_limit_messages:
+            return True
+        if self._send_limit_bytes and \
+                self._send_queue_bytes >= self._send_limit_bytes:
+            return True
+        return False
+    
+    def _send_queue_over(self, extra_messages=0, extra_bytes=0):
+        """Whether the send queue would be over its limits with more added."""
+        if self._send_limit_messages and \
+                len(self._send_queue) + extra_messages > self._send_limit_messages:
+            return True
+        if self._send_limit_bytes and \
+                self._send_queue_bytes + extra_bytes > self._send_limit_bytes:
+            return True
+        return False
+    
+    def _enqueue(self, msg, kwargs, future=None):
+        """Queue a message to send, applying the send queue limits.
+        
+        Returns whether the message was queued.  `future`, from send_future,
+        is resolved when the message is sent or dropped.
+        """
+        nbytes = _msg_bytes(msg)
+        queue = self._send_queue
+        stats = self._send_stats
+        # a message bigger than the byte limit can still go on an empty queue
+        if self._send_policy in (DROP_NEWEST, RAISE) and queue and \
+                self._send_queue_over(1, nbytes):
+            if not self._pressured:
+                self._set_pressure()
+            error = zmq.ZMQError(zmq.EAGAIN, "ZMQStream send queue is full")
+            if self._send_policy == RAISE and future is None:
+                raise error
+            stats['dropped'] += 1
+            if future is not None:
+                future.set_exception(error)
+            return False
+        queue.append((msg, kwargs, nbytes, future))
+        self._send_queue_bytes += nbytes
+        if self._send_policy == DROP_OLDEST:
+            while len(queue) > 1 and self._send_queue_over():
+                old = queue.popleft()
+                self._send_queue_bytes -= old[2]
+                stats['dropped'] += 1
+                if old[3] is not None:
+                    old[3].set_exception(zmq.ZMQError(zmq.EAGAIN,
+                                            "ZMQStream send queue is full"))
+        stats['peak_messages'] = max(stats['peak_messages'], len(queue))
+        stats['peak_bytes'] = max(stats['peak_bytes'], self._send_queue_bytes)
+        if not self._pressured and self._send_queue_full():
+            self._set_pressure()
+        return True
+    
+    def _set_pressure(self):
+        """The send queue just became full."""
+        self._pressured = True
+        self._send_stats['pressure_events'] += 1
+        if self._send_policy == PAUSE:
+            for stream in self._linked_inputs:
+                stream.pause_recv()
+        if self._pressure_callback:
+            self._run_callback(self._pressure_callback, self)
+    
+    def _check_drained(self):
+        """Release pressure once the send queue is down to half its limits."""
+        if self._send_limit_messages and \
+                len(self._send_queue) * 2 > self._send_limit_messages:
+            return
+        if self._send_limit_bytes and \
+                self._send_queue_bytes * 2 > self._send_limit_bytes:
+            return
+        self._pressured = False
+        if self._send_policy == PAUSE:
+            for stream in self._linked_inputs:
+                stream.resume_recv()
+        if self._drain_callback:
+            self._run_callback(self._drain_callback, self)
+    
     def send(self, msg, flags=0, copy=True, track=False, callback=None):
         """Send a message, optionally also register a new callback for sends.
         See zmq.socket.send for details.
+
+        Whether the message is actually copied also depends on the
+        socket's `copy_threshold`.
         """
         return self.send_multipart([msg], flags=flags, copy=copy, track=track, callback=callback)
 
     def send_multipart(self, msg, flags=0, copy=True, track=False, callback=None):
         """Send a multipart message, optionally also register a new callback for sends.
         See zmq.socket.send_multipart for details.
+        
+        If the send queue is full, the message is handled according to
+        the policy given to set_send_queue_limit().
         """
         kwargs = dict(flags=flags, copy=copy, track=track)
-        self._send_queue.put((msg, kwargs))
-        callback = callback or self._send_callback
-        if callback is not None:
+        if not self._enqueue(msg, kwargs):
+            return
+        if callback is not None and callback is not self._send_callback_raw:
             self.on_send(callback)
-        else:
-            # noop callback
-            self.on_send(lambda *args: None)
         self._add_io_state(self.io_loop.WRITE)
     
     def send_unicode(self, u, flags=0, encoding='utf-8', callback=None):
@@ -274,6 +591,49 @@ class ZMQStream(object):
         msg = pickle.dumps(obj, protocol)
         return self.send(msg, flags, callback=callback)
     
+    def send_serialized(self, obj, flags=0, serializer=None, callback=None):
+        """Send a Python object, serialized with a registered serializer.
+        
+        See zmq.socket.send_serialized for details.
+        """
+        if serializer is None:
+            serializer = self.socket.serializer
+        frames = get_serializer(serializer).serialize(obj)
+        return self.send_multipart(frames, flags, callback=callback)
+    
+    def send_future(self, msg, flags=0, copy=True, track=False):
+        """Send a multipart message, and return a Future for the send.
+        
+        The Future's result is the return value of socket.send_multipart,
+        a MessageTracker or None, once the message has been sent.  If the
+        send fails, or the message is dropped from a full send queue (see
+        set_send_queue_limit), the Future gets the ZMQError instead.
+        
+        Unlike send_multipart, the on_send callback is left as it is.
+        """
+        future = Future()
+        kwargs = dict(flags=flags, copy=copy, track=track)
+        if self._enqueue(msg, kwargs, future):
+            self._add_io_state(self.io_loop.WRITE)
+        return future
+    
+    def recv_future(self, copy=True):
+        """Return a Future for the next message received on the stream.
+        
+        The Future's result is the message as a list, as returned by
+        socket.recv_multipart().  Messages go to pending recv Futures, in
+        the order they were requested, before any on_recv callback.
+        Cancelling a Future leaves the next message for someone else.
+        
+        If the stream is closed first, the Future gets an IOError.
+        """
+        self._check_closed()
+        future = Future()
+        self._recv_futures.append((future, copy))
+        if self.receiving():
+            self._add_io_state(self.io_loop.READ)
+        return future
+    
     def _finish_flush(self):
         """callback for unsetting _flushed flag."""
         self._flushed = False
@@ -329,14 +689,12 @@ class ZMQStream(object):
         while events and (not limit or count < limit):
             s,event = events[0]
             if event & zmq.POLLIN: # receiving
-                self._handle_recv()
-                count += 1
+                count += self._handle_recv()
                 if self.socket is None:
                     # break if socket was closed during callback
                     break
             if event & zmq.POLLOUT and self.sending():
-                self._handle_send()
-                count += 1
+                count += self._handle_send()
                 if self.socket is None:
                     # break if socket was closed during callback
                     break
@@ -362,7 +720,7 @@ class ZMQStream(object):
     
     def set_close_callback(self, callback):
         """Call the given callback when the stream is closed."""
-        self._close_callback = stack_context.wrap(callback)
+        self._close_callback = self._wrap(callback)
     
     def close(self):
         """Close this stream."""
@@ -370,27 +728,51 @@ class ZMQStream(object):
             self.io_loop.remove_handler(self.socket)
             self.io_loop.add_timeout(100, self.socket.close)
             self.socket = None
+            if self._pressured and self._send_policy == PAUSE:
+                # don't leave linked inputs paused forever
+                for stream in self._linked_inputs:
+                    stream.resume_recv()
+            self._pressured = False
+            # nothing will resolve the pending futures now
+            while self._recv_futures:
+                future = self._recv_futures.popleft()[0]
+                future.set_exception(IOError("Stream is closed"))
+            while self._send_queue:
+                future = self._send_queue.popleft()[3]
+                if future is not None:
+                    future.set_exception(IOError("Stream is closed"))
+            self._send_queue_bytes = 0
             if self._close_callback:
                 self._run_callback(self._close_callback)
 
     def receiving(self):
         """Returns True if we are currently receiving from the stream."""
-        return self._recv_callback is not None
+        return (self._recv_callback is not None or bool(self._recv_futures)) \
+                and not self._recv_paused
 
     def sending(self):
         """Returns True if we are currently sending to the stream."""
-        return not self._send_queue.empty()
+        return bool(self._send_queue)
 
     def closed(self):
         return self.socket is None
 
+    def _wrap(self, callback):
+        """Wrap a callback in the current StackContext, unless disabled."""
+        if self.use_stack_context:
+            return stack_context.wrap(callback)
+        return callback
+
     def _run_callback(self, callback, *args, **kwargs):
         """Wrap running callbacks in try/except to allow us to
         close our socket."""
         try:
-            # Use a NullContext to ensure that all StackContexts are run
-            # inside our blanket exception handler rather than outside.
-            with stack_context.NullContext():
+            if self.use_stack_context:
+                # Use a NullContext to ensure that all StackContexts are run
+                # inside our blanket exception handler rather than outside.
+                with stack_context.NullContext():
+                    callback(*args, **kwargs)
+            else:
                 callback(*args, **kwargs)
         except:
             logging.error("Uncaught exception, closing connection.",
@@ -434,44 +816,122 @@ class ZMQStream(object):
             raise
             
     def _handle_recv(self):
-        """Handle a recv event."""
+        """Handle a recv event.
+        
+        Returns the number of messages received.
+        """
         if self._flushed:
-            return
+            return 0
+        if self._recv_futures:
+            return self._handle_recv_futures()
+        if self._recv_batch_callback:
+            return self._handle_recv_batch()
+        count = 0
+        while count < self._recv_batch:
+            try:
+                msg = self.socket.recv_multipart(zmq.NOBLOCK, copy=self._recv_copy)
+            except zmq.ZMQError as e:
+                if e.errno == zmq.EAGAIN:
+                    # state changed since poll event,
+                    # or we have drained the socket
+                    pass
+                else:
+                    logging.error("RECV Error: %s"%zmq.strerror(e.errno))
+                break
+            count += 1
+            callback = self._recv_callback
+            if callback:
+                self._run_callback(callback, msg)
+            if self.socket is None or self._recv_callback is not callback \
+                    or self._recv_paused:
+                # closed, paused, or the callback changed, during the callback
+                break
+        return count
+    
+    def _handle_recv_futures(self):
+        """Handle a recv event by resolving pending recv_futures."""
+        futures = self._recv_futures
+        count = 0
+        while futures and count < self._recv_batch:
+            future, copy = futures[0]
+            if future.done():
+                # cancelled
+                futures.popleft()
+                continue
+            try:
+                msg = self.socket.recv_multipart(zmq.NOBLOCK, copy=copy)
+            except zmq.ZMQError as e:
+                if e.errno != zmq.EAGAIN:
+                    logging.error("RECV Error: %s"%zmq.strerror(e.errno))
+                break
+            futures.popleft()
+            count += 1
+            future.set_result(msg)
+            if self.socket is None or self._recv_paused:
+                # closed or paused by a done callback
+                break
+        return count
+    
+    def _handle_recv_batch(self):
+        """Handle a recv event for on_recv_batch."""
         try:
-            msg = self.socket.recv_multipart(zmq.NOBLOCK, copy=self._recv_copy)
+            msgs = self.socket.recv_multipart_many(self._recv_batch, zmq.NOBLOCK,
+                                                   copy=self._recv_copy)
         except zmq.ZMQError as e:
-            if e.errno == zmq.EAGAIN:
-                # state changed since poll event
-                pass
-            else:
-                logging.error("RECV Error: %s"%zmq.strerror(e.errno))
-        else:
-            if self._recv_callback:
-                callback = self._recv_callback
-                # self._recv_callback = None
-                self._run_callback(callback, msg)
-                
-        # self.update_state()
+            logging.error("RECV Error: %s"%zmq.strerror(e.errno))
+            return 0
+        if msgs and self._recv_callback:
+            self._run_callback(self._recv_callback, msgs)
+        return len(msgs)
         
 
     def _handle_send(self):
-        """Handle a send event."""
+        """Handle a send event.
+        
+        Sends queued messages until the queue is empty or the socket
+        would block, then runs the send callback for each message sent.
+        
+        Returns the number of messages sent.
+        """
         if self._flushed:
-            return
+            return 0
         if not self.sending():
             logging.error("Shouldn't have handled a send event")
-            return
+            return 0
         
-        msg, kwargs = self._send_queue.get()
-        try:
-            status = self.socket.send_multipart(msg, **kwargs)
-        except zmq.ZMQError as e:
-            status = e
-        if self._send_callback:
+        queue = self._send_queue
+        send_multipart = self.socket.send_multipart
+        sent = []
+        while queue:
+            msg, kwargs, nbytes, future = queue[0]
+            flags = kwargs['flags'] | zmq.NOBLOCK
+            try:
+                status = send_multipart(msg, flags, kwargs['copy'], kwargs['track'])
+            except zmq.ZMQError as e:
+                if e.errno == zmq.EAGAIN:
+                    # the socket is full, leave the rest for the next event
+                    break
+                status = e
+            queue.popleft()
+            self._send_queue_bytes -= nbytes
+            sent.append((msg, status, future))
+        
+        if self._pressured:
+            self._check_drained()
+        for msg, status, future in sent:
+            if future is not None:
+                # send_future sends don't use the send callback
+                if isinstance(status, zmq.ZMQError):
+                    future.set_exception(status)
+                else:
+                    future.set_result(status)
+                continue
             callback = self._send_callback
-            self._run_callback(callback, msg, status)
-        
-        # self.update_state()
+            # skip the rest of the callbacks if one closed the stream,
+            # but still resolve the futures of messages that were sent
+            if callback and self.socket is not None:
+                self._run_callback(callback, msg, status)
+        return len(sent)
     
     def _check_closed(self):
         if not self.socket:
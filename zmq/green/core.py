@@ -17,6 +17,7 @@ from zmq import *
 # imported with different names as to not have the star import try to to clobber (when building with cython)
 from zmq.core.context import Context as _original_Context
 from zmq.core.socket import Socket as _original_Socket
+from zmq.core import pysocket
 
 from gevent.event import AsyncResult
 from gevent.hub import get_hub
@@ -37,6 +38,14 @@ class _Socket(_original_Socket):
 
         * send
         * recv
+        * send_multipart
+        * recv_multipart
+        * send_many
+        * recv_into
+        * recv_multipart_into
+        * recv_many
+        * recv_multipart_many
+        * recv_records
 
     To ensure that the ``zmq.NOBLOCK`` flag is set and that sending or recieving
     is deferred to the hub if a ``zmq.EAGAIN`` (retry) error is raised.
@@ -126,3 +135,14 @@ class _Socket(_original_Socket):
                 if e.errno != zmq.EAGAIN:
                     raise
             self._wait_read()
+
+    # use the pure-Python multipart methods, so that each frame goes through
+    # the green send/recv above, rather than blocking in the native loop
+    send_multipart = pysocket.send_multipart
+    recv_multipart = pysocket.recv_multipart
+    send_many = pysocket.send_many
+    recv_into = pysocket.recv_into
+    recv_multipart_into = pysocket.recv_multipart_into
+    recv_many = pysocket.recv_many
+    recv_multipart_many = pysocket.recv_multipart_many
+    recv_records = pysocket.recv_records
@@ -0,0 +1,208 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+from __future__ import absolute_import
+
+import time
+
+import zmq
+from zmq.tests import BaseZMQTestCase, SkipTest
+
+try:
+    import asyncio
+    from zmq import asyncio as zaio
+except ImportError:
+    asyncio = None
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class TestAsyncio(BaseZMQTestCase):
+
+    def setUp(self):
+        if asyncio is None:
+            raise SkipTest("requires asyncio")
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        super(TestAsyncio, self).setUp()
+        self.context = zaio.Context()
+
+    def tearDown(self):
+        super(TestAsyncio, self).tearDown()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, future, timeout=5):
+        return self.loop.run_until_complete(asyncio.wait_for(future, timeout))
+
+    def test_socket_class(self):
+        s = self.context.socket(zmq.PUSH)
+        self.sockets.append(s)
+        self.assertTrue(isinstance(s, zaio.Socket))
+
+    def test_recv_multipart(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        f = b.recv_multipart()
+        self.assertFalse(f.done())
+        self.wait(a.send_multipart([b'hi', b'there']))
+        self.assertEquals(self.wait(f), [b'hi', b'there'])
+
+    def test_recv_order(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        futures = [ b.recv() for i in range(5) ]
+        for i in range(5):
+            a.send(str(i).encode())
+        results = [ self.wait(f) for f in futures ]
+        self.assertEquals(results, [ str(i).encode() for i in range(5) ])
+
+    def test_noblock(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        self.assertRaisesErrno(zmq.EAGAIN, b.recv, zmq.NOBLOCK)
+
+    def test_cancel(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        f = b.recv()
+        f.cancel()
+        f2 = b.recv()
+        a.send(b'hi')
+        self.assertEquals(self.wait(f2), b'hi')
+
+    def test_recv_while_send_pending(self):
+        a = self.context.socket(zmq.DEALER)
+        self.sockets.append(a)
+        port = a.bind_to_random_port('tcp://127.0.0.1')
+        # no peer yet, so the send waits
+        f = a.send(b'hi')
+        self.wait(asyncio.sleep(0.05))
+        self.assertFalse(f.done())
+        b = zmq.Context.instance().socket(zmq.DEALER)
+        self.sockets.append(b)
+        b.connect('tcp://127.0.0.1:%i' % port)
+        b.send(b'ping')
+        time.sleep(0.2)
+        # the recv consumes the edge on zmq.FD that says a can send now
+        self.assertEquals(self.wait(a.recv()), b'ping')
+        self.wait(f, 1)
+        self.assertEquals(self.recv(b), b'hi')
+
+    def test_noblock_wakes_queued(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        f = b.recv()
+        self.wait(asyncio.sleep(0.05))
+        a.send(b'1')
+        a.send(b'2')
+        time.sleep(0.2)
+        self.assertEquals(b.recv(zmq.NOBLOCK), b'1')
+        self.assertEquals(self.wait(f, 1), b'2')
+
+    def test_close_cancels(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        f = b.recv()
+        p = b.poll()
+        poller = zaio.Poller()
+        poller.register(b, zmq.POLLIN)
+        pf = poller.poll()
+        b.close()
+        self.wait(asyncio.sleep(0))
+        for future in (f, p, pf):
+            self.assertTrue(future.cancelled())
+
+    def test_batch_methods(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        futures = [b.recv_many(10), b.recv_multipart_many(10)]
+        buf = bytearray(10)
+        futures.append(b.recv_into(buf))
+        # the loop keeps running while they wait
+        self.wait(asyncio.sleep(0.05))
+        for f in futures:
+            self.assertFalse(f.done())
+        self.wait(a.send_many([b'1', [b'2', b'3'], b'hello']))
+        self.assertEquals(self.wait(futures[0]), [b'1'])
+        self.assertEquals(self.wait(futures[1]), [[b'2', b'3']])
+        self.assertEquals(self.wait(futures[2]), 5)
+        self.assertEquals(bytes(buf[:5]), b'hello')
+        self.assertEquals(b.recv_many(10, zmq.NOBLOCK), [])
+
+    def test_recv_records(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SkipTest("requires numpy")
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        records = numpy.zeros(4, dtype='<i4')
+        f = b.recv_records(records)
+        self.wait(asyncio.sleep(0.05))
+        self.assertFalse(f.done())
+        a.send(numpy.array([7], dtype='<i4').tobytes())
+        self.assertEquals(self.wait(f), 1)
+        self.assertEquals(records[0], 7)
+
+    def test_recv_json(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        f = b.recv_json()
+        a.send_json(dict(a=5))
+        self.assertEquals(self.wait(f), dict(a=5))
+
+    def test_poll(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        self.assertEquals(self.wait(b.poll(timeout=10)), 0)
+        f = b.poll()
+        a.send(b'hi')
+        self.assertEquals(self.wait(f), zmq.POLLIN)
+        self.assertEquals(self.wait(b.recv()), b'hi')
+
+    def test_poller(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        # a plain socket can be polled alongside asyncio sockets
+        ctx = zmq.Context.instance()
+        c = ctx.socket(zmq.PULL)
+        self.sockets.append(c)
+        port = c.bind_to_random_port('tcp://127.0.0.1')
+        d = self.context.socket(zmq.PUSH)
+        self.sockets.append(d)
+        d.connect('tcp://127.0.0.1:%i' % port)
+        poller = zaio.Poller()
+        poller.register(b, zmq.POLLIN)
+        poller.register(c, zmq.POLLIN)
+        self.assertEquals(self.wait(poller.poll(10)), [])
+        f = poller.poll()
+        d.send(b'hi')
+        self.assertEquals(self.wait(f), [(c, zmq.POLLIN)])
+        self.assertEquals(c.recv(), b'hi')
+        f = poller.poll()
+        a.send(b'there')
+        self.assertEquals(self.wait(f), [(b, zmq.POLLIN)])
+
+    def test_overlapping_polls(self):
+        ctx = zmq.Context.instance()
+        c = ctx.socket(zmq.PULL)
+        self.sockets.append(c)
+        port = c.bind_to_random_port('tcp://127.0.0.1')
+        d = ctx.socket(zmq.PUSH)
+        self.sockets.append(d)
+        d.connect('tcp://127.0.0.1:%i' % port)
+        pollers = [ zaio.Poller() for i in range(3) ]
+        for poller in pollers:
+            poller.register(c, zmq.POLLIN)
+        f1 = pollers[0].poll(50)
+        f2 = pollers[1].poll()
+        f3 = pollers[2].poll()
+        # the first poll ending doesn't stop the others watching the fd
+        self.assertEquals(self.wait(f1), [])
+        d.send(b'hi')
+        self.assertEquals(self.wait(f2), [(c, zmq.POLLIN)])
+        self.assertEquals(self.wait(f3), [(c, zmq.POLLIN)])
+        self.assertEquals(c.recv(), b'hi')
+        self.wait(asyncio.sleep(0))
+        self.assertEquals(zaio.core._fd_callbacks.get(self.loop), {})
@@ -0,0 +1,224 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import os
+import sys
+import time
+
+import zmq
+from zmq.tests import BaseZMQTestCase, SkipTest, have_gevent, GreenTest
+from zmq.utils import compression
+from zmq.utils.compression import Compressor, ZlibCodec
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class TestCompression(BaseZMQTestCase):
+
+    def compressed_pair(self, codec='zlib', threshold=100):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.compression = Compressor(codec, threshold)
+        b.compression = Compressor(codec, threshold)
+        return a,b
+
+    def test_send_recv(self):
+        a,b = self.compressed_pair()
+        big = b'x' * 10000
+        a.send(big)
+        self.assertEquals(self.recv(b), big)
+        a.send(b'small')
+        frame = b.recv(copy=False)
+        self.assertTrue(isinstance(frame, zmq.Frame))
+        self.assertEquals(frame.bytes, b'small')
+        stats = a.compression.stats()
+        self.assertEquals(stats['sent_frames'], 2)
+        self.assertEquals(stats['compressed_frames'], 1)
+        self.assertEquals(stats['sent_bytes'], 10005)
+        self.assertTrue(stats['wire_sent_bytes'] < 1000)
+        self.assertTrue(stats['send_ratio'] > 10)
+        stats = b.compression.stats(reset=True)
+        self.assertEquals(stats['decompressed_frames'], 1)
+        self.assertEquals(stats['received_bytes'], 10005)
+        self.assertEquals(b.compression.stats()['received_frames'], 0)
+
+    def test_multipart(self):
+        a,b = self.compressed_pair()
+        msg = [b'header', b'y' * 1000, b'z' * 1000]
+        a.send_multipart(msg)
+        self.assertEquals(self.recv_multipart(b), msg)
+        a.send_multipart(msg)
+        frames = b.recv_multipart(copy=False)
+        self.assertEquals([ f.bytes for f in frames ], msg)
+        self.assertEquals([ f.more for f in frames ], [True, True, False])
+        a.send_many([msg, b'single'])
+        self.assertEquals(b.recv_multipart_many(2), [msg, [b'single']])
+
+    def test_recv_into(self):
+        a,b = self.compressed_pair()
+        a.send(b'w' * 1000)
+        buf = bytearray(2000)
+        self.assertEquals(b.recv_into(buf), 1000)
+        self.assertEquals(bytes(buf[:1000]), b'w' * 1000)
+
+    def test_router_dealer(self):
+        router,dealer = self.create_bound_pair(zmq.ROUTER, zmq.DEALER)
+        router.compression = Compressor('zlib', 100)
+        dealer.compression = Compressor('zlib', 100)
+        big = b'a' * 1000
+        dealer.send_multipart([b'', big])
+        msg = self.recv_multipart(router)
+        self.assertEquals(msg[1:], [b'', big])
+        ident = msg[0]
+        # the identity may also be sent as a frame of its own
+        router.send(ident, zmq.SNDMORE)
+        router.send_multipart([b'', big + b'b'])
+        self.assertEquals(self.recv_multipart(dealer), [b'', big + b'b'])
+        router.send_multipart([ident, b'', big])
+        self.assertEquals(dealer.recv(), b'')
+        self.assertEquals(self.recv(dealer), big)
+        self.assertEquals(router.compression.stats()['compressed_frames'], 2)
+
+    def test_two_hops(self):
+        # client -> frontend ROUTER -> backend DEALER -> server ROUTER
+        frontend = self.context.socket(zmq.ROUTER)
+        port = frontend.bind_to_random_port('tcp://127.0.0.1')
+        client = self.context.socket(zmq.DEALER)
+        named = self.context.socket(zmq.DEALER)
+        named.setsockopt(zmq.IDENTITY, b'named')
+        for s in (frontend, client, named):
+            s.setsockopt(zmq.LINGER, 0)
+            self.sockets.append(s)
+        client.connect('tcp://127.0.0.1:%i' % port)
+        named.connect('tcp://127.0.0.1:%i' % port)
+        server,backend = self.create_bound_pair(zmq.ROUTER, zmq.DEALER)
+        for s in (frontend, client, server, backend, named):
+            s.compression = Compressor('zlib', 100)
+        big = b'h' * 1000
+        for sender in (client, named):
+            sender.send_multipart([b'', big])
+            request = self.recv_multipart(frontend)
+            self.assertEquals(request[1:], [b'', big])
+            backend.send_multipart(request)
+            msg = self.recv_multipart(server)
+            # both identities arrive intact, including auto-identities
+            # starting with \0, so the reply can be routed back
+            self.assertEquals(msg[1:], request)
+            server.send_multipart(msg[:-1] + [big + b'r'])
+            # pass the reply through frame by frame
+            reply = [self.recv(backend)]
+            while backend.getsockopt(zmq.RCVMORE):
+                reply.append(backend.recv())
+            self.assertEquals(reply, request[:-1] + [big + b'r'])
+            for frame in reply[:-1]:
+                frontend.send(frame, zmq.SNDMORE)
+            frontend.send(reply[-1])
+            self.assertEquals(self.recv_multipart(sender), [b'', big + b'r'])
+        # only the bodies were compressed, once per hop
+        self.assertEquals(backend.compression.stats()['compressed_frames'], 2)
+        self.assertEquals(server.compression.stats()['compressed_frames'], 2)
+
+    def test_req_rep(self):
+        req,rep = self.create_bound_pair(zmq.REQ, zmq.REP)
+        req.compression = 'zlib'
+        rep.compression = 'zlib'
+        big = b'q' * 10000
+        req.send(big)
+        self.assertEquals(self.recv(rep), big)
+        rep.send_multipart([b'', big])
+        self.assertEquals(self.recv_multipart(req), [b'', big])
+
+    def test_pub_sub(self):
+        pub,sub = self.create_bound_pair(zmq.PUB, zmq.SUB)
+        pub.compression = Compressor('zlib', 1)
+        sub.compression = Compressor('zlib', 1)
+        sub.setsockopt(zmq.SUBSCRIBE, b'top')
+        time.sleep(0.1)
+        big = b'p' * 1000
+        # the topic is sent as it is, so the subscription matches it
+        pub.send_multipart([b'other', big])
+        pub.send_multipart([b'topic', big])
+        self.assertEquals(self.recv_multipart(sub), [b'topic', big])
+        self.assertEquals(pub.compression.stats()['compressed_frames'], 2)
+
+    def test_unsupported(self):
+        if zmq.zmq_version_info() < (3,):
+            raise SkipTest("XPUB and XSUB require libzmq >= 3")
+        for socket_type in (zmq.XPUB, zmq.XSUB):
+            s = self.context.socket(socket_type)
+            self.sockets.append(s)
+            try:
+                s.compression = 'zlib'
+            except zmq.ZMQError as e:
+                self.assertEquals(e.errno, zmq.ENOTSUP)
+            else:
+                self.fail("compression should be refused on %i" % socket_type)
+            self.assertEquals(s.compression, None)
+
+    def test_max_size(self):
+        a,b = self.compressed_pair()
+        b.compression.max_size = 1000
+        a.send(b'm' * 1000)
+        self.assertEquals(self.recv(b), b'm' * 1000)
+        # a small frame may not decompress to a huge one
+        a.send(b'm' * 100000)
+        self.assertTrue(a.compression.stats()['wire_sent_bytes'] < 1000)
+        self.assertRaises(ValueError, self.recv, b)
+        a.send(b'')
+        self.assertEquals(self.recv(b), b'')
+
+    def test_incompressible(self):
+        a,b = self.compressed_pair()
+        noise = os.urandom(1000)
+        a.send(noise)
+        self.assertEquals(self.recv(b), noise)
+        stats = a.compression.stats()
+        self.assertEquals(stats['compressed_frames'], 0)
+        self.assertEquals(stats['incompressible_frames'], 1)
+
+    def test_codec_name(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.compression = 'zlib'
+        b.compression = Compressor('zlib', threshold=10**6)
+        self.assertTrue(isinstance(a.compression, Compressor))
+        # the threshold only applies to sending
+        a.send(b'v' * 2000)
+        self.assertEquals(self.recv(b), b'v' * 2000)
+        self.assertRaises(ValueError, Compressor, 'no-such-codec')
+
+    def test_zdict(self):
+        if sys.version_info < (3, 3):
+            raise SkipTest("zlib preset dictionaries require Python >= 3.3")
+        zdict = b'{"symbol": "", "price": , "quantity": }'
+        codec = ZlibCodec(zdict=zdict)
+        a,b = self.compressed_pair(codec, threshold=10)
+        msg = b'{"symbol": "ABC", "price": 1.25, "quantity": 100}'
+        a.send(msg)
+        self.assertEquals(self.recv(b), msg)
+        with_dict = a.compression.stats()['wire_sent_bytes']
+        plain = Compressor('zlib', threshold=10)
+        plain.compress(msg)
+        self.assertTrue(with_dict < plain.stats()['wire_sent_bytes'])
+
+    def test_lzma(self):
+        if compression.lzma is None:
+            raise SkipTest("requires lzma")
+        a,b = self.compressed_pair('lzma')
+        a.send(b'u' * 10000)
+        self.assertEquals(self.recv(b), b'u' * 10000)
+        self.assertEquals(a.compression.stats()['compressed_frames'], 1)
+
+
+if have_gevent:
+    class TestCompressionGreen(GreenTest, TestCompression):
+        pass
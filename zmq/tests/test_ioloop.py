@@ -11,6 +11,7 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import datetime
 import time
 import os
 import threading
@@ -73,6 +74,174 @@ class TestIOLoop(BaseZMQTestCase):
         self.assertEquals(t < t2, id(t) < id(t2))
         t2 = ioloop._Timeout(2,1)
         self.assertTrue(t < t2)
+        # relative deadlines are converted by IOLoop.add_timeout
+        self.assertRaises(TypeError, ioloop._Timeout, datetime.timedelta(seconds=1), 1)
+
+    def _test_timers(self, timers):
+        loop = ioloop.IOLoop(timers=timers)
+        fired = []
+        now = time.time()
+        for i in range(5):
+            loop.add_timeout(now + 0.01 * (5 - i), lambda i=i: fired.append(i))
+        cancelled = [ loop.add_timeout(now + 0.02, lambda : fired.append(None))
+                      for i in range(1000) ]
+        for t in cancelled:
+            loop.remove_timeout(t)
+        stats = loop.timer_stats()
+        self.assertEquals(stats['live'], 5)
+        self.assertTrue(stats['cancelled'] < 1000)
+        loop.add_timeout(now + 0.2, loop.stop)
+        loop.start()
+        self.assertEquals(fired, [4, 3, 2, 1, 0])
+        self.assertEquals(loop.timer_stats()['live'], 0)
+        loop.close()
+
+    def test_heap_timers(self):
+        """timeouts and cancellation with the default heap"""
+        self._test_timers(None)
+
+    def test_timer_wheel(self):
+        """timeouts and cancellation with a timer wheel"""
+        self._test_timers(ioloop.TimerWheel())
+
+    def test_timer_wheel_levels(self):
+        """timeouts move down the levels of a timer wheel"""
+        wheel = ioloop.TimerWheel(resolution=0.001, levels=2, time_func=time.time)
+        now = time.time()
+        deadlines = [ now + d for d in (0.1, 1, 100, 1000) ]
+        for d in deadlines:
+            wheel.add(ioloop._Timeout(d, lambda : None))
+        self.assertEquals(len(wheel), 4)
+        self.assertTrue(wheel.next_deadline() <= deadlines[0] + 0.001)
+        self.assertEquals(wheel.pop_due(now), [])
+        fired = []
+        for d in deadlines:
+            fired.extend(t.deadline for t in wheel.pop_due(d + 0.001))
+        self.assertEquals(fired, deadlines)
+        self.assertEquals(len(wheel), 0)
+        self.assertEquals(wheel.next_deadline(), None)
+
+    def test_timer_wheel_clock(self):
+        """a timer wheel ticks with the loop's clock"""
+        clock = [1.0]
+        class FakeClockLoop(ioloop.IOLoop):
+            def time(self):
+                return clock[0]
+        wheel = ioloop.TimerWheel()
+        loop = FakeClockLoop(timers=wheel)
+        timeout = loop.call_later(0.05, lambda : None)
+        self.assertEquals(wheel.pop_due(loop.time()), [])
+        clock[0] += 0.1
+        self.assertEquals(wheel.pop_due(loop.time()), [timeout])
+        loop.close()
+
+    def _count_ticks(self, policy):
+        loop = ioloop.IOLoop()
+        calls = []
+        def tick():
+            if not calls:
+                # block the loop, so ticks are missed
+                time.sleep(0.1)
+            calls.append(loop.time())
+        pc = ioloop.PeriodicCallback(tick, 10, loop, policy=policy)
+        pc.start()
+        loop.call_later(0.2, loop.stop)
+        loop.start()
+        pc.stop()
+        loop.close()
+        return len(calls)
+
+    def test_periodic_policy(self):
+        """PeriodicCallback skips or catches up on missed ticks"""
+        skipped = self._count_ticks(ioloop.PeriodicCallback.SKIP)
+        caught_up = self._count_ticks(ioloop.PeriodicCallback.CATCH_UP)
+        self.assertTrue(caught_up > skipped + 5, (caught_up, skipped))
+        self.assertRaises(ValueError, ioloop.PeriodicCallback, lambda : None, 10,
+                          policy='bad')
+
+    def test_call_later(self):
+        """call_later uses the loop's clock, with sub-millisecond delays"""
+        loop = ioloop.IOLoop()
+        fired = []
+        start = loop.time()
+        loop.call_later(0.0005, lambda : fired.append(loop.time()))
+        loop.call_later(0.05, loop.stop)
+        loop.start()
+        loop.close()
+        self.assertEquals(len(fired), 1)
+        self.assertTrue(fired[0] - start >= 0.0005)
+
+    def test_callbacks_from_thread(self):
+        """callbacks added from other threads wake the loop"""
+        loop = ioloop.IOLoop()
+        results = []
+        def post():
+            time.sleep(0.05)
+            for i in range(100):
+                loop.add_callback(lambda i=i: results.append(i))
+            loop.add_callbacks_batch([ lambda i=i: results.append(i)
+                                       for i in range(100, 1000) ])
+            loop.add_callback(loop.stop)
+        t = threading.Thread(target=post)
+        tic = time.time()
+        t.start()
+        # nothing else would wake the loop for an hour
+        loop.start()
+        toc = time.time()
+        t.join()
+        loop.close()
+        self.assertEquals(results, list(range(1000)))
+        self.assertTrue(toc - tic < 5)
+
+    def test_loop_stats(self):
+        """IOLoop instrumentation counts callbacks, handlers and lag"""
+        loop = ioloop.IOLoop()
+        self.assertEquals(loop.loop_stats(), None)
+        loop.enable_stats()
+        slow = []
+        loop.set_slow_callback_threshold(0.05, lambda cb, t: slow.append(t))
+        def quick():
+            pass
+        def sluggish():
+            time.sleep(0.1)
+        for i in range(10):
+            loop.add_callback(quick)
+        loop.add_callback(sluggish)
+        loop.call_later(0.01, loop.stop)
+        loop.start()
+        stats = loop.loop_stats(reset=True)
+        loop.close()
+        self.assertTrue(stats['iterations'] >= 1)
+        names = dict((name.split()[0], entry)
+                     for name, entry in stats['callbacks'].items())
+        self.assertEquals(names['quick']['count'], 10)
+        self.assertEquals(names['sluggish']['count'], 1)
+        self.assertTrue(names['sluggish']['max'] >= 0.1)
+        self.assertTrue(stats['work_time'] >= 0.1)
+        self.assertEquals(stats['slow'], 1)
+        self.assertEquals(len(slow), 1)
+        # the stop timeout ran late, behind sluggish
+        self.assertEquals(sum(count for bound, count in stats['lag']), 1)
+        self.assertTrue(stats['max_lag'] > 0.05)
+        self.assertEquals(loop.loop_stats()['iterations'], 0)
+        loop.disable_stats()
+        self.assertEquals(loop.loop_stats(), None)
+
+    def test_no_stack_context(self):
+        """callbacks aren't wrapped without use_stack_context"""
+        loop = ioloop.IOLoop(use_stack_context=False)
+        results = []
+        def fail():
+            raise ValueError("oops")
+        loop.add_callback(fail)
+        loop.add_callback(lambda : results.append(1))
+        loop.call_later(0, loop.stop)
+        for callback in loop._callbacks:
+            self.assertFalse(isinstance(callback, ioloop.stack_context._StackContextWrapper))
+        # the exception is logged, and the loop goes on
+        loop.start()
+        loop.close()
+        self.assertEquals(results, [1])
 
     def test_poller_events(self):
         """Tornado poller implementation maps events correctly"""
@@ -189,6 +189,43 @@ class TestFrame(BaseZMQTestCase):
         del m2
         self.assertTrue(mt.wait() is None)
         self.assertTrue(mt.done)
+    
+    def test_shared_tracker(self):
+        mt = zmq.MessageTracker()
+        self.assertTrue(mt.done)
+        frames = [ zmq.Frame(b'asdf', track=mt) for i in range(10) ]
+        for f in frames:
+            self.assertTrue(f.tracker is mt)
+        self.assertEquals(mt.pending, 10)
+        self.assertFalse(mt.done)
+        del f
+        frames.pop()
+        self.assertEquals(mt.pending, 9)
+        del frames
+        self.assertTrue(mt.done)
+        self.assertTrue(mt.wait(0) is None)
+    
+    def test_tracker_callback(self):
+        m = zmq.Frame(b'asdf', track=True)
+        called = []
+        m.tracker.add_done_callback(called.append)
+        self.assertEquals(called, [])
+        tracker = m.tracker
+        del m
+        self.assertEquals(called, [tracker])
+        # already done, called immediately
+        tracker.add_done_callback(called.append)
+        self.assertEquals(called, [tracker, tracker])
+    
+    def test_wait_all(self):
+        m = zmq.Frame(b'asdf', track=True)
+        m2 = zmq.Frame(b'whoda', track=True)
+        trackers = [m.tracker, m2.tracker]
+        self.assertRaises(zmq.NotDone, zmq.MessageTracker.wait_all, trackers, 0.1)
+        del m
+        self.assertRaises(zmq.NotDone, zmq.MessageTracker.wait_all, trackers, 0.1)
+        del m2
+        self.assertTrue(zmq.MessageTracker.wait_all(trackers) is None)
         
     
     def test_buffer_in(self):
@@ -334,6 +371,37 @@ class TestFrame(BaseZMQTestCase):
             self.assertEquals(A.shape, B.shape)
             self.assertTrue((A==B).all())
     
+    def test_deferred_release(self):
+        """untracked buffers are released in batches with deferred release"""
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.copy_threshold = 0
+        zmq.set_deferred_release(True)
+        try:
+            self.assertTrue(zmq.deferred_release_stats()['enabled'])
+            zmq.release_deferred()
+            released = zmq.deferred_release_stats()['released']
+            s = 1024*x
+            rc = grc(s)
+            for i in range(10):
+                a.send(s, copy=False)
+            for i in range(10):
+                self.assertEquals(b.recv(), s)
+            time.sleep(0.1)
+            # sends may release some of the earlier buffers, the rest
+            # are held until asked
+            zmq.release_deferred()
+            self.assertEquals(grc(s), rc)
+            stats = zmq.deferred_release_stats()
+            self.assertEquals(stats['pending'], 0)
+            self.assertEquals(stats['released'], released + 10)
+            # tracked messages are still released right away
+            tracker = a.send(s, copy=False, track=True)
+            self.recv(b)
+            tracker.wait(1)
+            self.assertEquals(zmq.deferred_release_stats()['pending'], 0)
+        finally:
+            zmq.set_deferred_release(False)
+
     def test_frame_more(self):
         """test Frame.more attribute"""
         frame = zmq.Frame(b"hello")
@@ -42,6 +42,31 @@ class TestMultipart(BaseZMQTestCase):
         recvd = b.recv_multipart()
         self.assertEquals(msg, recvd)
 
+    def test_many_parts(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        msg = [ ('part%i'%i).encode() for i in range(100) ]
+        a.send_multipart(msg)
+        recvd = self.recv_multipart(b)
+        self.assertEquals(msg, recvd)
+
+    def test_nocopy_multipart(self):
+        router, dealer = self.create_bound_pair(zmq.ROUTER, zmq.DEALER)
+        msg = [ b'hi', b'there', b'b']
+        tracker = dealer.send_multipart(msg, copy=False, track=True)
+        self.assertTrue(isinstance(tracker, zmq.MessageTracker))
+        recvd = self.recv_multipart(router, copy=False)
+        self.assertEquals(len(recvd), 4)
+        for frame in recvd:
+            self.assertTrue(isinstance(frame, zmq.Frame))
+        self.assertEquals([ f.more for f in recvd ], [True, True, True, False])
+        self.assertEquals([ f.bytes for f in recvd[1:] ], msg)
+
+    def test_multipart_errors(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        self.assertRaises(TypeError, a.send_multipart, [b'hi', u'there'])
+        self.assertRaises(ValueError, a.send_multipart, [])
+        self.assertRaisesErrno(zmq.EAGAIN, b.recv_multipart, zmq.NOBLOCK)
+
 if have_gevent:
     class TestMultipartGreen(GreenTest, TestMultipart):
         pass
@@ -11,12 +11,14 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import os
+import select
 import time
 from unittest import TestCase
 
 import zmq
 
-from zmq.tests import PollZMQTestCase
+from zmq.tests import PollZMQTestCase, SkipTest
 
 #-----------------------------------------------------------------------------
 # Tests
@@ -124,6 +126,35 @@ class TestPoll(PollZMQTestCase):
         poller.register(s1, 0)
         self.assertFalse(s1 in poller.sockets)
 
+    def test_unregister_reorders(self):
+        pairs = [ self.create_bound_pair(zmq.PAIR, zmq.PAIR) for i in range(4) ]
+        senders = [ a for a,b in pairs ]
+        wait()
+        poller = zmq.Poller()
+        for s in senders:
+            poller.register(s, zmq.POLLOUT)
+        # unregistering from the middle moves the last socket into the gap
+        poller.unregister(senders[1])
+        poller.modify(senders[3], zmq.POLLIN)
+        socks = dict(poller.poll(100))
+        self.assertEquals(set(socks), set([senders[0], senders[2]]))
+        poller.register(senders[1], zmq.POLLOUT)
+        socks = dict(poller.poll(100))
+        self.assertEquals(set(socks), set([senders[0], senders[1], senders[2]]))
+        self.assertEquals(len(poller.sockets), 4)
+
+    def test_closed_socket(self):
+        s1, s2 = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        poller = zmq.Poller()
+        poller.register(s1, zmq.POLLIN)
+        s1.close()
+        self.assertRaisesErrno(zmq.ENOTSOCK, poller.poll, 0)
+        # until the closed socket is unregistered
+        self.assertRaisesErrno(zmq.ENOTSOCK, poller.poll, 0)
+        poller.unregister(s1)
+        poller.register(s2, zmq.POLLOUT)
+        self.assertEquals(poller.poll(0), [(s2, zmq.POLLOUT)])
+
     def test_pubsub(self):
         s1, s2 = self.create_bound_pair(zmq.PUB, zmq.SUB)
         s2.setsockopt(zmq.SUBSCRIBE, b'')
@@ -179,6 +210,81 @@ class TestPoll(PollZMQTestCase):
         self.assertTrue(toc-tic < 1)
         self.assertTrue(toc-tic > 0.1)
 
+class TestEpollPoller(PollZMQTestCase):
+
+    def setUp(self):
+        if not hasattr(select, 'epoll'):
+            raise SkipTest("requires epoll")
+        super(TestEpollPoller, self).setUp()
+
+    def test_pair(self):
+        s1, s2 = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        wait()
+        poller = zmq.EpollPoller()
+        poller.register(s1, zmq.POLLIN|zmq.POLLOUT)
+        poller.register(s2, zmq.POLLIN)
+        socks = dict(poller.poll(100))
+        self.assertEquals(socks, {s1: zmq.POLLOUT})
+        s1.send(b'msg1')
+        socks = dict(poller.poll(1000))
+        self.assertEquals(socks[s2], zmq.POLLIN)
+        # still readable until received
+        socks = dict(poller.poll(0))
+        self.assertEquals(socks[s2], zmq.POLLIN)
+        s2.recv()
+        socks = dict(poller.poll(100))
+        self.assertFalse(s2 in socks)
+        poller.unregister(s1)
+        poller.unregister(s2)
+        self.assertEquals(poller.poll(0), [])
+        poller.close()
+
+    def test_other_socket_used(self):
+        """a socket used while handling another is checked again"""
+        a1, b1 = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a2, b2 = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        wait()
+        poller = zmq.EpollPoller()
+        poller.register(b1, zmq.POLLIN)
+        poller.register(b2, zmq.POLLIN)
+        a1.send(b'msg')
+        self.assertEquals(poller.poll(1000), [(b1, zmq.POLLIN)])
+        a2.send(b'msg1')
+        a2.send(b'msg2')
+        wait()
+        # the handler for b1 also receives from b2, which wasn't reported,
+        # consuming the signal on b2's zmq.FD
+        b1.recv()
+        self.assertEquals(b2.recv(), b'msg1')
+        self.assertEquals(poller.poll(100), [(b2, zmq.POLLIN)])
+        poller.unregister(b2)
+        self.assertEquals(b2._recheck_sets, [])
+        poller.close()
+
+    def test_native_fd(self):
+        r, w = os.pipe()
+        poller = zmq.EpollPoller()
+        try:
+            poller.register(r, zmq.POLLIN)
+            self.assertEquals(poller.poll(0), [])
+            os.write(w, b'x')
+            self.assertEquals(poller.poll(1000), [(r, zmq.POLLIN)])
+        finally:
+            poller.close()
+            os.close(r)
+            os.close(w)
+
+    def test_timeout(self):
+        s1, s2 = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        poller = zmq.EpollPoller()
+        poller.register(s1, zmq.POLLIN)
+        tic = time.time()
+        poller.poll(100)
+        toc = time.time()
+        self.assertTrue(toc-tic < 1)
+        self.assertTrue(toc-tic > 0.05)
+        poller.close()
+
 class TestSelect(PollZMQTestCase):
 
     def test_pair(self):
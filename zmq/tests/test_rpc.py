@@ -0,0 +1,112 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import zmq
+from zmq.tests import BaseZMQTestCase
+from zmq.eventloop import ioloop, zmqstream
+from zmq.eventloop.rpc import RPCClient, RPCTimeout
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class TestRPCClient(BaseZMQTestCase):
+
+    def setUp(self):
+        BaseZMQTestCase.setUp(self)
+        self.loop = ioloop.IOLoop()
+        self.server = self.context.socket(zmq.ROUTER)
+        self.sockets.append(self.server)
+        port = self.server.bind_to_random_port('tcp://127.0.0.1')
+        self.client = RPCClient(self.context, self.loop, timeout=100)
+        self.sockets.append(self.client.socket)
+        self.client.connect('tcp://127.0.0.1:%i' % port)
+        self.server_stream = zmqstream.ZMQStream(self.server, self.loop)
+
+    def tearDown(self):
+        self.client.close()
+        self.server_stream.close()
+        self.loop.close()
+        BaseZMQTestCase.tearDown(self)
+
+    def serve(self, handler):
+        """Reply to each request with handler(frames), or not if None."""
+        def on_request(msg):
+            reply = handler(msg[2:])
+            if reply is not None:
+                self.server_stream.send_multipart(msg[:2] + reply)
+        self.server_stream.on_recv(on_request)
+
+    def run_until_done(self, futures, timeout=5):
+        remaining = [len(futures)]
+        def done(f):
+            remaining[0] -= 1
+            if not remaining[0]:
+                self.loop.stop()
+        for f in futures:
+            f.add_done_callback(done)
+        self.loop.call_later(timeout, self.loop.stop)
+        if remaining[0]:
+            self.loop.start()
+
+    def test_pipelined(self):
+        self.serve(lambda frames: [b're'] + frames)
+        futures = [ self.client.request([('%i' % i).encode(), b'x'])
+                    for i in range(1000) ]
+        self.assertEquals(len(self.client), 1000)
+        self.run_until_done(futures)
+        for i, f in enumerate(futures):
+            self.assertEquals(f.result(), [b're', ('%i' % i).encode(), b'x'])
+        stats = self.client.stats()
+        self.assertEquals(stats['sent'], 1000)
+        self.assertEquals(stats['replies'], 1000)
+        self.assertEquals(stats['in_flight'], 0)
+        self.assertEquals(sum(count for bound, count in stats['latency']['buckets']), 1000)
+        self.assertTrue(stats['latency']['min'] <= stats['latency']['mean'] <= stats['latency']['max'])
+
+    def test_retry(self):
+        seen = set()
+        def flaky(frames):
+            # ignore the first attempt of each request
+            if frames[0] not in seen:
+                seen.add(frames[0])
+                return None
+            return frames
+        self.serve(flaky)
+        futures = [ self.client.request(('%i' % i).encode(), timeout=20, retries=2)
+                    for i in range(10) ]
+        self.run_until_done(futures)
+        self.assertEquals([ f.result() for f in futures ],
+                          [ [('%i' % i).encode()] for i in range(10) ])
+        stats = self.client.stats()
+        self.assertEquals(stats['retries'], 10)
+        self.assertEquals(stats['timeouts'], 0)
+
+    def test_timeout(self):
+        self.serve(lambda frames: None)
+        f = self.client.request(b'hi', timeout=20, retries=1)
+        self.run_until_done([f])
+        self.assertTrue(isinstance(f.exception(), RPCTimeout))
+        stats = self.client.stats(reset=True)
+        self.assertEquals(stats['retries'], 1)
+        self.assertEquals(stats['timeouts'], 1)
+        self.assertEquals(len(self.client), 0)
+        self.assertEquals(self.client.stats()['timeouts'], 0)
+
+    def test_max_in_flight(self):
+        self.client.max_in_flight = 2
+        self.client.request(b'a')
+        self.client.request(b'b')
+        f = self.client.request(b'c')
+        self.assertEquals(f.exception().errno, zmq.EAGAIN)
+        self.assertEquals(len(self.client), 2)
@@ -0,0 +1,148 @@
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import zmq
+from zmq.tests import BaseZMQTestCase, SkipTest, have_gevent, GreenTest
+from zmq.utils import serializers
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class HeaderSerializer(serializers.Serializer):
+    """A two-frame serializer, for testing."""
+    copy = False
+
+    def serialize(self, obj):
+        header, body = obj
+        return [header, body]
+
+    def deserialize(self, frames):
+        self.last_frames = frames
+        return tuple(f.bytes for f in frames)
+
+
+class TestSerializers(BaseZMQTestCase):
+
+    def test_builtin(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        obj = dict(a=[1, 2.5, 'three'], b=None)
+        for name in ('pickle', 'json', 'marshal'):
+            a.send_serialized(obj, serializer=name)
+            self.assertEquals(b.recv_serialized(serializer=name), obj)
+
+    def test_default(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        self.assertEquals(a.serializer, None)
+        a.send_serialized([1,2])
+        self.assertEquals(b.recv_pyobj(), [1,2])
+        a.serializer = b.serializer = 'json'
+        a.send_serialized([1,2])
+        self.assertEquals(b.recv_json(), [1,2])
+        a.send_serialized([3,4])
+        self.assertEquals(b.recv_serialized(), [3,4])
+
+    def test_struct(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        point = serializers.StructSerializer('!Idd')
+        a.send_serialized((5, 1.5, -2.0), serializer=point)
+        self.assertEquals(b.recv_serialized(serializer=point), (5, 1.5, -2.0))
+
+    def test_registry(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        header = HeaderSerializer()
+        serializers.register_serializer('test-header', header)
+        self.assertTrue(serializers.get_serializer('test-header') is header)
+        a.send_serialized((b'head', b'body'), serializer='test-header')
+        self.assertEquals(b.recv_serialized(serializer='test-header'), (b'head', b'body'))
+        # copy=False serializers get Frames
+        for frame in header.last_frames:
+            self.assertTrue(isinstance(frame, zmq.Frame))
+        self.assertRaises(ValueError, serializers.get_serializer, 'no-such-thing')
+        self.assertRaises(TypeError, serializers.register_serializer, 'bad', object())
+
+
+class TestArrays(BaseZMQTestCase):
+
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SkipTest("requires numpy")
+        self.numpy = numpy
+        BaseZMQTestCase.setUp(self)
+
+    def roundtrip(self, A, **kwargs):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.send_array(A)
+        B = b.recv_array(**kwargs)
+        self.assertEquals(B.dtype, A.dtype)
+        self.assertEquals(B.shape, A.shape)
+        self.assertTrue((B == A).all())
+        return B
+
+    def test_contiguous(self):
+        numpy = self.numpy
+        A = numpy.arange(24, dtype='>i4').reshape(2, 3, 4)
+        B = self.roundtrip(A)
+        # a view on the received Frame
+        self.assertFalse(B.flags.writeable)
+        self.assertEquals(len(serializers.serialize_array(A)), 2)
+        F = self.roundtrip(numpy.asfortranarray(A))
+        self.assertTrue(F.flags.f_contiguous)
+        self.roundtrip(numpy.array(1.5))
+        self.roundtrip(numpy.zeros((0, 3)))
+
+    def test_noncontiguous(self):
+        numpy = self.numpy
+        A = numpy.arange(8 * 10 * 1024, dtype='f8').reshape(8, 10, 1024)
+        # blocks of rows are sent as separate frames
+        sliced = A[::2, ::3]
+        frames = serializers.serialize_array(sliced)
+        self.assertEquals(len(frames), 1 + 4 * 4)
+        self.roundtrip(sliced)
+        # and in Fortran order, for slices of Fortran arrays
+        F = numpy.asfortranarray(A.reshape(1024, 10, 8))[:, :, ::4]
+        self.assertEquals(len(serializers.serialize_array(F)), 1 + 2)
+        self.assertTrue(self.roundtrip(F).flags.f_contiguous)
+        # small blocks are copied together
+        self.assertEquals(len(serializers.serialize_array(A[:, :, ::2])), 2)
+        self.roundtrip(A[:, :, ::2])
+
+    def test_out(self):
+        numpy = self.numpy
+        A = numpy.arange(8 * 1024, dtype='i8').reshape(8, 1024)
+        for src in (A, A[::2]):
+            out = numpy.zeros(src.shape, src.dtype)
+            self.assertTrue(self.roundtrip(src, out=out) is out)
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.send_array(A)
+        self.assertRaises(ValueError, b.recv_array, out=numpy.zeros(A.shape, 'f4'))
+
+    def test_structured(self):
+        numpy = self.numpy
+        dt = numpy.dtype([('id', '<u4'), ('price', '<f8'), ('sym', 'S4')])
+        A = numpy.zeros(10, dtype=dt)
+        A['id'] = numpy.arange(10)
+        A['sym'] = b'ABCD'
+        self.roundtrip(A)
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.send_serialized(A, serializer='array')
+        self.assertTrue((b.recv_serialized(serializer='array') == A).all())
+        self.assertRaises(TypeError, serializers.serialize_array,
+                          numpy.array([object()]))
+
+
+if have_gevent:
+    class TestSerializersGreen(GreenTest, TestSerializers):
+        pass
@@ -12,12 +12,14 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import struct
 import sys
 import time
 import errno
 
 import zmq
 from zmq.tests import BaseZMQTestCase, SkipTest, have_gevent, GreenTest
+from zmq.utils import serializers
 from zmq.utils.strtypes import bytes, unicode
 
 try:
@@ -283,6 +285,170 @@ class TestSocket(BaseZMQTestCase):
         for i in range(3):
             self.assertEquals(b.recv_multipart(), [msg])
     
+    def test_copy_threshold(self):
+        ctx = self.Context()
+        self.assertEquals(ctx.copy_threshold, 0)
+        ctx.copy_threshold = 1024
+        a = ctx.socket(zmq.PAIR)
+        self.assertEquals(a.copy_threshold, 1024)
+        a.copy_threshold = 0
+        self.assertEquals(a.copy_threshold, 0)
+        a.close()
+        ctx.term()
+
+    def test_send_copy_threshold(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.copy_threshold = 100
+        small = b'x' * 10
+        large = b'y' * 1000
+        # small untracked messages are copied, tracked ones are not
+        self.assertEquals(a.send(small, copy=False), None)
+        tracker = a.send(small, copy=False, track=True)
+        self.assertTrue(isinstance(tracker, zmq.MessageTracker))
+        # large bytes are not copied
+        self.assertEquals(a.send(large), None)
+        a.send_multipart([small, large], copy=False)
+        a.send_multipart([small, large])
+        self.assertEquals(self.recv(b), small)
+        self.assertEquals(self.recv(b), small)
+        self.assertEquals(self.recv(b), large)
+        self.assertEquals(self.recv_multipart(b), [small, large])
+        self.assertEquals(self.recv_multipart(b), [small, large])
+
+    def test_recv_into(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        buf = bytearray(8)
+        a.send(b'hello')
+        time.sleep(0.1)
+        nbytes = b.recv_into(buf)
+        self.assertEquals(nbytes, 5)
+        self.assertEquals(buf[:5], bytearray(b'hello'))
+        # truncated
+        a.send(b'0123456789')
+        time.sleep(0.1)
+        nbytes = b.recv_into(buf)
+        self.assertEquals(nbytes, 10)
+        self.assertEquals(buf, bytearray(b'01234567'))
+        self.assertRaises(Exception, b.recv_into, b'readonly')
+
+    def test_recv_multipart_into(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        buf = bytearray(16)
+        a.send_multipart([b'one', b'two', b'three'])
+        time.sleep(0.1)
+        sizes = b.recv_multipart_into(buf)
+        self.assertEquals(sizes, [3, 3, 5])
+        self.assertEquals(buf[:sum(sizes)], bytearray(b'onetwothree'))
+
+    def test_recv_many(self):
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        msgs = [ ('msg%i'%i).encode() for i in range(10) ]
+        for msg in msgs:
+            a.send(msg)
+        # wait for the first message to arrive
+        recvd = b.recv_many(4)
+        time.sleep(0.1)
+        recvd.extend(b.recv_many(100, zmq.NOBLOCK))
+        self.assertEquals(recvd, msgs)
+        self.assertEquals(b.recv_many(100, zmq.NOBLOCK), [])
+
+    def test_recv_many_nocopy(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        a.send_multipart([b'a', b'b'])
+        frames = b.recv_many(2)
+        time.sleep(0.1)
+        frames.extend(b.recv_many(2, zmq.NOBLOCK))
+        self.assertEquals([ f.bytes for f in frames ], [b'a', b'b'])
+        self.assertEquals([ f.more for f in frames ], [True, False])
+
+    def test_recv_multipart_many(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        msgs = [ [b'msg', ('%i'%i).encode()] for i in range(10) ]
+        for msg in msgs:
+            a.send_multipart(msg)
+        time.sleep(0.1)
+        recvd = b.recv_multipart_many(4, zmq.NOBLOCK)
+        self.assertEquals(recvd, msgs[:4])
+        recvd = b.recv_multipart_many(100, zmq.NOBLOCK)
+        self.assertEquals(recvd, msgs[4:])
+        self.assertEquals(b.recv_multipart_many(100, zmq.NOBLOCK), [])
+
+    def test_recv_records(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SkipTest("requires numpy")
+        a,b = self.create_bound_pair(zmq.PUSH, zmq.PULL)
+        fmt = '!Iqd'
+        ticks = [ (i, -i, i * 0.5) for i in range(10) ]
+        for tick in ticks:
+            a.send(struct.pack(fmt, *tick))
+        records = numpy.zeros(8, dtype=serializers.struct_dtype(fmt, ['id', 'qty', 'price']))
+        time.sleep(0.1)
+        self.assertEquals(b.recv_records(records), 8)
+        self.assertEquals([ tuple(r) for r in records ], ticks[:8])
+        self.assertEquals(b.recv_records(records[:5]), 2)
+        self.assertEquals(list(records['id'][:2]), [8, 9])
+        self.assertEquals(b.recv_records(records, zmq.NOBLOCK), 0)
+        # a message of the wrong size is discarded, after the records before it
+        a.send(struct.pack(fmt, *ticks[2]))
+        a.send(struct.pack(fmt, *ticks[3]))
+        a.send(b'short')
+        a.send(struct.pack(fmt, *ticks[0]))
+        time.sleep(0.1)
+        try:
+            b.recv_records(records)
+        except ValueError as e:
+            self.assertEquals(e.filled, 2)
+        else:
+            self.fail("recv_records should raise on a message of the wrong size")
+        self.assertEquals([ tuple(r) for r in records[:2] ], ticks[2:4])
+        self.assertEquals(b.recv_records(records), 1)
+        self.assertEquals(tuple(records[0]), ticks[0])
+        self.assertRaises(TypeError, b.recv_records, b'no itemsize')
+
+    def test_send_many(self):
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        msgs = [ b'single', [b'multi', b'part'], (b'tuple', b'part') ]
+        for copy in (True, False):
+            nsent = a.send_many(msgs, copy=copy)
+            self.assertEquals(nsent, 3)
+            self.assertEquals(self.recv_multipart(b), [b'single'])
+            self.assertEquals(self.recv_multipart(b), [b'multi', b'part'])
+            self.assertEquals(self.recv_multipart(b), [b'tuple', b'part'])
+        self.assertEquals(a.send_many([]), 0)
+        self.assertRaises(TypeError, a.send_many, [b'ok', u'unicode'])
+
+    def test_send_many_eagain(self):
+        a = self.context.socket(zmq.PUSH)
+        self.sockets.append(a)
+        # no peer, so nothing can be queued
+        a.bind('inproc://send_many')
+        self.assertEquals(a.send_many([b'a', b'b'], zmq.NOBLOCK), 0)
+
+    def test_pyobj_out_of_band(self):
+        if not serializers.have_pickle_buffers:
+            raise SkipTest("requires pickle protocol 5")
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        data = b'x' * 1024
+        obj = dict(data=serializers.pickle.PickleBuffer(data), n=5)
+        a.send_pyobj(obj, out_of_band=True)
+        msg = self.recv_multipart(b)
+        # the pickle, and the buffer as its own frame
+        self.assertEquals(len(msg), 2)
+        self.assertEquals(msg[1], data)
+        a.send_pyobj(obj, zmq.SNDMORE, out_of_band=True)
+        a.send(b'trailer')
+        received = b.recv_pyobj()
+        self.assertEquals(received['n'], 5)
+        self.assertEquals(bytes(received['data']), data)
+        # frames after the buffers are left for the caller
+        self.assertEquals(b.recv(), b'trailer')
+        # in-band pickles are received as before
+        a.send_pyobj(dict(data=data))
+        self.assertEquals(b.recv_pyobj(), dict(data=data))
+        self.assertRaises(ValueError, a.send_pyobj, obj, protocol=2, out_of_band=True)
+
     def test_close_after_destroy(self):
         """s.close() after ctx.destroy() should be fine"""
         ctx = self.Context()
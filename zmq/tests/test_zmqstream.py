@@ -19,6 +19,7 @@ from unittest import TestCase
 
 import zmq
 from zmq.eventloop import ioloop, zmqstream
+from zmq.eventloop.future import coroutine
 
 class TestZMQStream(TestCase):
     
@@ -41,3 +42,286 @@ class TestZMQStream(TestCase):
         self.assertRaises(AssertionError, self.stream.on_send, 1)
         self.assertRaises(AssertionError, self.stream.on_recv, zmq)
         
+    
+    def _push_pull(self):
+        push = self.context.socket(zmq.PUSH)
+        pull = self.context.socket(zmq.PULL)
+        port = push.bind_to_random_port('tcp://127.0.0.1')
+        pull.connect('tcp://127.0.0.1:%i' % port)
+        self.sockets = [push, pull]
+        return push, zmqstream.ZMQStream(pull, self.loop)
+    
+    def _close_pair(self):
+        for s in self.sockets:
+            s.close(linger=0)
+    
+    def test_recv_batch(self):
+        """on_recv with batch drains several messages per event"""
+        push, stream = self._push_pull()
+        msgs = [ [('msg%i' % i).encode()] for i in range(10) ]
+        for msg in msgs:
+            push.send_multipart(msg)
+        time.sleep(0.1)
+        received = []
+        stream.on_recv(received.append, batch=4)
+        self.assertEquals(stream.flush(zmq.POLLIN), 10)
+        self.assertEquals(received, msgs)
+        self._close_pair()
+    
+    def test_on_recv_batch(self):
+        """on_recv_batch delivers lists of messages"""
+        push, stream = self._push_pull()
+        msgs = [ [('msg%i' % i).encode(), b'x'] for i in range(10) ]
+        for msg in msgs:
+            push.send_multipart(msg)
+        time.sleep(0.1)
+        batches = []
+        stream.on_recv_batch(batches.append, batch=4)
+        self.assertEquals(stream.flush(zmq.POLLIN), 10)
+        self.assertEquals([ len(b) for b in batches ], [4, 4, 2])
+        self.assertEquals(sum(batches, []), msgs)
+        self.assertRaises(ValueError, stream.on_recv_batch, batches.append, batch=0)
+        self._close_pair()
+    
+    def test_send_coalescing(self):
+        """one send event flushes every queued message"""
+        push, stream = self._push_pull()
+        pull = stream.socket
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        sent = []
+        pushstream.on_send(lambda msg, status: sent.append(msg))
+        msgs = [ [('msg%i' % i).encode()] for i in range(10) ]
+        for msg in msgs:
+            pushstream.send_multipart(msg)
+        self.assertTrue(pushstream.sending())
+        self.assertEquals(pushstream._handle_send(), 10)
+        self.assertFalse(pushstream.sending())
+        self.assertEquals(sent, msgs)
+        for msg in msgs:
+            self.assertEquals(pull.recv_multipart(), msg)
+        self._close_pair()
+    
+    def test_send_callback_reused(self):
+        """passing the same callback to each send doesn't wrap it again"""
+        push, stream = self._push_pull()
+        pull = stream.socket
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        sent = []
+        callback = lambda msg, status: sent.append(msg)
+        pushstream.send(b'a', callback=callback)
+        wrapped = pushstream._send_callback
+        pushstream.send(b'b', callback=callback)
+        self.assertTrue(pushstream._send_callback is wrapped)
+        pushstream._handle_send()
+        self.assertEquals(sent, [[b'a'], [b'b']])
+        self.assertEquals(pull.recv(), b'a')
+        self.assertEquals(pull.recv(), b'b')
+        self._close_pair()
+    
+    def test_send_queue_drop_newest(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        pressure = []
+        drained = []
+        pushstream.on_pressure(pressure.append)
+        pushstream.on_drain(drained.append)
+        pushstream.set_send_queue_limit(max_messages=4)
+        for i in range(10):
+            pushstream.send_multipart([('msg%i' % i).encode()])
+        stats = pushstream.send_queue_stats()
+        self.assertEquals(stats['messages'], 4)
+        self.assertEquals(stats['bytes'], 16)
+        self.assertEquals(stats['dropped'], 6)
+        self.assertEquals(stats['pressure_events'], 1)
+        self.assertTrue(stats['pressured'])
+        self.assertEquals(pressure, [pushstream])
+        self.assertEquals(pushstream._handle_send(), 4)
+        self.assertEquals(drained, [pushstream])
+        self.assertFalse(pushstream.send_queue_stats()['pressured'])
+        self.assertEquals(stream.socket.recv(), b'msg0')
+        self._close_pair()
+    
+    def test_send_queue_drop_oldest(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        pushstream.set_send_queue_limit(max_bytes=10, policy=zmqstream.DROP_OLDEST)
+        for i in range(10):
+            pushstream.send(('msg%i' % i).encode())
+        stats = pushstream.send_queue_stats()
+        self.assertEquals(stats['messages'], 2)
+        self.assertEquals(stats['dropped'], 8)
+        pushstream._handle_send()
+        self.assertEquals(stream.socket.recv(), b'msg8')
+        self._close_pair()
+    
+    def test_send_queue_raise(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        pushstream.set_send_queue_limit(max_messages=1, policy=zmqstream.RAISE)
+        pushstream.send(b'msg')
+        try:
+            pushstream.send(b'msg')
+        except zmq.ZMQError as e:
+            self.assertEquals(e.errno, zmq.EAGAIN)
+        else:
+            self.fail("should have raised EAGAIN")
+        self.assertRaises(ValueError, pushstream.set_send_queue_limit, 1, 0, 'bad')
+        self._close_pair()
+    
+    def test_send_queue_pause(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        stream.on_recv(lambda msg: None)
+        pushstream.set_send_queue_limit(max_messages=2, policy=zmqstream.PAUSE)
+        pushstream.link_input(stream)
+        self.assertTrue(stream.receiving())
+        for i in range(3):
+            pushstream.send(b'msg')
+        # PAUSE queues everything, and stops reading linked inputs
+        self.assertEquals(pushstream.send_queue_stats()['messages'], 3)
+        self.assertFalse(stream.receiving())
+        pushstream._handle_send()
+        self.assertTrue(stream.receiving())
+        self._close_pair()
+    
+    def test_send_queue_pause_in_batch(self):
+        """reaching the limit partway through a batch stops the batch"""
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        pushstream.set_send_queue_limit(max_messages=2, policy=zmqstream.PAUSE)
+        pushstream.link_input(stream)
+        received = []
+        def forward(msg):
+            received.append(msg)
+            pushstream.send_multipart(msg)
+        stream.on_recv(forward, batch=10)
+        for i in range(5):
+            push.send(('msg%i' % i).encode())
+        time.sleep(0.1)
+        self.assertEquals(stream._handle_recv(), 2)
+        self.assertFalse(stream.receiving())
+        self.assertEquals(received, [[b'msg0'], [b'msg1']])
+        self.assertEquals(pushstream.send_queue_stats()['messages'], 2)
+        self._close_pair()
+    
+    def test_send_future(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        sent = []
+        pushstream.on_send(lambda msg, status: sent.append(msg))
+        f = pushstream.send_future([b'hi', b'there'])
+        self.assertFalse(f.done())
+        self.assertRaises(zmq.NotDone, f.result)
+        done = []
+        f.add_done_callback(done.append)
+        self.assertEquals(pushstream._handle_send(), 1)
+        self.assertEquals(done, [f])
+        self.assertTrue(f.result() is None)
+        # the on_send callback is not used for send_future
+        self.assertEquals(sent, [])
+        self.assertEquals(stream.socket.recv_multipart(), [b'hi', b'there'])
+        # dropped from a full queue
+        pushstream.set_send_queue_limit(max_messages=1)
+        pushstream.send_future([b'msg'])
+        f = pushstream.send_future([b'msg'])
+        self.assertTrue(f.done())
+        self.assertEquals(f.exception().errno, zmq.EAGAIN)
+        self._close_pair()
+    
+    def test_recv_future(self):
+        push, stream = self._push_pull()
+        received = []
+        stream.on_recv(received.append)
+        f1 = stream.recv_future()
+        f2 = stream.recv_future()
+        f3 = stream.recv_future(copy=False)
+        f2.cancel()
+        for i in range(3):
+            push.send(('msg%i' % i).encode())
+        time.sleep(0.1)
+        self.assertEquals(stream.flush(zmq.POLLIN), 3)
+        # futures first, in order, skipping cancelled ones
+        self.assertEquals(f1.result(), [b'msg0'])
+        self.assertEquals([ frame.bytes for frame in f3.result() ], [b'msg1'])
+        self.assertEquals(received, [[b'msg2']])
+        f = stream.recv_future()
+        stream.close()
+        self.assertTrue(isinstance(f.exception(), IOError))
+        self._close_pair()
+    
+    def test_coroutine(self):
+        push, stream = self._push_pull()
+        received = []
+        @coroutine
+        def recv_two():
+            received.append((yield stream.recv_future()))
+            received.append((yield stream.recv_future()))
+        f = recv_two()
+        self.assertFalse(f.done())
+        for i in range(2):
+            push.send(('msg%i' % i).encode())
+        time.sleep(0.1)
+        stream.flush(zmq.POLLIN)
+        self.assertTrue(f.done())
+        self.assertEquals(received, [[b'msg0'], [b'msg1']])
+        # the exception of a Future is raised at the yield
+        @coroutine
+        def recv_closed():
+            try:
+                yield stream.recv_future()
+            except IOError:
+                received.append('closed')
+        f = recv_closed()
+        stream.close()
+        self.assertTrue(f.result() is None)
+        self.assertEquals(received[-1], 'closed')
+        self._close_pair()
+
+    def test_no_stack_context(self):
+        push, stream = self._push_pull()
+        stream = zmqstream.ZMQStream(stream.socket, self.loop, use_stack_context=False)
+        received = []
+        def fail(msg):
+            received.append(msg)
+            raise ValueError("oops")
+        stream.on_recv(fail)
+        self.assertTrue(stream._recv_callback is fail)
+        push.send(b'hi')
+        time.sleep(0.1)
+        # an error in the callback still closes the stream
+        self.assertRaises(ValueError, stream.flush, zmq.POLLIN)
+        self.assertEquals(received, [[b'hi']])
+        self.assertTrue(stream.closed())
+        self._close_pair()
+    
+    def test_compression(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        pushstream.set_compression('zlib')
+        stream.set_compression('zlib')
+        received = []
+        stream.on_recv(received.append)
+        msg = [b'header', b'x' * 10000]
+        pushstream.send_multipart(msg)
+        pushstream._handle_send()
+        time.sleep(0.1)
+        stream.flush(zmq.POLLIN)
+        self.assertEquals(received, [msg])
+        self.assertEquals(pushstream.compression_stats()['compressed_frames'], 1)
+        self.assertEquals(stream.compression_stats(reset=True)['decompressed_frames'], 1)
+        self.assertEquals(stream.compression_stats()['received_frames'], 0)
+        stream.set_compression(None)
+        self.assertEquals(stream.compression_stats(), None)
+        self._close_pair()
+
+    def test_serialized(self):
+        push, stream = self._push_pull()
+        pushstream = zmqstream.ZMQStream(push, self.loop)
+        received = []
+        stream.on_recv_serialized(received.append, serializer='json')
+        pushstream.send_serialized(dict(a=1), serializer='json')
+        pushstream._handle_send()
+        time.sleep(0.1)
+        stream.flush(zmq.POLLIN)
+        self.assertEquals(received, [dict(a=1)])
+        self._close_pair()
@@ -0,0 +1,311 @@
+"""Transparent compression of message frames, for Socket.compression.
+
+A socket with a Compressor compresses every frame it sends that is at least
+`threshold` bytes, and decompresses every frame it receives.  Each frame
+starts with one byte saying which codec compressed it (0 for none), so both
+ends of a connection must set compression, though they may use different
+thresholds and codecs::
+
+    socket.compression = Compressor('zlib', threshold=1024)
+
+Envelope frames that libzmq routes by (ROUTER and DEALER envelopes, up to the
+empty delimiter, and PUB/SUB topics) are sent as they are; see
+Socket.compression.
+
+This trades CPU for bandwidth, so it pays off on slow or expensive links,
+with compressible messages.  Compressor.stats reports what it is buying.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import sys
+import time
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+from zmq.utils.strtypes import basestring
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+_RAW = 0
+_raw_marker = b'\0'
+
+if sys.version_info[0] >= 3:
+    def _with_marker(marker, data):
+        return b''.join((marker, data))
+
+    def _nbytes(data):
+        return memoryview(data).nbytes
+else:
+    def _with_marker(marker, data):
+        return marker + str(buffer(data))
+
+    def _nbytes(data):
+        return len(buffer(data))
+
+
+class Codec(object):
+    """Base class for compression codecs.
+
+    Subclasses set `name`, and `id`, the byte that marks frames they
+    compressed, which must be unique between 1 and 255, and implement
+    `compress` and `decompress`, from and to bytes.  `decompress` must
+    raise ValueError rather than return more than `max_size` bytes
+    (unless `max_size` is 0), so a peer can't exhaust memory with a small
+    frame that decompresses to a huge one.  Both ends of a connection must
+    agree on the codec for an id, including any preset dictionary.
+    """
+
+    name = None
+    id = None
+
+    def compress(self, data):
+        raise NotImplementedError("compress must be implemented by subclasses")
+
+    def decompress(self, data, max_size=0):
+        raise NotImplementedError("decompress must be implemented by subclasses")
+
+
+def _too_large(max_size):
+    return ValueError("Frame decompresses to more than max_size=%i bytes" % max_size)
+
+
+class ZlibCodec(Codec):
+    """Compress with zlib.
+
+    A preset dictionary `zdict` of bytes that are common in the messages,
+    such as the field names of small JSON messages, can compress small
+    messages much better.  The receiving end must use the same dictionary.
+    Preset dictionaries require Python >= 3.3.
+    """
+
+    name = 'zlib'
+    id = 1
+
+    def __init__(self, level=6, zdict=None):
+        self.level = level
+        self.zdict = zdict
+        self._compressobj = None
+        if zdict is not None:
+            try:
+                self._compressobj = zlib.compressobj(level, zlib.DEFLATED,
+                        zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY,
+                        zdict)
+            except TypeError:
+                raise ValueError("zlib preset dictionaries require Python >= 3.3")
+
+    def compress(self, data):
+        if self._compressobj is None:
+            return zlib.compress(data, self.level)
+        # copying a primed compressor is cheaper than loading the dictionary again
+        c = self._compressobj.copy()
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data, max_size=0):
+        if self.zdict is None:
+            d = zlib.decompressobj()
+        else:
+            d = zlib.decompressobj(zlib.MAX_WBITS, self.zdict)
+        # max_length=0 is unlimited
+        msg = d.decompress(data, max_size)
+        if d.unconsumed_tail:
+            raise _too_large(max_size)
+        return msg + d.flush()
+
+
+class LZMACodec(Codec):
+    """Compress with lzma, which is slower than zlib, but compresses better.
+
+    Requires Python >= 3.3.
+    """
+
+    name = 'lzma'
+    id = 2
+
+    def __init__(self, preset=6):
+        if lzma is None:
+            raise ImportError("lzma compression requires Python >= 3.3")
+        self.preset = preset
+
+    def compress(self, data):
+        # 0MQ has delivered the frame intact, so skip the integrity check
+        return lzma.compress(data, lzma.FORMAT_XZ, lzma.CHECK_NONE, self.preset)
+
+    def decompress(self, data, max_size=0):
+        d = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        msg = d.decompress(data, max_size or -1)
+        if not d.eof:
+            if max_size and len(msg) >= max_size:
+                raise _too_large(max_size)
+            raise ValueError("Compressed frame is truncated")
+        return msg
+
+
+_codecs = {}
+_codecs_by_id = {}
+
+def register_codec(codec):
+    """Register a codec, so it can be selected by name, and decoded by id.
+
+    Registering a codec with the name or id of another replaces it.
+    """
+    if not isinstance(codec.id, int) or not 0 < codec.id < 256:
+        raise ValueError("codec id must be between 1 and 255, not %r" % codec.id)
+    old = _codecs_by_id.get(codec.id)
+    if old is not None and _codecs.get(old.name) is old:
+        del _codecs[old.name]
+    _codecs[codec.name] = codec
+    _codecs_by_id[codec.id] = codec
+
+def get_codec(codec):
+    """Get a registered codec by name, or pass a Codec through."""
+    if isinstance(codec, basestring):
+        try:
+            return _codecs[codec]
+        except KeyError:
+            raise ValueError("No codec named %r, registered codecs are %s"
+                             % (codec, sorted(_codecs)))
+    return codec
+
+register_codec(ZlibCodec())
+if lzma is not None:
+    register_codec(LZMACodec())
+
+
+class Compressor(object):
+    """Compress frames at least `threshold` bytes long with a codec.
+
+    Frames that are smaller, or that don't get smaller when compressed,
+    are sent as they are, after the marker byte.  Received frames are
+    decompressed with this Compressor's codec if it marked them, or else
+    with the registered codec for their marker.
+
+    Empty frames are passed through without a marker, since they are
+    envelope delimiters, which libzmq must see as they are.  A marked frame
+    is never empty, so they can't be confused.
+
+    Parameters
+    ----------
+    codec : str or Codec
+        The codec to compress with, 'zlib' by default.
+    threshold : int
+        The size in bytes of the smallest frame to compress.
+    max_size : int
+        The most bytes a received frame may decompress to, 64 MiB by
+        default, or 0 for no limit.  Larger frames raise ValueError.
+    """
+
+    def __init__(self, codec='zlib', threshold=1024, max_size=64 * 1024 * 1024):
+        self.codec = get_codec(codec)
+        self.threshold = threshold
+        self.max_size = max_size
+        self._marker = bytes(bytearray([self.codec.id]))
+        self._reset_stats()
+
+    def __repr__(self):
+        return "<%s %s threshold=%i>" % (self.__class__.__name__,
+                                        self.codec.name, self.threshold)
+
+    def compress(self, data):
+        """Compress a frame, if it is large enough, and add its marker byte."""
+        nbytes = _nbytes(data)
+        if not nbytes:
+            return data
+        stats = self._stats
+        stats['sent_frames'] += 1
+        stats['sent_bytes'] += nbytes
+        if nbytes >= self.threshold:
+            tic = _timer()
+            compressed = self.codec.compress(data)
+            stats['compress_seconds'] += _timer() - tic
+            if len(compressed) < nbytes:
+                stats['compressed_frames'] += 1
+                stats['wire_sent_bytes'] += len(compressed) + 1
+                return _with_marker(self._marker, compressed)
+            stats['incompressible_frames'] += 1
+        stats['wire_sent_bytes'] += nbytes + 1
+        return _with_marker(_raw_marker, data)
+
+    def decompress(self, data):
+        """Remove the marker byte of a frame, and decompress it if it was compressed."""
+        marker = bytearray(data[:1])
+        if not marker:
+            return bytes(data)
+        codec_id = marker[0]
+        payload = data[1:]
+        stats = self._stats
+        stats['received_frames'] += 1
+        stats['wire_received_bytes'] += len(payload) + 1
+        if codec_id == _RAW:
+            stats['received_bytes'] += len(payload)
+            return bytes(payload)
+        if codec_id == self.codec.id:
+            codec = self.codec
+        else:
+            try:
+                codec = _codecs_by_id[codec_id]
+            except KeyError:
+                raise ValueError("Received a frame compressed with unknown codec %i" % codec_id)
+        tic = _timer()
+        msg = codec.decompress(payload, self.max_size)
+        stats['decompress_seconds'] += _timer() - tic
+        stats['decompressed_frames'] += 1
+        stats['received_bytes'] += len(msg)
+        return msg
+
+    def _reset_stats(self):
+        self._stats = dict(sent_frames=0, compressed_frames=0,
+                           incompressible_frames=0, sent_bytes=0,
+                           wire_sent_bytes=0, compress_seconds=0.0,
+                           received_frames=0, decompressed_frames=0,
+                           received_bytes=0, wire_received_bytes=0,
+                           decompress_seconds=0.0)
+
+    def stats(self, reset=False):
+        """Return a dict of counters for the Compressor.
+
+        * sent_frames: frames sent
+        * compressed_frames: frames sent compressed
+        * incompressible_frames: frames that were compressed, but sent as
+          they were, because they didn't get smaller
+        * sent_bytes, wire_sent_bytes: the bytes of the frames sent, before
+          and after compression
+        * send_ratio: sent_bytes / wire_sent_bytes
+        * compress_seconds: the time spent compressing
+        * received_frames, decompressed_frames, received_bytes,
+          wire_received_bytes, receive_ratio, decompress_seconds: the same,
+          for frames received
+
+        If `reset` is True, the counters are cleared after the snapshot.
+        """
+        stats = dict(self._stats)
+        stats['send_ratio'] = (float(stats['sent_bytes']) / stats['wire_sent_bytes']
+                               if stats['wire_sent_bytes'] else 1.0)
+        stats['receive_ratio'] = (float(stats['received_bytes']) / stats['wire_received_bytes']
+                                  if stats['wire_received_bytes'] else 1.0)
+        if reset:
+            self._reset_stats()
+        return stats
+
+
+__all__ = ['Codec', 'ZlibCodec', 'LZMACodec', 'Compressor', 'register_codec',
+           'get_codec']
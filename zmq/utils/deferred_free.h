@@ -0,0 +1,71 @@
+/*
+
+A lock-free stack of pointers, for releasing zero-copy message buffers
+from the libzmq IO thread without acquiring the GIL.
+
+The IO thread pushes hints, and the Python side takes the whole stack
+at once, so only push and take-all are needed, which is ABA-safe.
+
+Copyright (c) 2012 Brian Granger, Min Ragan-Kelley
+
+Distributed under the terms of the New BSD License.  The full license is in
+the file COPYING.BSD, distributed as part of this software.
+ */
+
+#ifndef PYZMQ_DEFERRED_FREE_H
+#define PYZMQ_DEFERRED_FREE_H
+
+#include <stdlib.h>
+
+#if defined(_MSC_VER)
+#include <windows.h>
+#define PYZMQ_CAS_PTR(p, old, new) \
+    (InterlockedCompareExchangePointer((PVOID volatile *)(p), (PVOID)(new), (PVOID)(old)) == (PVOID)(old))
+#define PYZMQ_FETCH_ADD(p, v) InterlockedExchangeAdd((p), (v))
+#else
+#define PYZMQ_CAS_PTR(p, old, new) __sync_bool_compare_and_swap((p), (old), (new))
+#define PYZMQ_FETCH_ADD(p, v) __sync_fetch_and_add((p), (v))
+#endif
+
+typedef struct deferred_node {
+    void *hint;
+    struct deferred_node *next;
+} deferred_node;
+
+static deferred_node * volatile deferred_head = NULL;
+static volatile long deferred_count = 0;
+
+/* push a hint, returns 0 on success, -1 if out of memory */
+static int deferred_push(void *hint) {
+    deferred_node *node = (deferred_node *)malloc(sizeof(deferred_node));
+    if (node == NULL) {
+        return -1;
+    }
+    node->hint = hint;
+    do {
+        node->next = deferred_head;
+    } while (!PYZMQ_CAS_PTR(&deferred_head, node->next, node));
+    PYZMQ_FETCH_ADD(&deferred_count, 1);
+    return 0;
+}
+
+/* take every node pushed so far, most recent first */
+static deferred_node *deferred_take(void) {
+    deferred_node *head;
+    do {
+        head = deferred_head;
+    } while (head != NULL && !PYZMQ_CAS_PTR(&deferred_head, head, NULL));
+    return head;
+}
+
+/* record that n taken nodes have been released */
+static void deferred_done(long n) {
+    PYZMQ_FETCH_ADD(&deferred_count, -n);
+}
+
+/* the number of hints pushed but not yet released */
+static long deferred_pending(void) {
+    return PYZMQ_FETCH_ADD(&deferred_count, 0);
+}
+
+#endif
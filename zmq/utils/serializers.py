@@ -0,0 +1,437 @@
+"""Serializers for Socket.send_serialized and recv_serialized.
+
+A serializer turns an object into a list of message frames, and back.
+Serializers are registered by name, so a socket can be switched to a
+faster serializer without changing the code that sends and receives::
+
+    register_serializer('point', StructSerializer('!dd'))
+    socket.serializer = 'point'
+    socket.send_serialized((1.0, 2.0))
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (c) 2010-2012 Brian Granger, Min Ragan-Kelley
+#
+#  This file is part of pyzmq
+#
+#  Distributed under the terms of the New BSD License.  The full license is in
+#  the file COPYING.BSD, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import ast
+import marshal
+import re
+import struct
+import sys
+
+from zmq.utils import jsonapi
+from zmq.utils.strtypes import basestring, bytes
+
+try:
+    import cPickle
+    pickle = cPickle
+except:
+    cPickle = None
+    import pickle
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+# pickle protocol 5 (Python >= 3.8) can keep large buffers out of the pickle
+have_pickle_buffers = getattr(pickle, 'HIGHEST_PROTOCOL', 0) >= 5
+
+def pickle_out_of_band(obj, protocol=-1):
+    """Pickle an object, keeping its large buffers out of the pickle.
+
+    Returns a list of frames: the pickle stream, followed by a memoryview of
+    each out-of-band buffer (e.g. the data of a NumPy array), which can be
+    sent without copying.  Buffers that aren't contiguous are pickled in-band.
+    Unpickle with ``pickle.loads(frames[0], buffers=frames[1:])``.
+
+    Requires pickle protocol 5 (Python >= 3.8).
+    """
+    if not have_pickle_buffers:
+        raise ValueError("out-of-band pickling requires pickle protocol 5 (Python >= 3.8)")
+    if protocol < 0:
+        protocol = pickle.HIGHEST_PROTOCOL
+    elif protocol < 5:
+        raise ValueError("out-of-band pickling requires protocol >= 5, not %i" % protocol)
+    frames = [None]
+    def buffer_callback(buf):
+        try:
+            frames.append(buf.raw())
+        except BufferError:
+            # not contiguous, pickle it in-band
+            return True
+        return False
+    frames[0] = pickle.dumps(obj, protocol, buffer_callback=buffer_callback)
+    return frames
+
+if sys.version_info[0] >= 3:
+    def _frame_data(frame):
+        """The content of a received Frame, without copying it."""
+        return frame.buffer
+else:
+    def _frame_data(frame):
+        # the py2 loaders want str
+        return frame.bytes
+
+def _frame_buffer(frame):
+    """A buffer on a received Frame or bytes, for numpy.frombuffer."""
+    if isinstance(frame, bytes):
+        return frame
+    return frame.buffer
+
+
+class Serializer(object):
+    """Base class for serializers.
+
+    Subclasses implement `serialize`, which returns a list of frames
+    (bytes, or any buffer-provider) for an object, and `deserialize`, which
+    rebuilds the object from the list of frames received.
+
+    If `copy` is False, `deserialize` is passed the received zmq.Frame
+    objects rather than bytes, so it can decode from their buffers
+    without first copying the message into a new bytes object.
+    """
+
+    copy = True
+
+    def serialize(self, obj):
+        raise NotImplementedError("serialize must be implemented by subclasses")
+
+    def deserialize(self, frames):
+        raise NotImplementedError("deserialize must be implemented by subclasses")
+
+
+class PickleSerializer(Serializer):
+    """Serialize objects with pickle, as send_pyobj does.
+
+    If `out_of_band` is True, large buffers are sent as separate frames
+    after the pickle, see pickle_out_of_band.  Send them with copy=False to
+    avoid copying them, and note that arrays received this way are
+    read-only views on the received frames.
+    """
+
+    copy = False
+
+    def __init__(self, protocol=-1, out_of_band=False):
+        self.protocol = protocol
+        self.out_of_band = out_of_band
+
+    def serialize(self, obj):
+        if self.out_of_band:
+            return pickle_out_of_band(obj, self.protocol)
+        return [pickle.dumps(obj, self.protocol)]
+
+    def deserialize(self, frames):
+        data = _frame_data(frames[0])
+        if len(frames) > 1 and have_pickle_buffers:
+            return pickle.loads(data, buffers=[ f.buffer for f in frames[1:] ])
+        return pickle.loads(data)
+
+
+class JSONSerializer(Serializer):
+    """Serialize objects with json, as send_json does."""
+
+    def serialize(self, obj):
+        return [jsonapi.dumps(obj)]
+
+    def deserialize(self, frames):
+        return jsonapi.loads(frames[0])
+
+
+class MarshalSerializer(Serializer):
+    """Serialize builtin types with marshal.
+
+    marshal is fast, but only handles builtin types, and its format may
+    change between Python versions, so both ends must run the same one.
+    """
+
+    copy = False
+
+    def serialize(self, obj):
+        return [marshal.dumps(obj)]
+
+    def deserialize(self, frames):
+        return marshal.loads(_frame_data(frames[0]))
+
+
+class StructSerializer(Serializer):
+    """Serialize tuples of fixed-size values with a struct format.
+
+    The format is the schema, which both ends must agree on, e.g.
+    ``StructSerializer('!Iqd')`` for an unsigned int, a long long and a
+    double in network byte order.
+    """
+
+    copy = False
+
+    def __init__(self, fmt):
+        self.struct = struct.Struct(fmt)
+
+    def serialize(self, obj):
+        return [self.struct.pack(*obj)]
+
+    def deserialize(self, frames):
+        return self.struct.unpack_from(_frame_data(frames[0]))
+
+
+_struct_kinds = dict(
+    [ (code, 'i') for code in 'bhilqn' ] +
+    [ (code, 'u') for code in 'BHILQN' ] +
+    [ (code, 'f') for code in 'efd' ] +
+    [ ('?', 'b'), ('c', 'S'), ('s', 'S') ]
+)
+_struct_orders = {'@': '=', '=': '=', '<': '<', '>': '>', '!': '>'}
+
+def struct_dtype(fmt, names=None):
+    """Make a NumPy structured dtype with the same layout as a struct format.
+
+    Each item of the format is a field, named ``f0``, ``f1``, ... unless
+    `names` are given, at the offset the struct module packs it at, so
+    ``numpy.frombuffer(struct.pack(fmt, ...), struct_dtype(fmt))`` gives
+    the same values as ``struct.unpack``.  Use it with Socket.recv_records.
+    Pad bytes (``x``) are skipped, and ``p`` and ``P`` are not supported.
+    """
+    import numpy
+    fmt = fmt.replace(' ', '')
+    prefix = ''
+    if fmt[:1] in _struct_orders:
+        prefix = fmt[0]
+    byteorder = _struct_orders.get(prefix, '=')
+    fields = []
+    layout = prefix
+    for count, code in re.findall(r'(\d*)(.)', fmt[len(prefix):]):
+        item = count + code
+        if code == 'x':
+            layout += item
+            continue
+        if code not in _struct_kinds:
+            raise ValueError("Unsupported struct format character: %r" % code)
+        size = struct.calcsize(prefix + code)
+        if code == 's':
+            # a count is the length of one string, not a repeat
+            items = [('S%i' % int(count or 1), item)]
+        else:
+            items = [('%s%s%i' % (byteorder, _struct_kinds[code], size), code)] * int(count or 1)
+        for dtype, item in items:
+            layout += item
+            fields.append((dtype, struct.calcsize(layout) - numpy.dtype(dtype).itemsize))
+    if names is None:
+        names = [ 'f%i' % i for i in range(len(fields)) ]
+    elif len(names) != len(fields):
+        raise ValueError("%i names given for %i fields" % (len(names), len(fields)))
+    return numpy.dtype(dict(names=list(names),
+                            formats=[ dtype for dtype, offset in fields ],
+                            offsets=[ offset for dtype, offset in fields ],
+                            itemsize=struct.calcsize(fmt)))
+
+# array header: version, flags, ndim, length of the dtype string;
+# followed by the dtype string and the shape, as unsigned 64-bit ints
+_array_header = struct.Struct('!BBBH')
+_array_version = 1
+_ARRAY_FORTRAN = 1  # the data is in Fortran order
+_ARRAY_DESCR = 2    # the dtype string is a repr of dtype.descr
+# don't split a non-contiguous array into frames smaller than this,
+# sending many tiny frames costs more than copying them together
+_min_array_chunk = 4096
+
+def _contiguous_chunks(A):
+    """Split an array into C-contiguous views along its outer axes.
+
+    Returns None if the innermost contiguous block is smaller than
+    _min_array_chunk, and the array should be copied instead.
+    """
+    import numpy
+    itemsize = A.dtype.itemsize
+    expected = itemsize
+    nouter = A.ndim
+    while nouter > 0:
+        axis = nouter - 1
+        if A.shape[axis] != 1:
+            if A.strides[axis] != expected:
+                break
+            expected *= A.shape[axis]
+        nouter = axis
+    if expected < _min_array_chunk:
+        return None
+    return [ A[index] for index in numpy.ndindex(*A.shape[:nouter]) ]
+
+def serialize_array(A):
+    """Serialize a NumPy array into a list of frames, without copying it.
+
+    The first frame is a compact binary header with the dtype, shape and
+    memory order of the array.  The data of a C or Fortran contiguous array
+    follows as a single frame, which is the array itself, so sending it with
+    copy=False does not copy it.
+
+    A non-contiguous array, such as a slice, is sent as one frame for each
+    contiguous block along its outer axes, rather than copied into a
+    contiguous array first.  If those blocks are small, they are copied
+    into a single frame instead.
+    """
+    import numpy
+    A = numpy.asanyarray(A)
+    dtype = A.dtype
+    if dtype.hasobject:
+        raise TypeError("Can't serialize arrays of Python objects, use send_pyobj")
+    flags = 0
+    if dtype.fields is None and dtype.subdtype is None:
+        dtype_str = dtype.str
+    else:
+        # structured dtypes need their fields, and offsets
+        flags |= _ARRAY_DESCR
+        dtype_str = repr(numpy.lib.format.dtype_to_descr(dtype))
+    dtype_str = dtype_str.encode('ascii')
+    if A.flags.c_contiguous:
+        chunks = [A]
+    elif A.flags.f_contiguous:
+        flags |= _ARRAY_FORTRAN
+        chunks = [A]
+    else:
+        chunks = _contiguous_chunks(A)
+        if chunks is None:
+            chunks = _contiguous_chunks(A.T)
+            if chunks is None:
+                chunks = [numpy.ascontiguousarray(A)]
+            else:
+                flags |= _ARRAY_FORTRAN
+    header = (_array_header.pack(_array_version, flags, A.ndim, len(dtype_str))
+              + dtype_str + struct.pack('!%iQ' % A.ndim, *A.shape))
+    return [header] + chunks
+
+def _unpack_array_header(header):
+    import numpy
+    version, flags, ndim, dtype_len = _array_header.unpack_from(header)
+    if version != _array_version:
+        raise ValueError("Unsupported array header version: %i" % version)
+    start = _array_header.size
+    dtype_str = header[start:start + dtype_len].decode('ascii')
+    if flags & _ARRAY_DESCR:
+        dtype = numpy.lib.format.descr_to_dtype(ast.literal_eval(dtype_str))
+    else:
+        dtype = numpy.dtype(dtype_str)
+    shape = struct.unpack_from('!%iQ' % ndim, header, start + dtype_len)
+    order = 'F' if flags & _ARRAY_FORTRAN else 'C'
+    return dtype, shape, order
+
+def deserialize_array(frames, out=None):
+    """Rebuild an array from the frames of serialize_array.
+
+    A single data frame is not copied: if the frames are Frame objects, the
+    array is a read-only view on the received message, which it keeps
+    alive.  Data split over several frames is copied into one array.
+
+    Parameters
+    ----------
+    frames : list
+        The header and data frames, as Frames or bytes.
+    out : numpy.ndarray, optional
+        An array of the same shape and dtype to copy the data into,
+        instead of returning a view or a new array.
+
+    Returns
+    -------
+    A : numpy.ndarray
+        The array, which is `out` if it was given.
+    """
+    import numpy
+    header = frames[0]
+    if not isinstance(header, bytes):
+        header = header.bytes
+    dtype, shape, order = _unpack_array_header(header)
+    if out is not None and (out.shape != shape or out.dtype != dtype):
+        raise ValueError("out must have shape %s and dtype %s, not %s and %s"
+                         % (shape, dtype, out.shape, out.dtype))
+    data = [ numpy.frombuffer(_frame_buffer(f), dtype=dtype) for f in frames[1:] ]
+    if len(data) == 1:
+        A = data[0].reshape(shape, order=order)
+        if out is None:
+            return A
+        out[...] = A
+        return out
+    if out is not None and out.flags['%s_CONTIGUOUS' % order]:
+        A = out
+    else:
+        A = numpy.empty(shape, dtype=dtype, order=order)
+    # the chunks are consecutive blocks in the array's memory order
+    flat = A.reshape(-1, order=order)
+    pos = 0
+    for chunk in data:
+        flat[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+    if pos != flat.size:
+        raise ValueError("Array data has %i items, not %i" % (pos, flat.size))
+    if out is not None and A is not out:
+        out[...] = A
+        return out
+    return A
+
+
+class ArraySerializer(Serializer):
+    """Serialize NumPy arrays, as send_array does.
+
+    See serialize_array.  Send with copy=False to send contiguous arrays
+    without copying them.
+    """
+
+    copy = False
+
+    def serialize(self, obj):
+        return serialize_array(obj)
+
+    def deserialize(self, frames):
+        return deserialize_array(frames)
+
+
+_serializers = {}
+
+def register_serializer(name, serializer):
+    """Register a serializer, so it can be selected by name.
+
+    Parameters
+    ----------
+    name : str
+        The name to select the serializer by.  Registering a name again
+        replaces the previous serializer.
+    serializer : Serializer
+        Any object with `serialize` and `deserialize` methods, and a
+        `copy` attribute, as described in Serializer.
+    """
+    for attr in ('serialize', 'deserialize', 'copy'):
+        if not hasattr(serializer, attr):
+            raise TypeError("serializer must have a %s attribute" % attr)
+    _serializers[name] = serializer
+
+def get_serializer(serializer=None):
+    """Get a serializer by name, or pass a Serializer through.
+
+    None selects the default, 'pickle'.
+    """
+    if serializer is None:
+        serializer = 'pickle'
+    if isinstance(serializer, basestring):
+        try:
+            return _serializers[serializer]
+        except KeyError:
+            raise ValueError("No serializer named %r, registered serializers are %s"
+                             % (serializer, sorted(_serializers)))
+    return serializer
+
+register_serializer('pickle', PickleSerializer())
+register_serializer('json', JSONSerializer())
+register_serializer('marshal', MarshalSerializer())
+register_serializer('array', ArraySerializer())
+
+
+__all__ = ['Serializer', 'PickleSerializer', 'JSONSerializer',
+           'MarshalSerializer', 'StructSerializer', 'register_serializer',
+           'get_serializer', 'pickle_out_of_band', 'have_pickle_buffers',
+           'ArraySerializer', 'serialize_array', 'deserialize_array',
+           'struct_dtype']